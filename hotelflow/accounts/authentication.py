@@ -0,0 +1,106 @@
+# accounts/authentication.py
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authz import cache_is_shared
+
+USER_CACHE_TTL = 60       # s (settings.JWT_USER_CACHE_TTL)
+VERSION_CLAIM = "ver"
+
+
+def _user_key(user_id, version):
+    return f"jwt:user:{user_id}:{version}"
+
+
+def load_user(user_id, version):
+    """
+    Usuario del token desde un cache corto (clave: id + token_version), sin
+    tocar la base en cada request. Rechaza tokens de una versión revocada.
+
+    Solo con caché compartida (settings.REDIS_URL): forget_user borra la
+    entrada para todos los workers al confirmar la transacción, así que una
+    revocación o un cambio guardado con save() se ve en todos salvo los
+    requests que lleguen entre el commit y ese borrado. Lo que no pasa por
+    save() (QuerySet.update de is_active, por ejemplo) tarda hasta
+    JWT_USER_CACHE_TTL. Con caché por proceso (LocMem) el usuario se lee de
+    la base en cada request: una consulta, sin ventana.
+    """
+    shared = cache_is_shared()
+    key = _user_key(user_id, version)
+    user = cache.get(key) if shared else None
+    if user is None:
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is None:
+            raise AuthenticationFailed("Usuario no encontrado.", code="user_not_found")
+        if shared and user.token_version == version:
+            cache.set(key, user, getattr(settings, "JWT_USER_CACHE_TTL", USER_CACHE_TTL))
+    if user.token_version != version:
+        raise AuthenticationFailed("Token revocado.", code="token_revoked")
+    if not user.is_active:
+        raise AuthenticationFailed("Usuario inactivo.", code="user_inactive")
+    return user
+
+
+def forget_user(user_id, *versions):
+    """Saca al usuario del cache (tras guardarlo o revocar): el próximo request lo relee."""
+    keys = [_user_key(user_id, v) for v in versions]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def revoke_tokens(user):
+    """Invalida todos los access/refresh emitidos para el usuario (sube token_version)."""
+    type(user).objects.filter(pk=user.pk).update(token_version=F("token_version") + 1)
+    old = user.token_version
+    user.refresh_from_db(fields=["token_version"])
+    forget_user(user.pk, old, user.token_version)
+    return user.token_version
+
+
+class VersionedRefreshToken(RefreshToken):
+    """Refresh (y el access derivado, que copia los claims) con la token_version del usuario."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[VERSION_CLAIM] = user.token_version
+        return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT Bearer sin consultas: ni sesión ni lectura de usuario mientras el
+    cache (compartido) esté tibio. Un token revocado (ver distinta) se rechaza.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise AuthenticationFailed("Token sin usuario reconocible.", code="token_not_valid")
+        return load_user(user_id, validated_token.get(VERSION_CLAIM, 0))
+
+
+class VersionedTokenObtainSerializer(TokenObtainPairSerializer):
+    token_class = VersionedRefreshToken
+
+
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = VersionedRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        try:
+            user_id = int(refresh.payload[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise AuthenticationFailed("Token sin usuario reconocible.", code="token_not_valid")
+        # un refresh revocado no puede emitir access nuevos
+        load_user(user_id, refresh.payload.get(VERSION_CLAIM, 0))
+        return super().validate(attrs)
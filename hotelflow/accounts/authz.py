@@ -0,0 +1,197 @@
+# accounts/authz.py
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Q
+
+CONTEXT_TTL = 300   # s (settings.AUTHZ_CACHE_TTL); tope para cambios que no pasan por señales
+GLOBAL_VERSION_KEY = "authz:v"
+LAZY_FIELDS = ("groups", "perms", "chat_rooms")
+
+
+class AuthzContext:
+    """
+    Lo que las verificaciones de permisos necesitan de un usuario, resuelto
+    una vez: grupos, rol, permisos de modelo y salas de chat. Las consultas
+    pasan a ser búsquedas en sets.
+
+    Grupos, permisos y salas pueden llegar como `loaders` (funciones sin
+    argumentos): cada uno se consulta la primera vez que se usa, así un
+    chequeo de grupo no paga los permisos ni las salas de chat.
+    """
+
+    def __init__(self, user_id=None, role="", is_active=False, is_staff=False, is_superuser=False,
+                 groups=(), perms=(), chat_rooms=(), loaders=None):
+        self.user_id = user_id
+        self.role = role
+        self.is_active = is_active
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+        self._loaders = dict(loaders or {})
+        self._values = {}
+        for name, value in (("groups", groups), ("perms", perms), ("chat_rooms", chat_rooms)):
+            if name not in self._loaders:
+                self._values[name] = frozenset(value)
+
+    def _get(self, name):
+        value = self._values.get(name)
+        if value is None:
+            value = self._values[name] = frozenset(self._loaders.pop(name)())
+        return value
+
+    def resolve(self):
+        """Carga lo pendiente (antes de guardarlo en la caché: los loaders no se serializan)."""
+        for name in LAZY_FIELDS:
+            self._get(name)
+        return self
+
+    def __getstate__(self):
+        self.resolve()
+        return self.__dict__
+
+    @property
+    def group_names(self):
+        return sorted(self._get("groups"))
+
+    @property
+    def groups(self):
+        return frozenset(g.lower() for g in self._get("groups"))
+
+    @property
+    def perms(self):
+        return self._get("perms")
+
+    @property
+    def chat_rooms(self):
+        return self._get("chat_rooms")
+
+    def has_perm(self, perm):
+        """Igual que User.has_perm con el backend de modelos (superusuario activo => todo)."""
+        if not self.is_active:
+            return False
+        return self.is_superuser or perm in self.perms
+
+    def in_any_group(self, names):
+        return bool(self.groups & names)
+
+    def is_chat_member(self, chat_room_id):
+        return chat_room_id in self.chat_rooms
+
+
+ANONYMOUS = AuthzContext()
+
+
+def _ttl():
+    return getattr(settings, "AUTHZ_CACHE_TTL", CONTEXT_TTL)
+
+
+def cache_is_shared():
+    """
+    ¿La caché por defecto la ven todos los workers? Con LocMem (o Dummy) una
+    invalidación solo llega al proceso que la hizo: lo que dependa de ella
+    no debe cachearse entre requests.
+    """
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def _user_version_key(user_id):
+    return f"authz:v:{user_id}"
+
+
+def _versions(user_id):
+    """(global, usuario). Si una versión se perdió del cache se crea una nueva (nunca se reusa una vieja)."""
+    keys = [GLOBAL_VERSION_KEY, _user_version_key(user_id)]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, uuid.uuid4().hex, None)
+            found[key] = cache.get(key)
+    return found[keys[0]], found[keys[1]]
+
+
+def _build(user):
+    """Contexto con grupos, permisos y salas diferidos: cada uno es una consulta al primer uso."""
+    def perms():
+        rows = (
+            Permission.objects
+            .filter(Q(user=user) | Q(group__user=user))
+            .values_list("content_type__app_label", "codename")
+            .distinct()
+        )
+        return [f"{app}.{codename}" for app, codename in rows]
+
+    def chat_rooms():
+        through = apps.get_model("housekeeping", "ChatRoom").participants.through
+        return through.objects.filter(user_id=user.pk).values_list("chatroom_id", flat=True)
+
+    return AuthzContext(
+        user_id=user.pk,
+        role=getattr(user, "role", ""),
+        is_active=user.is_active,
+        is_staff=user.is_staff,
+        is_superuser=user.is_superuser,
+        loaders={
+            "groups": lambda: user.groups.values_list("name", flat=True),
+            "perms": perms,
+            "chat_rooms": chat_rooms,
+        },
+    )
+
+
+def get_authz(user):
+    """
+    Contexto de autorización del usuario, cacheado bajo la versión vigente:
+    cambiar grupos, permisos, rol o salas de chat genera una versión nueva y
+    el contexto viejo deja de leerse. En la instancia queda memorizado junto
+    con su versión, así las verificaciones siguientes solo leen las versiones.
+    Requiere caché compartida (settings.REDIS_URL): sin ella las versiones
+    serían por proceso y otro worker seguiría viendo membresías ya quitadas
+    hasta AUTHZ_CACHE_TTL, así que el contexto se lee de la base por request,
+    y solo lo que se pregunta (diferido, ver AuthzContext).
+    """
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS
+    if not cache_is_shared():
+        # Sin caché compartida se arma desde la base una vez por request (la
+        # instancia de usuario es del request): nunca queda un contexto viejo
+        memo = getattr(user, "_authz", None)
+        if memo is None:
+            memo = user._authz = (None, _build(user))
+        return memo[1]
+    versions = _versions(user.pk)
+    memo = getattr(user, "_authz", None)
+    if memo is not None and memo[0] == versions:
+        return memo[1]
+    key = f"authz:ctx:{user.pk}:{versions[0]}:{versions[1]}"
+    ctx = cache.get(key)
+    if ctx is None:
+        # en la caché va completo: se arma una vez por versión y lo leen todos los workers
+        ctx = _build(user).resolve()
+        cache.set(key, ctx, _ttl())
+    user._authz = (versions, ctx)
+    return ctx
+
+
+def _bump(keys):
+    def bump():
+        cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+    # tras el commit: si no, otro request podría cachear datos viejos bajo la versión nueva
+    transaction.on_commit(bump)
+
+
+def invalidate_users(user_ids):
+    """Cambió algo de estos usuarios (grupos, permisos propios, rol, membresías)."""
+    keys = [_user_version_key(u) for u in user_ids if u is not None]
+    if keys:
+        _bump(keys)
+
+
+def invalidate_all():
+    """Cambió algo que afecta a muchos (permisos de un grupo, grupo borrado)."""
+    _bump([GLOBAL_VERSION_KEY])
@@ -13,6 +13,8 @@ class User(AbstractUser):
         MAINTENANCE = "MAINTENANCE", "Maintenance"
 
     role = models.CharField(max_length=20, choices=Roles.choices, default=Roles.HOUSEKEEPER)
+    # Va en el claim "ver" de los JWT; subirlo revoca todos los tokens emitidos
+    token_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"{self.username} ({self.role})"
\ No newline at end of file
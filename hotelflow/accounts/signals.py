@@ -0,0 +1,61 @@
+# accounts/signals.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .authentication import forget_user
+from .authz import invalidate_all, invalidate_users
+
+User = get_user_model()
+
+# Campos de User que entran en el contexto de autorización
+AUTHZ_FIELDS = {"role", "is_active", "is_staff", "is_superuser"}
+
+
+@receiver(post_init, sender=User)
+def user_init(sender, instance, **kwargs):
+    instance._token_version_snapshot = instance.__dict__.get("token_version")
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # el login solo toca last_login: no invalida
+    if created or (update_fields is not None and set(update_fields) <= {"last_login"}):
+        return
+    # usuario cacheado por la autenticación JWT (versión anterior y actual)
+    forget_user(instance.pk, *{getattr(instance, "_token_version_snapshot", None), instance.token_version} - {None})
+    instance._token_version_snapshot = instance.token_version
+    if update_fields is None or AUTHZ_FIELDS & set(update_fields):
+        invalidate_users([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_users([instance.pk])
+    elif pk_set:
+        invalidate_users(pk_set)          # group.user_set.add(...) / permission.user_set...
+    else:
+        invalidate_all()                  # clear() desde el grupo/permiso: no sabemos a quiénes
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    if action.startswith("post_"):
+        invalidate_all()
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, created, **kwargs):
+    # renombrar un grupo cambia group_names/in_any_group de todos sus miembros
+    if not created:
+        invalidate_all()
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, **kwargs):
+    invalidate_all()
@@ -1,3 +1,148 @@
-from django.test import TestCase
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from housekeeping.models import ChatRoom
+
+from .authz import cache_is_shared, get_authz
+
+
+class AuthzTestMixin:
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(username="hk", password="x", role="HOUSEKEEPER")
+        self.room = ChatRoom.objects.create(room_type="HK_INTERNAL", name="x")
+        self.room.participants.add(self.user)
+
+    def _fresh_user(self):
+        # cada request carga su propia instancia del usuario
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def test_memoized_per_instance(self):
+        user = self._fresh_user()
+        get_authz(user).is_chat_member(self.room.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            get_authz(user).is_chat_member(self.room.pk)
+        self.assertEqual(len(ctx), 0)
+
+
+class LocalCacheAuthzTests(AuthzTestMixin, TestCase):
+    def test_membership_is_read_from_db(self):
+        self.assertFalse(cache_is_shared())
+        self.assertTrue(get_authz(self._fresh_user()).is_chat_member(self.room.pk))
+        # sin ejecutar los on_commit (como otro worker que no recibió la invalidación)
+        self.room.participants.remove(self.user)
+        self.assertFalse(get_authz(self._fresh_user()).is_chat_member(self.room.pk))
+
+
+    def test_loads_only_what_is_asked(self):
+        ctx = get_authz(self._fresh_user())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(ctx.in_any_group({"supervisor"}))
+        self.assertEqual(len(queries), 1)  # solo grupos: ni permisos ni salas de chat
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(ctx.is_chat_member(self.room.pk))
+            self.assertFalse(ctx.in_any_group({"supervisor"}))
+        self.assertEqual(len(queries), 1)
+
+    def test_superuser_skips_permission_query(self):
+        user = get_user_model().objects.create_superuser(username="root", password="x")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(get_authz(user).has_perm("housekeeping.change_room"))
+        self.assertEqual(len(queries), 0)
+
+
+class SharedCacheMixin:
+    """Caché que verían todos los procesos (aquí de archivos, en lugar de redis)."""
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        override = override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location,
+        }})
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+        super().setUp()
+
+
+class SharedCacheAuthzTests(SharedCacheMixin, AuthzTestMixin, TestCase):
+
+    def test_cached_context_and_invalidation(self):
+        self.assertTrue(cache_is_shared())
+        self.assertTrue(get_authz(self._fresh_user()).is_chat_member(self.room.pk))
+        user = self._fresh_user()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(get_authz(user).is_chat_member(self.room.pk))
+        self.assertEqual(len(ctx), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.participants.remove(self.user)
+        self.assertFalse(get_authz(self._fresh_user()).is_chat_member(self.room.pk))
+
+    def test_group_rename_invalidates(self):
+        group = Group.objects.create(name="housekeepers")
+        self.user.groups.add(group)
+        self.assertEqual(get_authz(self._fresh_user()).group_names, ["housekeepers"])
+        group.name = "maintenance"
+        with self.captureOnCommitCallbacks(execute=True):
+            group.save()
+        self.assertEqual(get_authz(self._fresh_user()).group_names, ["maintenance"])
+
+
+class JWTRevocationTestMixin:
+    me_url = "/api/housekeeping/accounts/me/"
+    revoke_url = "/api/auth/token/revoke/"
+
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="hk", password="pw")
+        self.other = User.objects.create_user(username="other", password="pw")
+
+    def _client(self, username="hk"):
+        tokens = APIClient().post("/api/auth/token/", {"username": username, "password": "pw"}, format="json").data
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        return client, tokens
+
+    def test_revoke_rejects_old_access_and_refresh(self):
+        client, tokens = self._client()
+        self.assertEqual(client.get(self.me_url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post(self.revoke_url).status_code, 200)
+        self.assertEqual(client.get(self.me_url).status_code, 401)
+        r = APIClient().post("/api/auth/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(r.status_code, 401)
+        fresh, _ = self._client()
+        self.assertEqual(fresh.get(self.me_url).status_code, 200)
+
+    def test_revoke_user_field_parsing(self):
+        client, _ = self._client()
+        # el propio id como texto (multipart) no es "otro usuario"
+        r = client.post(self.revoke_url, {"user": str(self.user.pk)}, format="multipart")
+        self.assertEqual(r.status_code, 200)
+        client, _ = self._client()
+        self.assertEqual(client.post(self.revoke_url, {"user": "abc"}, format="json").status_code, 400)
+        self.assertEqual(client.post(self.revoke_url, {"user": self.other.pk}, format="json").status_code, 403)
+
+
+class JWTRevocationTests(JWTRevocationTestMixin, TestCase):
+    pass
+
+
+class SharedCacheJWTRevocationTests(SharedCacheMixin, JWTRevocationTestMixin, TestCase):
+    def test_user_is_cached(self):
+        client, _ = self._client()
+        client.get(self.me_url)
+        with CaptureQueriesContext(connection) as ctx:
+            client.get(self.me_url)
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "accounts_user"' in q["sql"]])
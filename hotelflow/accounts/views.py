@@ -3,13 +3,19 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt import views as jwt_views
+
+from .authentication import VersionedTokenObtainSerializer, VersionedTokenRefreshSerializer, revoke_tokens
+from .authz import get_authz
+
 # Create your views here.
 class MeView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         u = request.user
-        groups = list(u.groups.values_list("name", flat=True))
+        groups = get_authz(u).group_names
         return Response({
             "id": u.id,
             "username": u.username,
@@ -19,4 +25,40 @@ class MeView(APIView):
             "is_staff": u.is_staff,
             "is_superuser": u.is_superuser,
             "groups": groups,
-        })
\ No newline at end of file
+        })
+
+
+# ==== JWT (app móvil) ====
+class TokenObtainView(jwt_views.TokenObtainPairView):
+    """POST {username, password} -> {access, refresh} con el claim ver (token_version)."""
+    serializer_class = VersionedTokenObtainSerializer
+
+
+class TokenRefreshView(jwt_views.TokenRefreshView):
+    """POST {refresh} -> {access}. Falla si los tokens del usuario fueron revocados."""
+    serializer_class = VersionedTokenRefreshSerializer
+
+
+class TokenRevokeView(APIView):
+    """
+    POST -> revoca todos los tokens del usuario (cerrar sesión en todos los
+    dispositivos). Staff puede revocar los de otro con {"user": id}.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        target = request.user
+        raw = request.data.get("user")
+        if raw not in (None, ""):
+            try:
+                user_id = int(raw)   # multipart/form lo manda como texto
+            except (TypeError, ValueError):
+                return Response({"detail": "user debe ser un id numérico."}, status=400)
+            if user_id != request.user.pk:
+                if not request.user.is_staff:
+                    return Response({"detail": "Solo staff puede revocar tokens de otros usuarios."}, status=403)
+                target = get_user_model().objects.filter(pk=user_id).first()
+                if target is None:
+                    return Response({"detail": "Usuario no encontrado."}, status=404)
+        return Response({"user": target.pk, "token_version": revoke_tokens(target)})
+
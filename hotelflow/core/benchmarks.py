@@ -0,0 +1,233 @@
+# core/benchmarks.py
+import json
+import platform
+import statistics
+import time
+from datetime import timedelta
+from unittest import mock
+
+import django
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.test.utils import override_settings
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from housekeeping.models import ChatMessage, ChecklistItem, HousekeepingTask, IncidentLine, Room
+from scheduling.models import Roster, Shift, StaffProfile
+from scheduling.services.generate import generate_roster
+
+from .instrumentation import RequestStats
+from .synthetic import PREFIX
+
+# nombre -> función(ctx); se registran con @benchmark en el orden de ejecución
+BENCHMARKS = {}
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+class Context:
+    """Datos del hotel sintético que usan los benchmarks (usuarios, semana, zonas)."""
+
+    def __init__(self):
+        User = get_user_model()
+        users = User.objects.filter(username__startswith=f"{PREFIX.lower()}_")
+        self.supervisor = users.filter(role=User.Roles.SUPERVISOR).order_by("pk").first()
+        roster = Roster.objects.filter(shifts__zone__name__startswith=PREFIX).order_by("-week_start").first()
+        if self.supervisor is None or roster is None:
+            raise BenchmarkError("No hay hotel sintético: corre primero `manage.py generate_hotel`.")
+        self.week_start = roster.week_start
+        self.housekeeper = (
+            users.filter(role=User.Roles.HOUSEKEEPER, shift_assignments__shift__roster=roster).order_by("pk").first()
+        )
+        self.day = self.week_start + timedelta(days=min(timezone.localdate().weekday(), 6))
+        self.factory = APIRequestFactory()
+
+    def get(self, path, user):
+        return self.call(self.factory.get(path), path, user)
+
+    def post(self, path, user, data):
+        return self.call(self.factory.post(path, data, format="json"), path, user)
+
+    def call(self, request, path, user):
+        """Llama a la vista como lo haría el router (sin middleware) y renderiza la respuesta."""
+        force_authenticate(request, user=user)
+        match = resolve(path.split("?")[0])
+        response = match.func(request, *match.args, **match.kwargs)
+        response.render()
+        if response.status_code >= 400:
+            raise BenchmarkError(f"{path}: HTTP {response.status_code} {response.content[:200]!r}")
+        return response
+
+
+# =========================================
+# Benchmarks (caminos calientes)
+# =========================================
+
+@benchmark("generate_roster")
+def bench_generate_roster(ctx):
+    generate_roster(Roster.objects.create(week_start=ctx.week_start, version=99))
+
+
+class _StubOpenAI:
+    """Cliente falso con la misma forma que openai.OpenAI: devuelve un plan fijo, sin red."""
+
+    def __init__(self, plan):
+        content = json.dumps(plan)
+        message = type("Message", (), {"content": content})
+        choice = type("Choice", (), {"message": message})
+        completion = type("Completion", (), {"choices": [choice]})
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = type("Completions", (), {"create": staticmethod(lambda **kw: completion)})()
+
+
+def _stub_plan(ctx):
+    """Un turno por zona y día con los miembros del equipo de esa zona (como respondería el LLM)."""
+    shifts = []
+    for sh in Shift.objects.filter(roster__week_start=ctx.week_start, zone__name__startswith=PREFIX).select_related("zone").prefetch_related("team__members"):
+        shifts.append({
+            "date": sh.date.isoformat(), "start": "07:00", "end": "15:00", "zone": sh.zone.name,
+            "team_name": sh.team.name if sh.team else "Team A",
+            "members": [m.pk for m in sh.team.members.all()] if sh.team else [],
+            "planned_minutes": 480,
+        })
+    return {"week_start": ctx.week_start.isoformat(), "shifts": shifts}
+
+
+@benchmark("ai_generate_persist")
+def bench_ai_generate(ctx):
+    if not hasattr(ctx, "stub_plan"):
+        ctx.stub_plan = _stub_plan(ctx)
+    stub = _StubOpenAI(ctx.stub_plan)
+    with override_settings(OPENAI_API_KEY="stub"), mock.patch("scheduling.views.OpenAI", lambda **kw: stub):
+        ctx.post(
+            "/api/housekeeping/scheduling/rosters/ai/generate/", ctx.supervisor,
+            {"week_start": ctx.week_start.isoformat(), "rooms_summary": [], "availability": []},
+        )
+
+
+@benchmark("my_week")
+def bench_my_week(ctx):
+    ctx.get(f"/api/housekeeping/scheduling/my_week/?monday={ctx.week_start.isoformat()}", ctx.housekeeper or ctx.supervisor)
+
+
+@benchmark("supervisor_summary")
+def bench_supervisor_summary(ctx):
+    ctx.get("/api/housekeeping/scheduling/supervisor/summary/", ctx.supervisor)
+
+
+@benchmark("task_list")
+def bench_task_list(ctx):
+    ctx.get(f"/api/housekeeping/tasks/?scheduled_for={ctx.day.isoformat()}", ctx.supervisor)
+
+
+@benchmark("task_list_checklist")
+def bench_task_list_checklist(ctx):
+    ctx.get(f"/api/housekeeping/tasks/?scheduled_for={ctx.day.isoformat()}&include=checklist", ctx.supervisor)
+
+
+@benchmark("incident_summary")
+def bench_incident_summary(ctx):
+    ctx.get("/api/housekeeping/incidents/summary/", ctx.supervisor)
+
+
+@benchmark("chat_room_list")
+def bench_chat_room_list(ctx):
+    ctx.get("/api/housekeeping/chat/rooms/", ctx.supervisor)
+
+
+# =========================================
+# Runner
+# =========================================
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _measure(fn, ctx):
+    """Una corrida dentro de una transacción que se revierte: los benchmarks que escriben no acumulan datos."""
+    stats = RequestStats()
+    with transaction.atomic():
+        with connection.execute_wrapper(stats):
+            t0 = time.perf_counter()
+            fn(ctx)
+            elapsed = (time.perf_counter() - t0) * 1000
+        transaction.set_rollback(True)
+    return elapsed, stats
+
+
+def dataset_counts():
+    return {
+        "rooms": Room.objects.count(),
+        "staff": StaffProfile.objects.count(),
+        "tasks": HousekeepingTask.objects.count(),
+        "checklist_items": ChecklistItem.objects.count(),
+        "incident_lines": IncidentLine.objects.count(),
+        "chat_messages": ChatMessage.objects.count(),
+    }
+
+
+def run_benchmarks(names=None, repeat=5, warmup=1):
+    """
+    Corre los benchmarks (todos o los pedidos) y devuelve un dict serializable:
+    meta (versiones, base, tamaño del dataset) + por benchmark tiempos en ms
+    (min/mediana/p95/max) y consultas/tiempo SQL de la última corrida.
+    """
+    unknown = set(names or ()) - set(BENCHMARKS)
+    if unknown:
+        raise BenchmarkError(f"Benchmarks desconocidos: {', '.join(sorted(unknown))}")
+    ctx = Context()
+    results = {}
+    for name, fn in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        for _ in range(warmup):
+            _measure(fn, ctx)
+        timings = []
+        for _ in range(repeat):
+            elapsed, stats = _measure(fn, ctx)
+            timings.append(elapsed)
+        results[name] = {
+            "runs": repeat,
+            "min_ms": round(min(timings), 2),
+            "median_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(_percentile(timings, 95), 2),
+            "max_ms": round(max(timings), 2),
+            "queries": stats.queries,
+            "sql_ms": round(stats.sql_ms, 2),
+        }
+    return {
+        "meta": {
+            "timestamp": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connections["default"].vendor,
+            "repeat": repeat,
+            "warmup": warmup,
+            "dataset": dataset_counts(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline):
+    """Agrega a cada resultado la mediana del baseline y el cambio en % (positivo = más lento)."""
+    for name, row in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("median_ms"):
+            continue
+        row["baseline_median_ms"] = base["median_ms"]
+        row["change_pct"] = round((row["median_ms"] - base["median_ms"]) / base["median_ms"] * 100, 1)
+        row["baseline_queries"] = base.get("queries")
+    return current
@@ -0,0 +1,187 @@
+# core/instrumentation.py
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Un endpoint hizo más consultas que su query_budget (solo con QUERY_BUDGETS_ENFORCE)."""
+
+
+class RequestStats:
+    __slots__ = ("queries", "sql_ms", "serialize_ms", "started")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.serialize_ms = 0.0
+        self.started = time.perf_counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper: cuenta y cronometra cada consulta de la conexión
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_ms += (time.perf_counter() - t0) * 1000
+            self.queries += 1
+
+
+# =========================================
+# Agregado en proceso (por ruta y método)
+# =========================================
+
+_lock = threading.Lock()
+_routes = {}
+
+
+def record(route, method, status, stats, wall_ms):
+    with _lock:
+        row = _routes.get((route, method))
+        if row is None:
+            row = _routes[(route, method)] = {
+                "route": route, "method": method, "count": 0, "errors": 0,
+                "wall_ms": 0.0, "wall_ms_max": 0.0, "sql_ms": 0.0, "serialize_ms": 0.0,
+                "queries": 0, "queries_max": 0,
+            }
+        row["count"] += 1
+        row["errors"] += status >= 500
+        row["wall_ms"] += wall_ms
+        row["wall_ms_max"] = max(row["wall_ms_max"], wall_ms)
+        row["sql_ms"] += stats.sql_ms
+        row["serialize_ms"] += stats.serialize_ms
+        row["queries"] += stats.queries
+        row["queries_max"] = max(row["queries_max"], stats.queries)
+
+
+def snapshot():
+    """Filas agregadas con promedios, ordenadas por tiempo total (lo que más pesa primero)."""
+    with _lock:
+        rows = [dict(r) for r in _routes.values()]
+    for r in rows:
+        n = r["count"] or 1
+        r["wall_ms_avg"] = round(r["wall_ms"] / n, 2)
+        r["sql_ms_avg"] = round(r["sql_ms"] / n, 2)
+        r["queries_avg"] = round(r["queries"] / n, 2)
+        for key in ("wall_ms", "wall_ms_max", "sql_ms", "serialize_ms"):
+            r[key] = round(r[key], 2)
+    return sorted(rows, key=lambda r: r["wall_ms"], reverse=True)
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+
+
+# =========================================
+# Presupuestos de consultas
+# =========================================
+
+def query_budget(view_func, method):
+    """
+    query_budget declarado en la vista (DRF): un entero para todo, o un dict
+    por acción {"list": 3, "retrieve": 4, "*": 10}. None = sin presupuesto.
+    """
+    cls = getattr(view_func, "cls", None)
+    budget = getattr(cls, "query_budget", None)
+    if not isinstance(budget, dict):
+        return budget
+    action = (getattr(view_func, "actions", None) or {}).get(method.lower(), method.lower())
+    return budget.get(action, budget.get("*"))
+
+
+# =========================================
+# Middleware
+# =========================================
+
+@contextmanager
+def _wrapped(stats):
+    """Instala `stats` como execute_wrapper en todas las conexiones."""
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(stats))
+        yield
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Por request: nº de consultas y tiempo SQL (execute_wrapper en cada
+    conexión), tiempo de render de la respuesta y tiempo total. Agrega por
+    ruta para /api/metrics/requests/; con DEBUG (o REQUEST_STATS_HEADERS) lo
+    devuelve en cabeceras Server-Timing / X-DB-Queries.
+    Si la vista declara query_budget y se supera: warning en el log, y con
+    QUERY_BUDGETS_ENFORCE la request falla (pensado para los tests).
+    Las respuestas en streaming (exports) consultan mientras se envía el
+    cuerpo: se mide hasta agotar el iterador y se registra al cerrarlo. Sus
+    cabeceras ya salieron, así que no llevan X-DB-Queries/Server-Timing y el
+    presupuesto solo avisa en el log.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = request._stats = RequestStats()
+        with _wrapped(stats):
+            response = self.get_response(request)
+        if response.streaming and not getattr(response, "is_async", False):
+            response.streaming_content = self._stream(request, response, stats, response.streaming_content)
+            return response
+        self._finish(request, response, stats, streamed=False)
+        return response
+
+    def _stream(self, request, response, stats, content):
+        try:
+            with _wrapped(stats):
+                yield from content
+        finally:
+            self._finish(request, response, stats, streamed=True)
+
+    def _finish(self, request, response, stats, streamed):
+        wall_ms = (time.perf_counter() - stats.started) * 1000
+        match = request.resolver_match
+        # los routers de DRF usan regex: se quitan ^ y $ para que la ruta se lea como la URL
+        route = (match.route.strip("^$") or match.view_name) if match else "<unresolved>"
+        record(route, request.method, response.status_code, stats, wall_ms)
+        metrics.observe_request(route, request.method, response.status_code, wall_ms, stats)
+
+        if not streamed and getattr(settings, "REQUEST_STATS_HEADERS", settings.DEBUG):
+            response["X-DB-Queries"] = str(stats.queries)
+            response["Server-Timing"] = (
+                f'db;dur={stats.sql_ms:.1f};desc="{stats.queries} queries", '
+                f"render;dur={stats.serialize_ms:.1f}, total;dur={wall_ms:.1f}"
+            )
+
+        budget = getattr(request, "_query_budget", None)
+        if budget is not None and stats.queries > budget:
+            message = f"{request.method} {route}: {stats.queries} consultas (presupuesto {budget})"
+            if not streamed and getattr(settings, "QUERY_BUDGETS_ENFORCE", False):
+                raise QueryBudgetExceeded(message)
+            logger.warning("Presupuesto de consultas excedido: %s", message)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = query_budget(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        # Las Response de DRF se renderizan después de la vista: se cronometra ese paso
+        stats = getattr(request, "_stats", None)
+        if stats is None:
+            return response
+        render = response.render
+
+        def timed_render():
+            t0 = time.perf_counter()
+            try:
+                return render()
+            finally:
+                stats.serialize_ms += (time.perf_counter() - t0) * 1000
+        response.render = timed_render
+        return response
@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import BENCHMARKS, BenchmarkError, compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide los caminos calientes sobre el hotel sintético (generate_hotel) y emite JSON "
+        "para comparar corridas: " + ", ".join(BENCHMARKS)
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Benchmarks a correr (por defecto todos)")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--warmup", type=int, default=1)
+        parser.add_argument("--output", type=str, help="Escribe el JSON en este archivo")
+        parser.add_argument("--compare", type=str, help="JSON de una corrida anterior para ver el cambio")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat debe ser >= 1")
+        try:
+            result = run_benchmarks(options["names"] or None, repeat=options["repeat"], warmup=options["warmup"])
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as fh:
+                    result = compare(result, json.load(fh))
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer {options['compare']}: {e}")
+
+        payload = json.dumps(result, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                fh.write(payload + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Resultados en {options['output']}"))
+        else:
+            self.stdout.write(payload)
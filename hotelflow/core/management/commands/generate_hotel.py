@@ -0,0 +1,65 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import PREFIX, clear_hotel, generate_hotel
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un hotel sintético (habitaciones, personal, disponibilidad, tareas con checklist, "
+        "roster, inventario, incidencias y chat) con bulk inserts, para benchmarks y pruebas de carga."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=300)
+        parser.add_argument("--floors", type=int, default=10)
+        parser.add_argument("--zones", type=int, default=4)
+        parser.add_argument("--staff", type=int, default=40)
+        parser.add_argument("--days", type=int, default=14, help="Días de tareas desde el lunes de esta semana")
+        parser.add_argument("--chat-rooms", type=int, default=20)
+        parser.add_argument("--messages", type=int, default=2000)
+        parser.add_argument("--items", type=int, default=40, help="Ítems de inventario")
+        parser.add_argument("--incidents", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--reset", action="store_true", help=f"Borra antes el hotel sintético ({PREFIX}*)")
+        parser.add_argument("--clear", action="store_true", help="Solo borra el hotel sintético")
+        parser.add_argument("--json", action="store_true", help="Imprime el resultado como JSON")
+        parser.add_argument("--password", default=None,
+                            help="Contraseña de los usuarios sintéticos (por defecto, inutilizable)")
+        parser.add_argument("--force", action="store_true", help="Permite correrlo con DEBUG=False")
+
+    def handle(self, *args, **options):
+        # crea supervisores staff: nunca por accidente contra una base de producción
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("DEBUG=False: generate_hotel solo corre con --force.")
+        if options["clear"] or options["reset"]:
+            deleted = clear_hotel()
+            if options["clear"]:
+                self.stdout.write(self.style.SUCCESS(f"Hotel sintético borrado ({deleted} filas)."))
+                return
+        for key in ("rooms", "floors", "zones", "staff", "days"):
+            if options[key] < 1:
+                raise CommandError(f"--{key} debe ser >= 1")
+
+        started = time.perf_counter()
+        try:
+            counts = generate_hotel(
+                rooms=options["rooms"], floors=options["floors"], zones=options["zones"],
+                staff=options["staff"], days=options["days"], chat_rooms=options["chat_rooms"],
+                messages=options["messages"], items=options["items"], incidents=options["incidents"],
+                seed=options["seed"], password=options["password"],
+            )
+        except Exception as e:
+            raise CommandError(f"No se pudo generar (¿ya existe? usa --reset): {e}")
+        counts["seconds"] = round(time.perf_counter() - started, 2)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(counts))
+            return
+        for k, v in counts.items():
+            self.stdout.write(f"{k}: {v}")
+        login = "con la contraseña de --password" if options["password"] else "sin contraseña utilizable"
+        self.stdout.write(self.style.SUCCESS(f"Hotel sintético listo. Usuarios {PREFIX.lower()}_NNNN, {login}."))
@@ -0,0 +1,297 @@
+# core/metrics.py
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_lock = threading.Lock()
+
+
+# =========================================
+# Almacenamiento de valores
+# - sin directorio: dict en memoria del proceso
+# - METRICS_MULTIPROC_DIR: un archivo mmap por proceso (pid), /metrics suma todos
+# =========================================
+
+class _MemoryStore:
+    def __init__(self):
+        self._values = defaultdict(float)
+
+    def add_many(self, pairs):
+        for key, amount in pairs:
+            self._values[key] += amount
+
+    def values(self):
+        return dict(self._values)
+
+
+class _MmapStore:
+    """
+    Archivo propio del proceso: [usados: int32][pad] y entradas
+    [largo: int32][clave utf-8 + relleno a 8][valor: double]. Solo escribe el
+    dueño (con _lock entre hilos); los lectores ven `usados` recién después de
+    escrita la entrada completa.
+    """
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a+b")
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(self.INITIAL_SIZE)
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), self._size)
+        self._used = struct.unpack_from("i", self._mm, 0)[0] or 8
+        self._index = {key: offset for key, _, offset in _read_entries(self._mm, self._used)}
+        if struct.unpack_from("i", self._mm, 0)[0] == 0:
+            struct.pack_into("i", self._mm, 0, self._used)
+
+    def _append(self, key):
+        raw = key.encode("utf-8")
+        padded = len(raw) + (8 - (len(raw) + 4) % 8) % 8
+        needed = self._used + 4 + padded + 8
+        if needed > self._size:
+            while self._size < needed:
+                self._size *= 2
+            self._mm.close()
+            self._file.truncate(self._size)
+            self._mm = mmap.mmap(self._file.fileno(), self._size)
+        struct.pack_into(f"i{padded}sd", self._mm, self._used, len(raw), raw, 0.0)
+        offset = self._used + 4 + padded
+        self._used = needed
+        struct.pack_into("i", self._mm, 0, self._used)
+        self._index[key] = offset
+        return offset
+
+    def add_many(self, pairs):
+        for key, amount in pairs:
+            offset = self._index.get(key)
+            if offset is None:
+                offset = self._append(key)
+            value = struct.unpack_from("d", self._mm, offset)[0]
+            struct.pack_into("d", self._mm, offset, value + amount)
+
+    def values(self):
+        return dict((key, value) for key, value, _ in _read_entries(self._mm, self._used))
+
+
+def _read_entries(data, used):
+    pos = 8
+    while pos + 4 <= used:
+        length = struct.unpack_from("i", data, pos)[0]
+        padded = length + (8 - (length + 4) % 8) % 8
+        key = bytes(data[pos + 4:pos + 4 + length]).decode("utf-8")
+        offset = pos + 4 + padded
+        yield key, struct.unpack_from("d", data, offset)[0], offset
+        pos = offset + 8
+
+
+def _multiproc_dir():
+    return getattr(settings, "METRICS_MULTIPROC_DIR", "") or ""
+
+
+_store = None
+_store_pid = None
+
+
+def _get_store():
+    # tras un fork (gunicorn --preload) el hijo abre su propio archivo
+    global _store, _store_pid
+    if _store is None or _store_pid != os.getpid():
+        directory = _multiproc_dir()
+        _store = _MmapStore(os.path.join(directory, f"{os.getpid()}.db")) if directory else _MemoryStore()
+        _store_pid = os.getpid()
+    return _store
+
+
+def _add(pairs):
+    with _lock:
+        _get_store().add_many(pairs)
+
+
+def collect():
+    """Valores sumados de todos los procesos (o solo de este, sin directorio compartido)."""
+    directory = _multiproc_dir()
+    if not directory:
+        with _lock:
+            return _get_store().values()
+    totals = defaultdict(float)
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+        except OSError:
+            continue
+        if len(data) < 8:
+            continue
+        for key, value, _ in _read_entries(data, struct.unpack_from("i", data, 0)[0]):
+            totals[key] += value
+    return dict(totals)
+
+
+# =========================================
+# Métricas
+# =========================================
+
+REGISTRY = []
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys = {}
+        REGISTRY.append(self)
+
+    def _label_values(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels esperadas {self.labelnames}, recibidas {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _key(self, suffix, values, extra=None):
+        cache_key = (suffix, values, extra)
+        key = self._keys.get(cache_key)
+        if key is None:
+            key = self._keys[cache_key] = json.dumps([self.name, suffix, list(values), extra])
+        return key
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Un counter solo sube")
+        _add([(self._key("", self._label_values(labels)), amount)])
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        values = self._label_values(labels)
+        # se guarda el bucket propio (no acumulado); el render acumula
+        index = next((i for i, b in enumerate(self.buckets) if value <= b), len(self.buckets))
+        _add([
+            (self._key("_bucket", values, index), 1),
+            (self._key("_sum", values), value),
+            (self._key("_count", values), 1),
+        ])
+
+
+# =========================================
+# Exposición (formato de texto de Prometheus)
+# =========================================
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+def _number(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render():
+    values = collect()
+    by_metric = defaultdict(list)
+    for key, value in values.items():
+        name, suffix, label_values, extra = json.loads(key)
+        by_metric[name].append((suffix, tuple(label_values), extra, value))
+
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        samples = by_metric.get(metric.name, [])
+        if metric.type == "counter":
+            for _, label_values, _, value in sorted(samples):
+                lines.append(f"{metric.name}{_labels(metric.labelnames, label_values)} {_number(value)}")
+            continue
+        series = defaultdict(lambda: {"buckets": defaultdict(float), "_sum": 0.0, "_count": 0.0})
+        for suffix, label_values, extra, value in samples:
+            if suffix == "_bucket":
+                series[label_values]["buckets"][extra] += value
+            else:
+                series[label_values][suffix] += value
+        for label_values in sorted(series):
+            row = series[label_values]
+            cumulative = 0.0
+            for i, bound in enumerate(metric.buckets + (math.inf,)):
+                cumulative += row["buckets"].get(i, 0.0)
+                le = (("le", _number(bound)),)
+                lines.append(f"{metric.name}_bucket{_labels(metric.labelnames, label_values, le)} {_number(cumulative)}")
+            lines.append(f"{metric.name}_sum{_labels(metric.labelnames, label_values)} {_number(row['_sum'])}")
+            lines.append(f"{metric.name}_count{_labels(metric.labelnames, label_values)} {_number(row['_count'])}")
+    return "\n".join(lines) + "\n"
+
+
+# =========================================
+# Métricas de la app
+# =========================================
+
+HTTP_REQUESTS = Counter("http_requests_total", "Requests HTTP por ruta, método y status.", ["route", "method", "status"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Latencia de requests HTTP.", ["route", "method"])
+DB_QUERIES = Counter("db_queries_total", "Consultas SQL ejecutadas por requests.", ["route", "method"])
+DB_QUERY_SECONDS = Counter("db_query_seconds_total", "Tiempo en SQL de los requests.", ["route", "method"])
+ROSTER_GENERATION = Histogram(
+    "roster_generation_seconds", "Duración de la generación de rosters.", ["source"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+CHAT_MESSAGES = Counter("chat_messages_total", "Mensajes de chat enviados.")
+CHAT_FANOUT = Histogram(
+    "chat_message_fanout_recipients", "Destinatarios por mensaje (participantes menos el emisor).",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250),
+)
+INVENTORY_MOVEMENTS = Counter("inventory_movements_total", "Movimientos de inventario registrados.", ["type"])
+INVENTORY_UNITS = Counter("inventory_movement_units_total", "Unidades movidas en inventario.", ["type"])
+
+
+def observe_request(route, method, status, wall_ms, stats):
+    """Llamado por RequestInstrumentationMiddleware al final de cada request."""
+    HTTP_REQUESTS.inc(route=route, method=method, status=status)
+    HTTP_LATENCY.observe(wall_ms / 1000, route=route, method=method)
+    if stats.queries:
+        DB_QUERIES.inc(stats.queries, route=route, method=method)
+        DB_QUERY_SECONDS.inc(stats.sql_ms / 1000, route=route, method=method)
+
+
+def observe_chat_message(participants):
+    """Un mensaje ya confirmado (llamar en on_commit) en una sala con `participants` miembros."""
+    CHAT_MESSAGES.inc()
+    CHAT_FANOUT.observe(max(participants - 1, 0))
+
+
+def observe_movements(movements):
+    """Cuenta movimientos ya confirmados (llamar en on_commit)."""
+    per_type = defaultdict(lambda: [0, 0])
+    for mv in movements:
+        per_type[mv.type][0] += 1
+        per_type[mv.type][1] += int(mv.quantity)
+    for type_, (count, units) in per_type.items():
+        INVENTORY_MOVEMENTS.inc(count, type=type_)
+        INVENTORY_UNITS.inc(units, type=type_)
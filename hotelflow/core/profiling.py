@@ -0,0 +1,164 @@
+# core/profiling.py
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+HEADER = "HTTP_X_PROFILE"       # cabecera X-Profile: 1 (solo cuenta si el usuario es staff)
+BUFFER_SIZE = 20                # settings.PROFILING_BUFFER_SIZE
+
+_lock = threading.Lock()
+_buffer = deque(maxlen=BUFFER_SIZE)
+_ids = itertools.count(1)
+# cProfile no admite dos perfiles activos a la vez (3.12+: es global): uno por vez, el resto sigue sin perfil
+_running = threading.Lock()
+
+
+class ProfileRecord:
+    __slots__ = ("id", "created_at", "method", "path", "view", "status", "trigger", "user_id",
+                 "wall_ms", "queries", "sql_ms", "stats")
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def as_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__ if key != "stats"} | {"size": len(self.stats)}
+
+    def summary(self, limit=30, sort="cumulative"):
+        """Top de funciones en texto (lo mismo que imprimiría pstats)."""
+        out = io.StringIO()
+        ps = pstats.Stats(_Loaded(self.stats), stream=out)
+        ps.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+class _Loaded:
+    """Adaptador para que pstats.Stats cargue estadísticas ya serializadas."""
+
+    def __init__(self, data):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
+
+
+def _buffer_size():
+    return max(1, int(getattr(settings, "PROFILING_BUFFER_SIZE", BUFFER_SIZE)))
+
+
+def store(record):
+    global _buffer
+    with _lock:
+        if _buffer.maxlen != _buffer_size():
+            _buffer = deque(_buffer, maxlen=_buffer_size())
+        record.id = next(_ids)
+        _buffer.append(record)
+    return record.id
+
+
+def profiles():
+    with _lock:
+        return list(reversed(_buffer))
+
+
+def get_profile(profile_id):
+    with _lock:
+        return next((p for p in _buffer if p.id == profile_id), None)
+
+
+def clear():
+    with _lock:
+        _buffer.clear()
+
+
+def _header_user(request):
+    """
+    Usuario que manda X-Profile, antes de la vista: la sesión o, si no, la
+    autenticación de DRF (JWT/Basic). Sin efectos sobre la request: request.user
+    queda como estaba y la vista vuelve a autenticar como siempre.
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user
+    try:
+        return Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]).user
+    except APIException:
+        return None
+    finally:
+        # el setter de Request.user también escribe request.user
+        if user is not None:
+            request.user = user
+        else:
+            request.__dict__.pop("user", None)
+
+
+class ProfilingMiddleware:
+    """
+    cProfile alrededor de la vista (va último en MIDDLEWARE) para una fracción
+    muestreada de requests (PROFILING_SAMPLE_RATE) o cuando un usuario staff
+    manda X-Profile: 1. El perfil queda en un buffer circular en memoria con
+    vista, tiempos y consultas (de RequestInstrumentationMiddleware) y se baja
+    desde /api/profiles/. Desactivado cuesta una comparación y un dict lookup.
+    Solo cuenta X-Profile: 1, y el usuario (sesión o JWT/Basic) se resuelve
+    antes de perfilar: si no es staff la cabecera se ignora sin tocar cProfile
+    ni el lock, así un cliente cualquiera no puede cargar el profiler.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0)
+        user = _header_user(request) if request.META.get(HEADER) == "1" else None
+        if user is not None and user.is_authenticated and user.is_staff:
+            trigger = "header"
+        elif rate > 0 and random.random() < rate:
+            trigger = "sample"
+        else:
+            return self.get_response(request)
+        if not _running.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profiler = cProfile.Profile()
+            stats = getattr(request, "_stats", None)
+            queries0, sql0 = (stats.queries, stats.sql_ms) if stats else (0, 0.0)
+            t0 = time.perf_counter()
+            response = profiler.runcall(self.get_response, request)
+            wall_ms = (time.perf_counter() - t0) * 1000
+            profiler.create_stats()
+        finally:
+            _running.release()
+
+        if trigger == "sample":
+            user = getattr(request, "user", None)
+        match = request.resolver_match
+        profile_id = store(ProfileRecord(
+            id=None,
+            created_at=timezone.now().isoformat(),
+            method=request.method,
+            path=request.get_full_path(),
+            view=(match.view_name or match._func_path) if match else None,
+            status=response.status_code,
+            trigger=trigger,
+            user_id=getattr(user, "pk", None),
+            wall_ms=round(wall_ms, 2),
+            queries=(stats.queries - queries0) if stats else None,
+            sql_ms=round(stats.sql_ms - sql0, 2) if stats else None,
+            stats=marshal.dumps(profiler.stats),
+        ))
+        if trigger == "header":
+            response["X-Profile-Id"] = str(profile_id)
+        return response
@@ -0,0 +1,253 @@
+# core/synthetic.py
+import math
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.utils import timezone
+
+from housekeeping.models import (
+    ChatMessage, ChatRoom, ChecklistItem, HousekeepingTask, IncidentLine, IncidentReport,
+    InventoryItem, InventoryMovement, Room,
+)
+from housekeeping.checklists import deferred_counters
+from housekeeping.rollups import backfill_rollups
+from scheduling.models import (
+    AvailabilityRule, Leave, Roster, Shift, ShiftAssignment, StaffProfile, TaskAssignment, Team, Zone,
+)
+
+# Todo lo sintético lleva este prefijo: convive con datos reales y se borra sin tocarlos
+PREFIX = "SYN"
+BATCH = 1000
+
+CHECKLIST_TEXTS = [
+    "Cambiar sábanas", "Cambiar toallas", "Limpiar baño", "Aspirar", "Vaciar papeleras",
+    "Reponer amenities", "Revisar minibar", "Limpiar vidrios", "Ventilar", "Revisar luces",
+]
+ITEM_NAMES = ["Sábana", "Toalla", "Almohada", "Jabón", "Champú", "Papel higiénico", "Vaso", "Control remoto"]
+CHAT_LINES = ["Hab. lista", "¿Alguien en el piso?", "Falta reposición", "Voy para allá", "Ok", "Revisado"]
+
+
+def _zone_name(i):
+    return f"{PREFIX} Zona {i + 1}"
+
+
+def clear_hotel():
+    """
+    Borra el hotel sintético (todo lo que cuelga de habitaciones, usuarios,
+    zonas e ítems con prefijo) y devuelve cuántas filas borró. Todo va por la
+    cascada normal (las incidencias descuentan el rollup, las fotos liberan sus
+    blobs); los contadores de checklist se difieren a un único recuento.
+    """
+    User = get_user_model()
+    room_prefix = f"{PREFIX}-"
+    deleted = 0
+    with transaction.atomic(), deferred_counters():
+        deleted += Roster.objects.filter(
+            pk__in=Shift.objects.filter(zone__name__startswith=PREFIX).values("roster_id")
+        ).delete()[0]
+        deleted += Team.objects.filter(name__startswith=PREFIX).delete()[0]
+        deleted += IncidentReport.objects.filter(room__number__startswith=room_prefix).delete()[0]
+        deleted += ChatRoom.objects.filter(name__startswith=PREFIX).delete()[0]
+        deleted += Room.objects.filter(number__startswith=room_prefix).delete()[0]
+        deleted += InventoryItem.objects.filter(sku__startswith=room_prefix).delete()[0]
+        deleted += Zone.objects.filter(name__startswith=PREFIX).delete()[0]
+        deleted += User.objects.filter(username__startswith=f"{PREFIX.lower()}_").delete()[0]
+    return deleted
+
+
+def generate_hotel(rooms=300, floors=10, zones=4, staff=40, days=14, chat_rooms=20, messages=2000,
+                   items=40, incidents=200, seed=0, password=None):
+    """
+    Hotel sintético con bulk_create (sin señales): zonas, habitaciones por piso,
+    personal con perfil/disponibilidad/licencias, tareas con checklist desde el
+    lunes de esta semana, roster de la semana (equipos por zona, turnos y
+    asignaciones), inventario con su ledger, incidencias (+ rollup) y chat.
+    Los contadores que normalmente mantienen las señales (checklist_total/done,
+    stock, rollup) se calculan aquí. Sin `password` los usuarios quedan con
+    contraseña inutilizable (los benchmarks autentican con force_authenticate).
+    Devuelve cuántas filas creó por modelo.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    monday = timezone.localdate() - timedelta(days=timezone.localdate().weekday())
+    counts = {}
+
+    with transaction.atomic():
+        # —— zonas y habitaciones
+        zone_objs = Zone.objects.bulk_create([Zone(name=_zone_name(i)) for i in range(zones)])
+        per_floor = math.ceil(rooms / floors)
+        room_objs = Room.objects.bulk_create([
+            Room(
+                number=f"{PREFIX}-{i // per_floor + 1:02}{i % per_floor + 1:03}",
+                floor=i // per_floor + 1,
+                zone=zone_objs[(i // per_floor) % zones].name,
+                category=rng.choices(list(Room.Category.values), weights=[70, 20, 10])[0],
+                status=rng.choices(list(Room.Status.values), weights=[40, 10, 40, 8, 2])[0],
+            )
+            for i in range(rooms)
+        ], batch_size=BATCH)
+        counts["rooms"] = len(room_objs)
+
+        # —— personal: 1 supervisor cada 10, el resto housekeepers (y algo de mantenimiento)
+        password = make_password(password)   # None -> inutilizable
+        users = []
+        for i in range(staff):
+            role = (
+                User.Roles.SUPERVISOR if i % 10 == 0
+                else User.Roles.MAINTENANCE if i % 10 == 9
+                else User.Roles.HOUSEKEEPER
+            )
+            users.append(User(
+                username=f"{PREFIX.lower()}_{i + 1:04}", password=password, role=role,
+                first_name="Staff", last_name=f"{i + 1:04}", is_staff=role == User.Roles.SUPERVISOR,
+            ))
+        users = User.objects.bulk_create(users, batch_size=BATCH)
+        counts["users"] = len(users)
+        hk_group, _ = Group.objects.get_or_create(name="housekeepers")
+        User.groups.through.objects.bulk_create(
+            [User.groups.through(user_id=u.pk, group_id=hk_group.pk) for u in users], batch_size=BATCH
+        )
+        housekeepers = [u for u in users if u.role == User.Roles.HOUSEKEEPER]
+        zone_staff = {z.pk: housekeepers[i::zones] for i, z in enumerate(zone_objs)}
+
+        profiles = StaffProfile.objects.bulk_create([StaffProfile(user=u) for u in users], batch_size=BATCH)
+        StaffProfile.preferred_zones.through.objects.bulk_create([
+            StaffProfile.preferred_zones.through(staffprofile_id=p.pk, zone_id=z.pk)
+            for z in zone_objs for p in profiles if p.user in zone_staff[z.pk]
+        ], batch_size=BATCH)
+        rules = []
+        for u in users:
+            early = rng.random() < 0.6
+            for wd in rng.sample(range(7), 5):
+                rules.append(AvailabilityRule(
+                    user=u, weekday=wd,
+                    start=time(7) if early else time(14), end=time(15) if early else time(22),
+                    preferred_shift="AM" if early else "PM",
+                ))
+        counts["availability_rules"] = len(AvailabilityRule.objects.bulk_create(rules, batch_size=BATCH))
+        leaves = []
+        for u in rng.sample(users, max(1, staff // 10)):
+            start = timezone.make_aware(datetime.combine(monday + timedelta(days=rng.randrange(days)), time(0)))
+            leaves.append(Leave(user=u, start=start, end=start + timedelta(days=rng.randint(1, 3)), reason="Vacaciones"))
+        counts["leaves"] = len(Leave.objects.bulk_create(leaves))
+
+        # —— tareas con checklist
+        T, S = HousekeepingTask.TaskType, HousekeepingTask.Status
+        today = timezone.localdate()
+        tasks = []
+        for d in range(days):
+            day = monday + timedelta(days=d)
+            for room in room_objs:
+                roll = rng.random()
+                if roll < 0.35:
+                    task_type = T.TURNOVER
+                elif roll < 0.75:
+                    task_type = T.AMENITIES
+                elif roll < 0.78:
+                    task_type = T.DEEP_CLEAN
+                else:
+                    continue
+                status = S.PENDING if day > today else rng.choice([S.PENDING, S.IN_PROGRESS, S.DONE, S.DONE])
+                tasks.append(HousekeepingTask(
+                    room=room, title=f"{task_type.label} · Hab. {room.number}", task_type=task_type,
+                    priority=rng.choice(list(HousekeepingTask.Priority.values)), status=status,
+                    assigned_to=rng.choice(zone_staff[zone_objs[(room.floor - 1) % zones].pk] or housekeepers or [None]),
+                    scheduled_for=day,
+                ))
+        tasks = HousekeepingTask.objects.bulk_create(tasks, batch_size=BATCH)
+        items_ = []
+        for t in tasks:
+            texts = rng.sample(CHECKLIST_TEXTS, rng.randint(4, 8))
+            done = len(texts) if t.status == S.DONE else rng.randint(1, len(texts) - 1) if t.status == S.IN_PROGRESS else 0
+            t.checklist_total, t.checklist_done = len(texts), done
+            items_ += [ChecklistItem(task=t, text=text, is_completed=i < done) for i, text in enumerate(texts)]
+        ChecklistItem.objects.bulk_create(items_, batch_size=BATCH)
+        HousekeepingTask.objects.bulk_update(tasks, ["checklist_total", "checklist_done"], batch_size=BATCH)
+        counts["tasks"] = len(tasks)
+        counts["checklist_items"] = len(items_)
+
+        # —— roster de la semana: un equipo por zona, un turno por zona y día
+        # la semana puede tener ya un roster real: el sintético toma la versión siguiente
+        last = Roster.objects.filter(week_start=monday).order_by("-version").first()
+        roster = Roster.objects.create(week_start=monday, version=(last.version + 1) if last else 1, is_published=True)
+        teams = Team.objects.bulk_create([Team(name=f"{PREFIX} Equipo {i + 1}") for i in range(zones)])
+        Team.members.through.objects.bulk_create([
+            Team.members.through(team_id=team.pk, user_id=u.pk)
+            for team, z in zip(teams, zone_objs) for u in zone_staff[z.pk]
+        ], batch_size=BATCH)
+        shifts = Shift.objects.bulk_create([
+            Shift(roster=roster, date=monday + timedelta(days=d), start=time(7), end=time(15),
+                  zone=z, team=team, planned_minutes=480)
+            for d in range(7) for team, z in zip(teams, zone_objs)
+        ])
+        ShiftAssignment.objects.bulk_create([
+            ShiftAssignment(shift=sh, user_id=u.pk) for sh in shifts for u in zone_staff[sh.zone_id]
+        ], batch_size=BATCH)
+        shift_by = {(sh.date, sh.zone.name): sh for sh in shifts}
+        assignments = [
+            TaskAssignment(task=t, shift=shift_by[(t.scheduled_for, t.room.zone)], assignee_id=t.assigned_to_id,
+                           team=shift_by[(t.scheduled_for, t.room.zone)].team, planned_minutes=30)
+            for t in tasks if (t.scheduled_for, t.room.zone) in shift_by
+        ]
+        counts["shifts"] = len(shifts)
+        counts["task_assignments"] = len(TaskAssignment.objects.bulk_create(assignments, batch_size=BATCH))
+
+        # —— inventario: stock = saldo del ledger
+        inv = InventoryItem.objects.bulk_create([
+            InventoryItem(name=f"{ITEM_NAMES[i % len(ITEM_NAMES)]} {i + 1}", sku=f"{PREFIX}-{i + 1:05}",
+                          reorder_level=20, min_stock=5)
+            for i in range(items)
+        ])
+        movements = []
+        for item in inv:
+            stock = rng.randint(200, 500)
+            movements.append(InventoryMovement(item=item, type="IN", quantity=stock, reason="Stock inicial"))
+            for _ in range(rng.randint(5, 30)):
+                qty = rng.randint(1, 10)
+                movements.append(InventoryMovement(item=item, type="OUT", quantity=qty, reason="Consumo"))
+                stock -= qty
+            item.stock = stock
+        InventoryMovement.objects.bulk_create(movements, batch_size=BATCH)
+        InventoryItem.objects.bulk_update(inv, ["stock"])
+        counts["inventory_items"] = len(inv)
+        counts["inventory_movements"] = len(movements)
+
+        # —— incidencias con líneas (el rollup se reconstruye al final)
+        supervisors = [u for u in users if u.role == User.Roles.SUPERVISOR] or users
+        reports = IncidentReport.objects.bulk_create([
+            IncidentReport(room=rng.choice(room_objs), reported_by=rng.choice(housekeepers or users),
+                           status=rng.choice(list(IncidentReport.Status.values)), notes="Sintético")
+            for _ in range(incidents)
+        ], batch_size=BATCH)
+        lines = [
+            IncidentLine(report=r, category=IncidentLine.Category.LINEN, inventory_item=rng.choice(inv) if inv else None,
+                         outcome=rng.choice(list(IncidentLine.Outcome.values)), quantity=rng.randint(1, 4))
+            for r in reports for _ in range(rng.randint(1, 3))
+        ]
+        IncidentLine.objects.bulk_create(lines, batch_size=BATCH)
+        backfill_rollups(today, today)
+        counts["incident_reports"] = len(reports)
+        counts["incident_lines"] = len(lines)
+
+        # —— chat: salas por zona/tarea con historial
+        chats = ChatRoom.objects.bulk_create([
+            ChatRoom(name=f"{PREFIX} Chat {i + 1}", room_type=ChatRoom.RoomType.HK_INTERNAL) for i in range(chat_rooms)
+        ])
+        members = {c.pk: rng.sample(users, min(len(users), rng.randint(3, 12))) + [supervisors[0]] for c in chats}
+        ChatRoom.participants.through.objects.bulk_create([
+            ChatRoom.participants.through(chatroom_id=c.pk, user_id=u.pk)
+            for c in chats for u in set(members[c.pk])
+        ], batch_size=BATCH)
+        msgs = []
+        for _ in range(messages if chats else 0):
+            c = rng.choice(chats)
+            msgs.append(ChatMessage(room=c, sender=rng.choice(members[c.pk]), text=rng.choice(CHAT_LINES),
+                                    is_read=rng.random() < 0.7))
+        ChatMessage.objects.bulk_create(msgs, batch_size=BATCH)
+        counts["chat_rooms"] = len(chats)
+        counts["chat_messages"] = len(msgs)
+    return counts
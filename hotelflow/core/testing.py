@@ -0,0 +1,20 @@
+# core/testing.py
+from django.test.utils import override_settings
+
+
+class QueryBudgetTestMixin:
+    """
+    Para los TestCase de la API: con el mixin, cualquier request del test
+    client que supere el query_budget de su vista lanza QueryBudgetExceeded
+    y el test falla. Conviene cargar varias filas en los datos del test, así
+    un N+1 se nota en el conteo.
+
+        class TaskApiTests(QueryBudgetTestMixin, APITestCase):
+            ...
+    """
+
+    def setUp(self):
+        super().setUp()
+        enforce = override_settings(QUERY_BUDGETS_ENFORCE=True)
+        enforce.enable()
+        self.addCleanup(enforce.disable)
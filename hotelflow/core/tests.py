@@ -1,3 +1,212 @@
-from django.test import TestCase
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from housekeeping.models import ChecklistItem, InventoryItem, InventoryMovement, Room
+from scheduling.models import Roster
+
+from . import instrumentation, metrics, profiling
+from .benchmarks import BENCHMARKS, compare, run_benchmarks
+from .synthetic import PREFIX, clear_hotel
+
+
+@override_settings(REQUEST_STATS_HEADERS=True)
+class StreamingInstrumentationTests(TestCase):
+    def setUp(self):
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username="sup", password="x"))
+        item = InventoryItem.objects.create(name="Toallas", sku="TW-1")
+        for _ in range(3):
+            InventoryMovement.objects.create(item=item, type=InventoryMovement.Type.IN, quantity=1)
+
+    def _row(self):
+        return next(r for r in instrumentation.snapshot() if r["route"].endswith("movements/export/"))
+
+    def test_export_is_measured_while_streaming(self):
+        r = self.client.get("/api/housekeeping/inventory/movements/export/")
+        self.assertTrue(r.streaming)
+        # las cabeceras salen antes del cuerpo: no se publica un conteo parcial
+        self.assertNotIn("X-DB-Queries", r)
+        self.assertFalse(any(r["route"].endswith("movements/export/") for r in instrumentation.snapshot()))
+
+        body = b"".join(r.streaming_content)
+        r.close()
+        self.assertEqual(body.count(b"\n"), 4)
+        row = self._row()
+        self.assertEqual(row["count"], 1)
+        self.assertGreater(row["queries"], 0)
+
+    def test_regular_response_keeps_headers(self):
+        r = self.client.get("/api/housekeeping/inventory/movements/")
+        self.assertEqual(r.status_code, 200)
+        self.assertGreater(int(r["X-DB-Queries"]), 0)
+
+
+class GenerateHotelCommandTests(TestCase):
+    small = ["--rooms=4", "--floors=2", "--zones=2", "--staff=3", "--days=1",
+             "--chat-rooms=1", "--messages=2", "--items=2", "--incidents=2"]
+
+    def test_refuses_without_debug(self):
+        with self.assertRaises(CommandError):
+            call_command("generate_hotel", *self.small, stdout=io.StringIO())
+        self.assertFalse(get_user_model().objects.filter(username__startswith=PREFIX.lower()).exists())
+
+    def test_force_creates_users_without_usable_password(self):
+        call_command("generate_hotel", "--force", *self.small, stdout=io.StringIO())
+        users = get_user_model().objects.filter(username__startswith=f"{PREFIX.lower()}_")
+        self.assertEqual(users.count(), 3)
+        self.assertFalse(any(u.has_usable_password() for u in users))
+
+
+class BenchmarkSmokeTests(TestCase):
+    """Hotel mínimo + una corrida de cada benchmark: detecta rutas o datos rotos, no mide."""
+
+    def setUp(self):
+        call_command("generate_hotel", "--force", *GenerateHotelCommandTests.small, stdout=io.StringIO())
+
+    def test_every_benchmark_runs_and_compares(self):
+        result = run_benchmarks(repeat=1, warmup=0)
+        self.assertEqual(set(result["results"]), set(BENCHMARKS))
+        self.assertEqual(result["meta"]["dataset"]["rooms"], 4)
+        compared = compare(result, json.loads(json.dumps(result)))
+        self.assertEqual({r["change_pct"] for r in compared["results"].values() if "change_pct" in r} - {0.0}, set())
+
+    def test_command_writes_json(self):
+        out = io.StringIO()
+        call_command("benchmark", "my_week", "task_list", "--repeat=1", "--warmup=0", stdout=out)
+        self.assertEqual(set(json.loads(out.getvalue())["results"]), {"my_week", "task_list"})
+
+    def test_clear_removes_synthetic_rows(self):
+        self.assertGreater(clear_hotel(), 0)
+        self.assertFalse(Room.objects.filter(number__startswith=f"{PREFIX}-").exists())
+        self.assertFalse(ChecklistItem.objects.exists())
+
+
+class GenerateHotelRosterTests(TestCase):
+    def test_real_roster_of_this_week_is_kept(self):
+        monday = timezone.localdate() - timedelta(days=timezone.localdate().weekday())
+        real = Roster.objects.create(week_start=monday, version=1)
+        call_command("generate_hotel", "--force", *GenerateHotelCommandTests.small, stdout=io.StringIO())
+        synthetic = Roster.objects.exclude(pk=real.pk).get(week_start=monday)
+        self.assertEqual(synthetic.version, 2)
+        clear_hotel()
+        self.assertEqual(list(Roster.objects.all()), [real])
+
+
+class ProfilingHeaderTests(TestCase):
+    def setUp(self):
+        profiling.clear()
+        self.addCleanup(profiling.clear)
+        User = get_user_model()
+        self.staff = User.objects.create_user(username="staff", password="x", is_staff=True)
+        self.worker = User.objects.create_user(username="hk", password="x")
+        self.client = APIClient()
+
+    def test_only_value_1_for_staff(self):
+        self.client.force_login(self.staff)
+        r = self.client.get("/api/housekeeping/inventory/items/", HTTP_X_PROFILE="1")
+        self.assertIsNotNone(profiling.get_profile(int(r["X-Profile-Id"])))
+        for value in ("0", "false", ""):
+            self.assertNotIn("X-Profile-Id", self.client.get("/api/housekeeping/inventory/items/", HTTP_X_PROFILE=value))
+        self.assertEqual(len(profiling.profiles()), 1)
+
+    def test_session_non_staff_is_not_profiled(self):
+        self.client.force_login(self.worker)
+        with mock.patch.object(profiling.cProfile, "Profile") as profile:
+            r = self.client.get("/api/housekeeping/inventory/items/", HTTP_X_PROFILE="1")
+        profile.assert_not_called()
+        self.assertNotIn("X-Profile-Id", r)
+
+    def _token(self, username):
+        r = self.client.post("/api/auth/token/", {"username": username, "password": "x"}, format="json")
+        return f"Bearer {r.data['access']}"
+
+    def test_token_non_staff_is_not_profiled(self):
+        # JWT: el usuario se resuelve antes de la vista; ni cProfile ni el lock
+        auth = self._token("hk")
+        with mock.patch.object(profiling.cProfile, "Profile") as profile, \
+                mock.patch.object(profiling, "_running") as running:
+            r = self.client.get("/api/housekeeping/inventory/items/", HTTP_X_PROFILE="1", HTTP_AUTHORIZATION=auth)
+        self.assertEqual(r.status_code, 200)
+        profile.assert_not_called()
+        running.acquire.assert_not_called()
+        self.assertNotIn("X-Profile-Id", r)
+
+    def test_anonymous_is_not_profiled(self):
+        with mock.patch.object(profiling.cProfile, "Profile") as profile:
+            self.client.get("/api/housekeeping/inventory/items/", HTTP_X_PROFILE="1")
+        profile.assert_not_called()
+
+    def test_token_staff_is_profiled(self):
+        r = self.client.get("/api/housekeeping/inventory/items/", HTTP_X_PROFILE="1",
+                            HTTP_AUTHORIZATION=self._token("staff"))
+        self.assertEqual(profiling.get_profile(int(r["X-Profile-Id"])).user_id, self.staff.pk)
+
+
+def _observe_in_child(messages, participants):
+    for _ in range(messages):
+        metrics.observe_chat_message(participants)
+
+
+@unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "requiere fork")
+class MultiprocessMetricsTests(TestCase):
+    """Dos workers (fork, como gunicorn --preload) escriben su archivo; /metrics suma ambos."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = override_settings(METRICS_MULTIPROC_DIR=directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.directory = directory
+
+    def test_collect_sums_processes(self):
+        fork = multiprocessing.get_context("fork")
+        workers = [fork.Process(target=_observe_in_child, args=args) for args in ((2, 3), (3, 30))]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join(10)
+            self.assertEqual(w.exitcode, 0)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+        text = metrics.render()
+        self.assertIn("\nchat_messages_total 5\n", text)
+        self.assertIn('chat_message_fanout_recipients_bucket{le="2"} 2\n', text)
+        self.assertIn('chat_message_fanout_recipients_bucket{le="+Inf"} 5\n', text)
+        self.assertIn("chat_message_fanout_recipients_sum 91\n", text)
+        self.assertIn("chat_message_fanout_recipients_count 5\n", text)
+
+
+class PrometheusEndpointTests(TestCase):
+    def test_without_token_requires_staff_outside_debug(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.client.force_login(get_user_model().objects.create_user(username="hk", password="x"))
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.client.force_login(get_user_model().objects.create_user(username="sup", password="x", is_staff=True))
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(DEBUG=True)
+    def test_without_token_open_in_debug(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token(self):
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer nope").status_code, 401)
+        r = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(r.status_code, 200)
+        self.assertIn(b"http_requests_total", r.content)
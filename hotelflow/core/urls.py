@@ -1,6 +1,10 @@
 from django.urls import path
-from .views import health
+from .views import health, profile_detail, profile_download, profile_list, request_metrics
 
 urlpatterns = [
     path("health/", health, name="health"),
+    path("metrics/requests/", request_metrics, name="request-metrics"),
+    path("profiles/", profile_list, name="profile-list"),
+    path("profiles/<int:pk>/", profile_detail, name="profile-detail"),
+    path("profiles/<int:pk>/download/", profile_download, name="profile-download"),
 ]
@@ -2,9 +2,97 @@ from django.shortcuts import render
 
 # Create your views here.
 
-from rest_framework.decorators import api_view
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
+from . import instrumentation, metrics, profiling
+
 @api_view(["GET"])
 def health(request):
-    return Response({"status": "ok", "service": "HotelFlow API", "version": "0.1.0"})
\ No newline at end of file
+    return Response({"status": "ok", "service": "HotelFlow API", "version": "0.1.0"})
+
+
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAdminUser])
+def request_metrics(request):
+    """
+    Agregado en proceso de RequestInstrumentationMiddleware (por ruta y método):
+    requests, errores 5xx, tiempos total/SQL/render y consultas (prom./máx.).
+    Es por proceso de worker. DELETE lo reinicia.
+    """
+    if request.method == "DELETE":
+        instrumentation.reset()
+        return Response(status=204)
+    return Response({"routes": instrumentation.snapshot()})
+
+
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAdminUser])
+def profile_list(request):
+    """
+    Perfiles guardados por ProfilingMiddleware (más nuevo primero). DELETE vacía el buffer.
+    El buffer es por proceso: con varios workers cada uno lista (y borra) solo los suyos.
+    """
+    if request.method == "DELETE":
+        profiling.clear()
+        return Response(status=204)
+    return Response({"profiles": [p.as_dict() for p in profiling.profiles()]})
+
+
+def _get_profile(pk):
+    record = profiling.get_profile(pk)
+    if record is None:
+        raise NotFound("Perfil inexistente (el buffer es circular: puede haber salido).")
+    return record
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def profile_detail(request, pk):
+    """
+    Metadatos + top de funciones en texto.
+    ?sort=cumulative|tottime|calls  ?limit=30
+    El buffer es por proceso: un X-Profile-Id puede dar 404 si la consulta
+    cae en otro worker que el de la request perfilada.
+    """
+    record = _get_profile(pk)
+    sort = request.query_params.get("sort", "cumulative")
+    if sort not in ("cumulative", "tottime", "calls", "ncalls", "time"):
+        sort = "cumulative"
+    try:
+        limit = max(1, min(int(request.query_params.get("limit", 30)), 500))
+    except ValueError:
+        limit = 30
+    return Response(record.as_dict() | {"summary": record.summary(limit=limit, sort=sort)})
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def profile_download(request, pk):
+    """El perfil en formato .prof (pstats / snakeviz / gprof2dot)."""
+    record = _get_profile(pk)
+    response = HttpResponse(record.stats, content_type="application/octet-stream")
+    response["Content-Disposition"] = f'attachment; filename="profile-{record.id}.prof"'
+    return response
+
+
+def prometheus_metrics(request):
+    """
+    /metrics en formato de texto de Prometheus (sin DRF: sin negociación).
+    Con METRICS_TOKEN se exige Authorization: Bearer <token>; sin token solo
+    queda abierto con DEBUG, si no pide sesión de staff.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        sent = request.META.get("HTTP_AUTHORIZATION", "")
+        if not hmac.compare_digest(sent.encode(), f"Bearer {token}".encode()):
+            return HttpResponse("No autorizado\n", status=401, content_type="text/plain")
+    elif not settings.DEBUG and not request.user.is_staff:
+        return HttpResponse("No autorizado\n", status=403, content_type="text/plain")
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from datetime import timedelta
 import environ
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.instrumentation.RequestInstrumentationMiddleware",  # consultas/tiempos por request (primero: mide todo)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,6 +57,7 @@ MIDDLEWARE = [
     
     # *********** AÑADIDO ******************+
     "corsheaders.middleware.CorsMiddleware", #CORS (modo desarrollo) 
+    "core.profiling.ProfilingMiddleware",  # cProfile muestreado / a demanda (último: envuelve la vista)
     # *********** FIN AÑADIDO ******************+
 ]
 
@@ -137,9 +140,33 @@ REST_FRAMEWORK = {
     "DEFAULT_PARSER_CLASSES": ["rest_framework.parsers.JSONParser", "rest_framework.parsers.MultiPartParser"],
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # JWT primero (app móvil, sin consultas por request); sesión/Basic siguen para admin y clientes viejos
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "accounts.authentication.CachedJWTAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+    ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.DjangoModelPermissions",],
 }
+SIMPLE_JWT = {
+    "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),
+    "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
+    "AUTH_HEADER_TYPES": ("Bearer",),
+    "UPDATE_LAST_LOGIN": False,
+}
+JWT_USER_CACHE_TTL = 60  # s; usuario del token cacheado por id + token_version
+
+# Caché compartida entre workers (redis). De ella dependen el contexto de permisos
+# (accounts/authz.py) y el usuario cacheado de los JWT (accounts/authentication.py):
+# sus invalidaciones (salir de un chat/grupo, revocar tokens) solo llegan a todos los
+# procesos si la caché es común. Sin REDIS_URL cada proceso tiene su LocMem y esas
+# dos cachés se desactivan (permisos y usuario se leen de la base en cada request).
+REDIS_URL = os.environ.get("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 SPECTACULAR_SETTINGS = {
     "TITLE": "HotelFlow API",
     "DESCRIPTION": "API para logística y eficiencia hotelera",
@@ -160,6 +187,34 @@ AUTH_USER_MODEL = "accounts.User"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Uploads deduplicados por contenido (housekeeping/storage.py)
+STORAGES = {
+    "default": {"BACKEND": "housekeeping.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+# Subidas reanudables por trozos (housekeeping/uploads.py)
+CHUNKED_UPLOAD_DIR = MEDIA_ROOT / "uploads_tmp"
+CHUNKED_UPLOAD_MAX_SIZE = 200 * 1024 * 1024
+# Sin trozos nuevos en este lapso la sesión expira; sweep_blobs borra la fila y el .part
+CHUNKED_UPLOAD_EXPIRY = timedelta(hours=24)
+
+# Instrumentación por request (core/instrumentation.py)
+# REQUEST_STATS_HEADERS: cabeceras Server-Timing/X-DB-Queries (por defecto = DEBUG)
+# QUERY_BUDGETS_ENFORCE: superar el query_budget de una vista hace fallar la request (tests)
+QUERY_BUDGETS_ENFORCE = False
+
+# Profiling a demanda (core/profiling.py): fracción muestreada de requests (0 = solo con
+# X-Profile de un usuario staff) y cuántos perfiles guarda el buffer circular
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_BUFFER_SIZE = 20
+
+# Métricas Prometheus en /metrics (core/metrics.py). Con varios workers, un directorio
+# compartido (vaciarlo al arrancar el servidor) donde cada proceso escribe su archivo mmap.
+# METRICS_TOKEN: Bearer que manda el scraper; vacío, /metrics solo es público con DEBUG
+METRICS_MULTIPROC_DIR = os.environ.get("METRICS_MULTIPROC_DIR", "")
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
 # *********** Open AI ***********
 env = environ.Env()
 environ.Env.read_env(os.path.join(BASE_DIR, ".env"))
@@ -1,15 +1,21 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from django.conf import settings
 from django.conf.urls.static import static
-from accounts.views import MeView
+from accounts.views import MeView, TokenObtainView, TokenRefreshView, TokenRevokeView
 from scheduling.views import SupervisorSummaryView
+from housekeeping.views import serve_blob
+from core.views import prometheus_metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", prometheus_metrics, name="metrics"),   # Prometheus (ruta por defecto del scrape)
     path("api/", include("core.urls")),
     path("api/housekeeping/", include("housekeeping.urls")),
+    path("api/auth/token/", TokenObtainView.as_view(), name="token_obtain"),
+    path("api/auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("api/auth/token/revoke/", TokenRevokeView.as_view(), name="token_revoke"),
     path("api/auth/", include("rest_framework.urls")),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="docs"),
@@ -19,4 +25,11 @@ urlpatterns = [
     path("api/housekeeping/scheduling/supervisor/summary/", SupervisorSummaryView.as_view()),
 ]
 
+# Media solo en desarrollo (como static()): los blobs CAS no piden autenticación.
+# En producción /media/ (incluido /media/cas/) lo sirve nginx.
+if settings.DEBUG:
+    # Blobs del storage CAS: inmutables, con cabeceras de caché de larga duración
+    urlpatterns += [
+        re_path(r"^%scas/(?P<path>.*)$" % settings.MEDIA_URL.lstrip("/"), serve_blob),
+    ]
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
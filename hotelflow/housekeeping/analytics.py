@@ -0,0 +1,217 @@
+# housekeeping/analytics.py
+import bisect
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+try:
+    import numpy as np
+except Exception:
+    np = None  # para poder arrancar sin numpy; analytics responde 503
+
+from .models import HousekeepingTask, RoomStatusTransition, TurnaroundSample
+
+M = TurnaroundSample.Metric
+TARGET_STATUS = {M.DIRTY_TO_CLEAN: "CLEAN", M.DIRTY_TO_INSPECTION: "INSPECTION"}
+
+LOOKBACK_DAYS = 3           # un DIRTY puede empezar días antes de terminar
+TODAY_REFRESH_SECONDS = 60  # el día en curso se rematerializa como mucho 1 vez/min
+REFRESH_ON_READ = False     # settings.TURNAROUND_REFRESH_ON_READ: un GET puede rematerializar hoy
+HIST_BINS = [0, 15, 30, 45, 60, 90, 120, 180, 240, 360, 480, 720, 1440]  # minutos
+DEFAULT_PERCENTILES = (50, 75, 90, 95)
+GROUP_FIELDS = {
+    "floor": "floor",
+    "zone": "zone",
+    "task_type": "task_type",
+    "housekeeper": "housekeeper__username",
+    "day": "day",
+}
+
+
+class AnalyticsUnavailable(Exception):
+    pass
+
+
+def _day_start(d):
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+# =========================================
+# Extracción y emparejado (vectorizado)
+# =========================================
+
+def pair_dirty_to(status, room, target):
+    """
+    Filas ordenadas por (room, id). Para cada entrada a DIRTY busca la primera
+    transición posterior a `target` de la misma habitación antes del siguiente
+    DIRTY. Devuelve (índices_inicio, índices_fin).
+    """
+    n = len(status)
+    if not n:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    idx = np.arange(n)
+    none = n
+    is_dirty = status == "DIRTY"
+    # siguiente target en i o después / siguiente DIRTY estrictamente después
+    next_target = np.minimum.accumulate(np.where(status == target, idx, none)[::-1])[::-1]
+    next_dirty = np.minimum.accumulate(np.where(is_dirty, idx, none)[::-1])[::-1]
+    next_dirty = np.append(next_dirty[1:], none)
+
+    starts = np.nonzero(is_dirty)[0]
+    ends = next_target[starts]
+    safe = np.where(ends < none, ends, 0)
+    ok = (ends < none) & (room[safe] == room[starts]) & (ends < next_dirty[starts])
+    return starts[ok], ends[ok]
+
+
+def _task_lookup(tasks):
+    """{room_id: ([finished_at ordenados], [(task_type, assigned_to_id)])} para ubicar la tarea de cada turnaround."""
+    by_room = defaultdict(lambda: ([], []))
+    for room_id, finished, task_type, user_id in tasks:
+        times, info = by_room[room_id]
+        times.append(finished)
+        info.append((task_type, user_id))
+    return by_room
+
+
+def _extract(date_from, date_to):
+    """Muestras (sin guardar) de los turnarounds que terminan en [date_from, date_to]."""
+    start, end = _day_start(date_from), _day_start(date_to + timedelta(days=1))
+    samples = []
+
+    tasks = list(
+        HousekeepingTask.objects
+        .filter(status=HousekeepingTask.Status.DONE, finished_at__gte=start - timedelta(days=LOOKBACK_DAYS), finished_at__lt=end)
+        .exclude(started_at__isnull=True)
+        .order_by("room_id", "finished_at")
+        .values_list("id", "room_id", "room__floor", "room__zone", "task_type", "assigned_to_id", "started_at", "finished_at")
+    )
+    for task_id, room_id, floor, zone, task_type, user_id, started, finished in tasks:
+        if finished >= start and finished >= started:
+            samples.append(TurnaroundSample(
+                metric=M.TASK, day=timezone.localdate(finished), source_id=task_id, room_id=room_id,
+                floor=floor, zone=zone or "", task_type=task_type, housekeeper_id=user_id,
+                started_at=started, ended_at=finished, minutes=(finished - started).total_seconds() / 60,
+            ))
+    lookup = _task_lookup((t[1], t[7], t[4], t[5]) for t in tasks)
+
+    rows = list(
+        RoomStatusTransition.objects
+        .filter(changed_at__gte=start - timedelta(days=LOOKBACK_DAYS), changed_at__lt=end)
+        .order_by("room_id", "id")
+        .values_list("id", "room_id", "floor", "zone", "to_status", "changed_at")
+    )
+    if rows:
+        ids, rooms, floors, zones, statuses, times = zip(*rows)
+        status = np.array(statuses)
+        room = np.array(rooms, dtype=np.int64)
+        for metric, target in TARGET_STATUS.items():
+            for s, e in zip(*pair_dirty_to(status, room, target)):
+                ended = times[e]
+                if ended < start:
+                    continue
+                # tarea terminada dentro del turnaround => tipo y responsable
+                task_type, user_id = "", None
+                finished, info = lookup.get(rooms[s], ((), ()))
+                k = bisect.bisect_right(finished, ended) - 1
+                if k >= 0 and finished[k] >= times[s]:
+                    task_type, user_id = info[k]
+                samples.append(TurnaroundSample(
+                    metric=metric, day=timezone.localdate(ended), source_id=ids[e], room_id=rooms[s],
+                    floor=floors[s], zone=zones[s], task_type=task_type, housekeeper_id=user_id,
+                    started_at=times[s], ended_at=ended, minutes=(ended - times[s]).total_seconds() / 60,
+                ))
+    return samples
+
+
+def materialize_turnarounds(date_from, date_to) -> int:
+    """Recalcula (idempotente) las muestras de los días [date_from, date_to]."""
+    if np is None:
+        raise AnalyticsUnavailable("numpy no está instalado")
+    samples = _extract(date_from, date_to)
+    with transaction.atomic():
+        TurnaroundSample.objects.filter(day__gte=date_from, day__lte=date_to).delete()
+        TurnaroundSample.objects.bulk_create(samples, batch_size=1000)
+    return len(samples)
+
+
+def refresh_today():
+    """
+    El día en curso aún no lo materializó el comando: se rehace a demanda (con
+    límite). Solo con TURNAROUND_REFRESH_ON_READ; por defecto un GET no escribe
+    y hoy se actualiza corriendo materialize_turnarounds seguido (cron).
+    El límite de cache.add es por proceso si la caché no es compartida: si otro
+    worker o el comando rematerializa el mismo día a la vez, uno de los dos
+    choca con la clave única y se queda con lo que escribió el otro.
+    """
+    today = timezone.localdate()
+    if cache.add(f"turnaround-refresh:{today.isoformat()}", 1, TODAY_REFRESH_SECONDS):
+        try:
+            materialize_turnarounds(today, today)
+        except IntegrityError:
+            pass
+
+
+# =========================================
+# Consultas
+# =========================================
+
+def _summary(values, percentiles):
+    out = {"count": int(values.size)}
+    if not values.size:
+        return out
+    out.update({
+        "mean": round(float(values.mean()), 1),
+        "min": round(float(values.min()), 1),
+        "max": round(float(values.max()), 1),
+    })
+    for q, v in zip(percentiles, np.percentile(values, percentiles)):
+        out[f"p{q:g}"] = round(float(v), 1)
+    return out
+
+
+def turnaround_stats(metric, date_from, date_to, group_by=None, percentiles=DEFAULT_PERCENTILES, filters=None):
+    """
+    Percentiles, media e histograma (minutos) de `metric` en el rango, global y
+    opcionalmente por grupo. Se leen dos columnas y el resto es numpy.
+    """
+    if np is None:
+        raise AnalyticsUnavailable("numpy no está instalado")
+    if date_to >= timezone.localdate() >= date_from and getattr(settings, "TURNAROUND_REFRESH_ON_READ", REFRESH_ON_READ):
+        refresh_today()
+
+    qs = TurnaroundSample.objects.filter(metric=metric, day__gte=date_from, day__lte=date_to, **(filters or {}))
+    if group_by:
+        rows = list(qs.values_list("minutes", GROUP_FIELDS[group_by]))
+        values = np.fromiter((r[0] for r in rows), dtype=float, count=len(rows))
+        keys = np.array(["" if r[1] is None else str(r[1]) for r in rows], dtype=object)
+    else:
+        values = np.array(qs.values_list("minutes", flat=True), dtype=float)
+
+    counts, _ = np.histogram(values, bins=HIST_BINS + [np.inf])
+    result = {
+        "metric": metric,
+        "date_from": date_from,
+        "date_to": date_to,
+        "overall": _summary(values, percentiles),
+        "histogram": [
+            {"from_min": lo, "to_min": (HIST_BINS[i + 1] if i + 1 < len(HIST_BINS) else None), "count": int(c)}
+            for i, (lo, c) in enumerate(zip(HIST_BINS, counts))
+        ],
+    }
+    if group_by:
+        groups = []
+        if values.size:
+            labels, inverse = np.unique(keys.astype(str), return_inverse=True)
+            order = np.argsort(inverse, kind="stable")
+            parts = np.split(values[order], np.cumsum(np.bincount(inverse))[:-1])
+            groups = [{"key": label, **_summary(part, percentiles)} for label, part in zip(labels.tolist(), parts)]
+            if group_by == "floor":
+                groups.sort(key=lambda g: int(g["key"]))
+        result["group_by"] = group_by
+        result["groups"] = groups
+    return result
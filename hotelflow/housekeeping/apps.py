@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class HousekeepingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'housekeeping'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registra los receivers)
@@ -0,0 +1,193 @@
+# housekeeping/assignment.py
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+try:
+    import numpy as np
+except Exception:
+    np = None  # para poder arrancar sin numpy; auto_assign en lote responde 503
+
+from scheduling.models import StaffProfile, TaskTimeEstimate
+
+from .models import HousekeepingTask, StaffAvailability
+from .spatial import haversine_np
+from .utils import ALLOWED_ROLES
+
+# Parámetros (sobrescribibles con settings.AUTO_ASSIGN)
+DEFAULTS = {
+    "capacity_minutes": 480,    # jornada por persona (incluye la carga activa)
+    "default_minutes": 30,      # si no hay TaskTimeEstimate para la tarea
+    "w_load": 1.0,              # peso de la carga (fracción de capacidad usada)
+    "w_zone": 0.6,              # penalización si la zona no está entre las preferidas
+    "w_floor": 0.15,            # penalización por piso de distancia (tope 3 pisos)
+    "unknown_floor": 0.2,       # penalización si aún no sabemos en qué piso está
+    "w_dist": 0.3,              # penalización por distancia (lat/lon), saturada en dist_scale_m
+    "dist_scale_m": 200.0,
+    "unknown_dist": 0.1,        # habitación con coords pero persona sin posición
+}
+
+# HousekeepingTask.task_type -> TaskTimeEstimate.clean_type
+CLEAN_TYPE_FOR_TASK = {
+    "TURNOVER": "DEPARTURE",
+    "DEEP_CLEAN": "DEEP",
+    "AMENITIES": "ARRIVAL_DU",
+}
+
+# Las tareas urgentes pesan más la carga (que las tome quien esté más libre)
+PRIORITY_WEIGHT = {"HIGH": 2.0, "MEDIUM": 1.0, "LOW": 0.5}
+PRIORITY_ORDER = {"HIGH": 0, "MEDIUM": 1, "LOW": 2}
+
+ACTIVE_STATUSES = [HousekeepingTask.Status.ASSIGNED, HousekeepingTask.Status.IN_PROGRESS]
+
+
+class AssignmentUnavailable(Exception):
+    pass
+
+
+def _params(overrides=None):
+    p = {**DEFAULTS, **getattr(settings, "AUTO_ASSIGN", {}), **(overrides or {})}
+    if p["capacity_minutes"] <= 0:
+        # load / capacity dividiría por cero y nada cabría: es un error de configuración
+        raise ValueError("capacity_minutes debe ser positivo")
+    return p
+
+
+def _minutes_table(default):
+    est = {(e.room_category, e.clean_type): e.minutes for e in TaskTimeEstimate.objects.all()}
+
+    def minutes(task_type, category):
+        return est.get((category, CLEAN_TYPE_FOR_TASK.get(task_type)), default)
+    return minutes
+
+
+def _load_staff(minutes):
+    """
+    Personal disponible con su carga activa (nº y minutos), zonas preferidas y
+    piso "actual" (el más frecuente entre sus tareas activas). 3 queries fijas.
+    """
+    staff = list(
+        StaffAvailability.objects
+        .select_related("user")
+        .filter(is_available=True, user__role__in=ALLOWED_ROLES)
+        .annotate(active_load=Count("user__assigned_tasks", filter=Q(user__assigned_tasks__status__in=ACTIVE_STATUSES)))
+        .order_by("user_id")
+    )
+    user_ids = [sa.user_id for sa in staff]
+
+    zones = defaultdict(set)
+    for user_id, zone in (
+        StaffProfile.preferred_zones.through.objects
+        .filter(staffprofile__user_id__in=user_ids)
+        .values_list("staffprofile__user_id", "zone__name")
+    ):
+        zones[user_id].add(zone)
+
+    load_minutes = defaultdict(int)
+    floors = defaultdict(Counter)
+    for user_id, task_type, category, floor in (
+        HousekeepingTask.objects
+        .filter(assigned_to_id__in=user_ids, status__in=ACTIVE_STATUSES)
+        .values_list("assigned_to_id", "task_type", "room__category", "room__floor")
+    ):
+        load_minutes[user_id] += minutes(task_type, category)
+        floors[user_id][floor] += 1
+
+    return staff, zones, load_minutes, {u: c.most_common(1)[0][0] for u, c in floors.items()}
+
+
+def plan_assignments(tasks, params=None):
+    """
+    Reparte `tasks` entre el personal disponible con una matriz de costos
+    tareas × personal y asignación voraz con capacidad:
+
+      costo = w_load * fracción_de_capacidad_usada * peso_prioridad
+            + w_zone * (zona no preferida)
+            + w_floor * distancia_en_pisos
+            + w_dist * min(distancia_m / dist_scale_m, 1)   (si la habitación tiene coords)
+
+    Las tareas se procesan por prioridad (HIGH primero) y tras cada asignación
+    se actualizan carga, piso y posición de la persona, así el trabajo se reparte
+    y se agrupa por piso en vez de caer siempre en la misma persona.
+    Las que no caben en ninguna capacidad quedan sin asignar.
+    Devuelve (plan, sin_asignar) con plan = [(task, StaffAvailability, minutos)].
+    """
+    if np is None:
+        raise AssignmentUnavailable("numpy no está instalado")
+    p = _params(params)
+    minutes = _minutes_table(p["default_minutes"])
+    staff, zones, load_minutes, current_floor = _load_staff(minutes)
+    tasks = sorted(tasks, key=lambda t: (PRIORITY_ORDER.get(t.priority, 1), t.created_at, t.pk))
+    if not staff or not tasks:
+        return [], tasks
+
+    n_staff = len(staff)
+    capacity = float(p["capacity_minutes"])
+    load = np.array([load_minutes[sa.user_id] for sa in staff], dtype=float)
+    floor = np.array([current_floor.get(sa.user_id, np.nan) for sa in staff], dtype=float)
+    pos_lat = np.array([np.nan if sa.lat is None else float(sa.lat) for sa in staff])
+    pos_lon = np.array([np.nan if sa.lon is None else float(sa.lon) for sa in staff])
+
+    # Afinidad de zona precalculada: una columna por zona distinta
+    zone_names = sorted({t.room.zone for t in tasks if t.room.zone})
+    zone_col = {z: i for i, z in enumerate(zone_names)}
+    prefers = np.zeros((n_staff, len(zone_names) + 1), dtype=bool)
+    has_prefs = np.array([bool(zones[sa.user_id]) for sa in staff])
+    for s, sa in enumerate(staff):
+        for z in zones[sa.user_id]:
+            if z in zone_col:
+                prefers[s, zone_col[z]] = True
+    # sin zona en la habitación o sin preferencias => neutro
+    prefers[:, -1] = True
+    prefers[~has_prefs, :] = True
+    zone_penalty = p["w_zone"] * ~prefers
+
+    plan, unassigned = [], []
+    for t in tasks:
+        need = minutes(t.task_type, t.room.category)
+        cost = (p["w_load"] * PRIORITY_WEIGHT.get(t.priority, 1.0)) * (load / capacity)
+        cost = cost + zone_penalty[:, zone_col.get(t.room.zone, -1)]
+        dist = np.minimum(np.abs(floor - t.room.floor), 3)
+        cost = cost + np.where(np.isnan(dist), p["unknown_floor"], p["w_floor"] * np.nan_to_num(dist))
+        if t.room.lat is not None and t.room.lon is not None:
+            meters = haversine_np(float(t.room.lat), float(t.room.lon), pos_lat, pos_lon)
+            near = np.minimum(np.nan_to_num(meters) / p["dist_scale_m"], 1.0)
+            cost = cost + np.where(np.isnan(meters), p["unknown_dist"], p["w_dist"] * near)
+        cost[load + need > capacity] = np.inf
+
+        s = int(np.argmin(cost))
+        if not np.isfinite(cost[s]):
+            unassigned.append(t)
+            continue
+        load[s] += need
+        floor[s] = t.room.floor
+        if t.room.lat is not None and t.room.lon is not None:
+            pos_lat[s], pos_lon[s] = float(t.room.lat), float(t.room.lon)
+        plan.append((t, staff[s], need))
+    return plan, unassigned
+
+
+def auto_assign_tasks(queryset, params=None, commit=True):
+    """
+    Asigna en lote las tareas PENDING sin responsable de `queryset`.
+    Con commit=True bloquea las tareas (select_for_update) y escribe todo con
+    un bulk_update; con commit=False solo devuelve el plan.
+    """
+    today = timezone.localdate()
+    with transaction.atomic():
+        qs = queryset.filter(status=HousekeepingTask.Status.PENDING, assigned_to__isnull=True).select_related("room")
+        if commit:
+            qs = qs.select_for_update(of=("self",))
+        plan, unassigned = plan_assignments(list(qs), params)
+        if commit and plan:
+            for task, sa, _ in plan:
+                task.assigned_to_id = sa.user_id
+                task.status = HousekeepingTask.Status.ASSIGNED
+                task.scheduled_for = task.scheduled_for or today
+            HousekeepingTask.objects.bulk_update(
+                [t for t, _, _ in plan], ["assigned_to", "status", "scheduled_for"], batch_size=500
+            )
+    return plan, unassigned
@@ -0,0 +1,190 @@
+# housekeeping/checklists.py
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Prefetch
+from django.utils import timezone
+
+from .models import ChecklistItem, ChecklistTemplate, ChecklistTemplateItem, HousekeepingTask, Room
+
+
+# =========================================
+# Contadores de progreso (checklist_total /
+# checklist_done) mantenidos con F()
+# =========================================
+
+def apply_checklist_delta(task_id, total: int = 0, done: int = 0):
+    """Suma/resta a los contadores de la tarea con un UPDATE atómico (sin leer antes)."""
+    if not (total or done):
+        return
+    HousekeepingTask.objects.filter(pk=task_id).update(
+        checklist_total=F("checklist_total") + total,
+        checklist_done=F("checklist_done") + done,
+    )
+
+
+def sync_task_state(task_id):
+    """
+    Ajusta status/started_at/finished_at según los contadores:
+    - primer ítem completado => started_at (y PENDING pasa a IN_PROGRESS)
+    - todo completo => DONE + finished_at
+    - si estaba DONE y alguien desmarca => vuelve a IN_PROGRESS
+    """
+    task = (
+        HousekeepingTask.objects
+        .only("status", "started_at", "finished_at", "checklist_total", "checklist_done")
+        .filter(pk=task_id)
+        .first()
+    )
+    if task is None:
+        return None
+
+    updates = []
+    now = timezone.now()
+    if task.checklist_done > 0 and task.started_at is None:
+        task.started_at = now
+        updates.append("started_at")
+        if task.status == HousekeepingTask.Status.PENDING:
+            task.status = HousekeepingTask.Status.IN_PROGRESS
+            updates.append("status")
+
+    if task.checklist_total > 0 and task.checklist_done >= task.checklist_total:
+        if task.status != HousekeepingTask.Status.DONE:
+            task.status = HousekeepingTask.Status.DONE
+            updates.append("status")
+        if not task.finished_at:
+            task.finished_at = now
+            updates.append("finished_at")
+    elif task.status == HousekeepingTask.Status.DONE:
+        task.status = HousekeepingTask.Status.IN_PROGRESS
+        task.finished_at = None
+        updates += ["status", "finished_at"]
+
+    if updates:
+        task.save(update_fields=sorted(set(updates)))
+    return task
+
+
+def complete_items(task: HousekeepingTask, item_ids=None, user=None) -> int:
+    """
+    Completa varios ítems en una transacción: un UPDATE de ítems, un UPDATE
+    de contadores y un único recálculo de estado. Devuelve cuántos cambiaron.
+    (QuerySet.update no dispara post_save, así que no hay doble conteo.)
+    """
+    with transaction.atomic():
+        qs = ChecklistItem.objects.filter(task_id=task.pk, is_completed=False)
+        if item_ids is not None:
+            qs = qs.filter(pk__in=item_ids)
+        changed = qs.update(
+            is_completed=True,
+            completed_at=timezone.now(),
+            completed_by=user if (user and user.is_authenticated) else None,
+        )
+        if changed:
+            apply_checklist_delta(task.pk, done=changed)
+            sync_task_state(task.pk)
+    return changed
+
+
+_local = threading.local()
+
+
+def counters_deferred(*task_ids) -> bool:
+    """Para las señales: dentro de deferred_counters() anota las tareas y devuelve True."""
+    tasks = getattr(_local, "tasks", None)
+    if tasks is None:
+        return False
+    tasks.update(t for t in task_ids if t is not None)
+    return True
+
+
+@contextmanager
+def deferred_counters():
+    """
+    Altas/bajas masivas de ítems con el ORM normal (.delete(), save()): en el
+    bloque las señales de ChecklistItem no tocan los contadores, solo anotan
+    la tarea; al salir se recuentan de una vez (recount_checklists) y se
+    recalcula el estado de las tareas que siguen existiendo. Si el bloque
+    falla no se recuenta (la transacción que lo envuelve se revierte).
+    """
+    if getattr(_local, "tasks", None) is not None:
+        yield _local.tasks  # anidado: recuenta el bloque exterior
+        return
+    _local.tasks = tasks = set()
+    try:
+        yield tasks
+    finally:
+        _local.tasks = None
+    if tasks:
+        recount_checklists(tasks)
+        for task_id in HousekeepingTask.objects.filter(pk__in=tasks).values_list("pk", flat=True):
+            sync_task_state(task_id)
+
+
+def recount_checklists(task_ids=None) -> int:
+    """Recalcula los contadores desde la tabla de ítems (reparación/auditoría)."""
+    qs = HousekeepingTask.objects.all()
+    if task_ids is not None:
+        qs = qs.filter(pk__in=task_ids)
+    qs = qs.annotate(
+        total=Count("checklist"),
+        done=Count("checklist", filter=Q(checklist__is_completed=True)),
+    ).exclude(checklist_total=F("total"), checklist_done=F("done"))
+    fixed = 0
+    for task in qs.iterator():
+        HousekeepingTask.objects.filter(pk=task.pk).update(checklist_total=task.total, checklist_done=task.done)
+        fixed += 1
+    return fixed
+
+
+# =========================================
+# Plantillas → instanciación en bloque
+# =========================================
+
+def load_templates():
+    """{(task_type, room_category): [textos]} de las plantillas activas (2 queries)."""
+    qs = ChecklistTemplate.objects.filter(is_active=True).prefetch_related(
+        Prefetch("items", queryset=ChecklistTemplateItem.objects.order_by("position", "id"))
+    )
+    return {(t.task_type, t.room_category): [i.text for i in t.items.all()] for t in qs}
+
+
+def instantiate_checklists(tasks, templates=None) -> int:
+    """
+    Crea los ítems de checklist de varias tareas con un solo bulk_create e
+    inicializa checklist_total en el mismo paso.
+
+    bulk_create no dispara post_save, así que los contadores se fijan aquí
+    (un UPDATE por cada tamaño de checklist distinto, no por tarea).
+    Las tareas que ya tienen checklist se ignoran. Devuelve ítems creados.
+    """
+    tasks = [t for t in tasks if t.pk and not t.checklist_total]
+    if not tasks:
+        return 0
+    if templates is None:
+        templates = load_templates()
+    if not templates:
+        return 0
+
+    categories = dict(Room.objects.filter(pk__in={t.room_id for t in tasks}).values_list("id", "category"))
+
+    items = []
+    tasks_by_size = defaultdict(list)
+    for t in tasks:
+        texts = templates.get((t.task_type, categories.get(t.room_id, ""))) or templates.get((t.task_type, ""))
+        if not texts:
+            continue
+        items.extend(ChecklistItem(task_id=t.pk, text=text) for text in texts)
+        tasks_by_size[len(texts)].append(t)
+
+    with transaction.atomic():
+        ChecklistItem.objects.bulk_create(items, batch_size=500)
+        for size, group in tasks_by_size.items():
+            HousekeepingTask.objects.filter(pk__in=[t.pk for t in group]).update(
+                checklist_total=F("checklist_total") + size
+            )
+            for t in group:
+                t.checklist_total += size
+    return len(items)
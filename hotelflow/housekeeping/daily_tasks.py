@@ -0,0 +1,154 @@
+# housekeeping/daily_tasks.py
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .checklists import deferred_counters, instantiate_checklists
+from .models import HousekeepingTask, Room, RoomOccupancy
+
+ORIGIN = "OCCUPANCY"
+T = HousekeepingTask.TaskType
+P = HousekeepingTask.Priority
+
+
+def tasks_for(occ):
+    """
+    Tareas que pide la ocupación de un día: [(task_type, priority, título)].
+    - salida => TURNOVER (HIGH si entra otro huésped el mismo día)
+    - continuación => AMENITIES (servicio diario)
+    - solo llegada => INSPECTION (verificar que la habitación está lista)
+    """
+    if occ.has_departure:
+        return [(T.TURNOVER, P.HIGH if occ.has_arrival else P.MEDIUM, "Salida")]
+    if occ.is_stayover:
+        return [(T.AMENITIES, P.LOW, "Continuación")]
+    if occ.has_arrival:
+        return [(T.INSPECTION, P.MEDIUM, "Llegada")]
+    return []
+
+
+def generate_daily_tasks(date_from, date_to=None, room_ids=None, dry_run=False):
+    """
+    Crea/ajusta las tareas del rango a partir de RoomOccupancy. Idempotente:
+    se puede volver a correr tras cambios tardíos sin duplicar.
+    - faltantes => bulk_create (+ checklists en bloque)
+    - cambió la prioridad => bulk_update (solo si siguen PENDING)
+    - la ocupación ya no la pide => se borra si nadie la tomó; si no, se conserva
+    Solo toca tareas con origin=OCCUPANCY; las creadas a mano no se tocan.
+    Habitaciones OOO se omiten. Consultas fijas, independiente del tamaño.
+    """
+    date_to = date_to or date_from
+    occ = RoomOccupancy.objects.filter(date__gte=date_from, date__lte=date_to).exclude(room__status=Room.Status.OOO)
+    existing = HousekeepingTask.objects.filter(origin=ORIGIN, scheduled_for__gte=date_from, scheduled_for__lte=date_to)
+    if room_ids is not None:
+        occ = occ.filter(room_id__in=room_ids)
+        existing = existing.filter(room_id__in=room_ids)
+
+    wanted = {}
+    for o in occ.select_related("room").only("room", "room__number", "date", "has_departure", "has_arrival", "is_stayover"):
+        for task_type, priority, label in tasks_for(o):
+            wanted[(o.room_id, o.date, task_type)] = (priority, f"{label} · Hab. {o.room.number}")
+
+    result = {"created": 0, "updated": 0, "removed": 0, "kept": 0, "checklist_items": 0}
+    with transaction.atomic():
+        current = {
+            (t.room_id, t.scheduled_for, t.task_type): t
+            for t in existing.select_for_update().only(
+                "room_id", "scheduled_for", "task_type", "priority", "status", "assigned_to_id", "checklist_done"
+            )
+        }
+        to_create = [
+            HousekeepingTask(
+                room_id=room_id, scheduled_for=day, task_type=task_type, priority=priority,
+                title=title, origin=ORIGIN,
+            )
+            for (room_id, day, task_type), (priority, title) in wanted.items()
+            if (room_id, day, task_type) not in current
+        ]
+        to_update = []
+        for key, t in current.items():
+            if key in wanted and t.priority != wanted[key][0] and t.status == HousekeepingTask.Status.PENDING:
+                t.priority = wanted[key][0]
+                to_update.append(t)
+        stale = [t for key, t in current.items() if key not in wanted]
+        removable = [
+            t.pk for t in stale
+            if t.status == HousekeepingTask.Status.PENDING and t.assigned_to_id is None and not t.checklist_done
+        ]
+        result.update(
+            created=len(to_create), updated=len(to_update),
+            removed=len(removable), kept=len(stale) - len(removable),
+        )
+        if dry_run:
+            return result
+
+        # en SQLite/Postgres bulk_create devuelve las PKs => checklists en el mismo paso
+        created = HousekeepingTask.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            HousekeepingTask.objects.bulk_update(to_update, ["priority"], batch_size=500)
+        if removable:
+            # Cascada normal (libera los blobs de las fotos); los contadores de las
+            # tareas que se van no se ajustan ítem por ítem sino una vez al final
+            with deferred_counters():
+                HousekeepingTask.objects.filter(pk__in=removable).delete()
+        result["checklist_items"] = instantiate_checklists(created)
+    return result
+
+
+def rooms_summary(date_from, date_to):
+    """
+    Resumen por día y zona con el formato que espera scheduling ai_generate:
+    [{"date", "zone", "vacant", "stayovers", "arrivals", "deep"}].
+    vacant = salidas (limpieza completa); deep = tareas DEEP_CLEAN programadas.
+    """
+    rows = defaultdict(lambda: {"vacant": 0, "stayovers": 0, "arrivals": 0, "deep": 0})
+    for day, zone, vacant, stayovers, arrivals in (
+        RoomOccupancy.objects
+        .filter(date__gte=date_from, date__lte=date_to)
+        .exclude(room__status=Room.Status.OOO)
+        .values_list("date", "room__zone")
+        .annotate(
+            vacant=Count("id", filter=Q(has_departure=True)),
+            stayovers=Count("id", filter=Q(is_stayover=True, has_departure=False)),
+            arrivals=Count("id", filter=Q(has_arrival=True)),
+        )
+        .order_by()
+    ):
+        rows[(day, zone)].update(vacant=vacant, stayovers=stayovers, arrivals=arrivals)
+    for day, zone, deep in (
+        HousekeepingTask.objects
+        .filter(task_type=T.DEEP_CLEAN, scheduled_for__gte=date_from, scheduled_for__lte=date_to)
+        .values_list("scheduled_for", "room__zone")
+        .annotate(deep=Count("id"))
+        .order_by()
+    ):
+        rows[(day, zone)]["deep"] = deep
+    return [
+        {"date": day.isoformat(), "zone": zone or None, **counts}
+        for (day, zone), counts in sorted(rows.items(), key=lambda kv: (kv[0][0], kv[0][1] or ""))
+    ]
+
+
+def sync_pending_occupancy(max_days=None):
+    """
+    Consume el change set de las importaciones PMS: regenera solo las
+    habitaciones/días con pending_tasks=True (por día, filtrando por
+    habitación) y limpia la marca en la misma transacción.
+    Devuelve los totales sumados de generate_daily_tasks.
+    """
+    totals = {"days": 0, "created": 0, "updated": 0, "removed": 0, "kept": 0, "checklist_items": 0}
+    days = (
+        RoomOccupancy.objects.filter(pending_tasks=True)
+        .order_by("date").values_list("date", flat=True).distinct()
+    )
+    for day in list(days[:max_days] if max_days else days):
+        with transaction.atomic():
+            pending = RoomOccupancy.objects.select_for_update().filter(pending_tasks=True, date=day)
+            room_ids = list(pending.values_list("room_id", flat=True))
+            result = generate_daily_tasks(day, day, room_ids=room_ids)
+            pending.filter(room_id__in=room_ids).update(pending_tasks=False)
+        totals["days"] += 1
+        for k, v in result.items():
+            totals[k] += v
+    return totals
@@ -0,0 +1,122 @@
+# housekeeping/exports.py
+import csv
+import json
+from datetime import date, datetime, timedelta
+
+from django.db import models
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+
+EXPORT_CHUNK_SIZE = 2000  # filas por fetch del cursor
+
+
+class _Echo:
+    """csv.writer escribe aquí y recibimos la línea ya formateada (sin buffer)."""
+    def write(self, value):
+        return value
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _resolve_field(model, path):
+    field = None
+    for name in path.split("__"):
+        field = model._meta.get_field(name)
+        model = field.related_model
+    return field
+
+
+def filter_date_range(qs, field, date_from=None, date_to=None):
+    """
+    Rango inclusivo por días (YYYY-MM-DD). En campos DateTime se compara contra
+    los límites del día en la zona local (no __date), así se aprovechan índices.
+    """
+    try:
+        # parse_date: None si no tiene el formato, ValueError si la fecha no existe (2025-02-30)
+        d_from = parse_date(date_from) if date_from else None
+        d_to = parse_date(date_to) if date_to else None
+    except ValueError:
+        d_from = d_to = None
+    if (date_from and not d_from) or (date_to and not d_to):
+        raise ValidationError({"detail": "date_from/date_to deben ser fechas válidas YYYY-MM-DD"})
+
+    if isinstance(_resolve_field(qs.model, field), models.DateTimeField):
+        start = lambda d: timezone.make_aware(datetime.combine(d, datetime.min.time()))  # noqa: E731
+        if d_from:
+            qs = qs.filter(**{f"{field}__gte": start(d_from)})
+        if d_to:
+            qs = qs.filter(**{f"{field}__lt": start(d_to + timedelta(days=1))})
+    else:
+        if d_from:
+            qs = qs.filter(**{f"{field}__gte": d_from})
+        if d_to:
+            qs = qs.filter(**{f"{field}__lte": d_to})
+    return qs
+
+
+def _csv_rows(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_plain(v) for v in row])
+
+
+def _ndjson_rows(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, map(_plain, row))), ensure_ascii=False) + "\n"
+
+
+def stream_export(queryset, columns, filename, output="csv", chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Exporta `queryset` en streaming.
+    `columns`: lista de (cabecera, lookup ORM). Se usa values_list + iterator():
+    no se instancian modelos ni serializers, y la memoria no depende del rango
+    (en Postgres iterator() usa un cursor de servidor).
+    """
+    header = [h for h, _ in columns]
+    rows = queryset.values_list(*[lookup for _, lookup in columns]).iterator(chunk_size=chunk_size)
+    if output == "ndjson":
+        response = StreamingHttpResponse(_ndjson_rows(header, rows), content_type="application/x-ndjson")
+        filename = f"{filename}.ndjson"
+    else:
+        response = StreamingHttpResponse(_csv_rows(header, rows), content_type="text/csv; charset=utf-8")
+        filename = f"{filename}.csv"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response["X-Accel-Buffering"] = "no"  # nginx: no acumular la respuesta
+    return response
+
+
+class ExportMixin:
+    """
+    Añade GET <recurso>/export/ al ViewSet:
+      ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD  (sobre export_date_field)
+      ?output=csv|ndjson                         (por defecto csv)
+    Respeta los filtros del ViewSet (filterset_fields, etc.).
+    Se usa `output` y no `format`, que DRF reserva para elegir renderer.
+    """
+    export_columns = []
+    export_date_field = "created_at"
+    export_filename = "export"
+
+    @action(detail=False, methods=["get"], url_path="export", permission_classes=[permissions.IsAuthenticated])
+    def export(self, request):
+        output = request.query_params.get("output", "csv")
+        if output not in ("csv", "ndjson"):
+            raise ValidationError({"output": "Debe ser csv o ndjson"})
+        qs = self.filter_queryset(self.get_queryset())
+        qs = filter_date_range(
+            qs, self.export_date_field,
+            request.query_params.get("date_from"), request.query_params.get("date_to"),
+        )
+        # Orden estable por pk (sin select_related/prefetch: values_list hace los joins)
+        qs = qs.select_related(None).prefetch_related(None).order_by("pk")
+        stamp = timezone.localdate().isoformat()
+        return stream_export(qs, self.export_columns, f"{self.export_filename}-{stamp}", output)
@@ -0,0 +1,153 @@
+# housekeeping/forecast.py
+import hashlib
+import json
+import math
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+try:
+    import numpy as np
+except Exception:
+    np = None  # para poder arrancar sin numpy; forecast=true responde 503
+
+from .models import InventoryMovement
+
+# Parámetros (sobrescribibles con settings.INVENTORY_FORECAST)
+DEFAULTS = {
+    "window_days": 56,      # historia usada (8 semanas => estacionalidad semanal)
+    "rate_days": 28,        # media móvil para el consumo diario base
+    "horizon_days": 60,     # hasta dónde se proyecta el quiebre de stock
+    "lead_time_days": 7,    # plazo del proveedor
+    "review_days": 14,      # cobertura que debe dejar un pedido
+    "service_z": 1.65,      # ~95% nivel de servicio para stock de seguridad
+}
+CACHE_PREFIX = "inv-forecast"
+
+
+class ForecastUnavailable(Exception):
+    pass
+
+
+def _params():
+    p = {**DEFAULTS, **getattr(settings, "INVENTORY_FORECAST", {})}
+    # Con menos de 7 días algún weekday queda sin columnas y su media es NaN
+    p["window_days"] = max(7, int(p["window_days"]))
+    p["rate_days"] = min(max(1, int(p["rate_days"])), p["window_days"])
+    p["lead_time_days"] = max(0, int(p["lead_time_days"]))
+    p["review_days"] = max(1 - p["lead_time_days"], int(p["review_days"]))
+    return p
+
+
+def _cache_key(item, today, p):
+    """
+    La clave sale de los datos de la base, no de una invalidación por proceso:
+    - la fecha: el consumo usado es de días cerrados, cambia solo al cambiar de día;
+    - stock y min_stock del item: cualquier movimiento o edición los cambia;
+    - los parámetros (hash), por si cambian los settings.
+    Así todos los workers ven el mismo pronóstico vigente sin avisarse entre sí.
+    """
+    params = hashlib.sha1(json.dumps(p, sort_keys=True).encode()).hexdigest()[:8]
+    return f"{CACHE_PREFIX}:{today.isoformat()}:{params}:{item.pk}:{item.stock}:{item.min_stock}"
+
+
+def _day_start(d):
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+def _compute(items, today, p):
+    """Una sola pasada vectorizada sobre todos los items (matriz items × días)."""
+    n = len(items)
+    window = p["window_days"]
+    horizon = max(p["horizon_days"], p["lead_time_days"] + p["review_days"])
+    start = today - timedelta(days=window)
+    row_of = {it.pk: i for i, it in enumerate(items)}
+
+    # Consumo diario (OUT) agregado en la base; rango sobre created_at (usa índice)
+    usage = np.zeros((n, window))
+    rows = (
+        InventoryMovement.objects
+        .filter(
+            type=InventoryMovement.Type.OUT,
+            item_id__in=list(row_of),
+            created_at__gte=_day_start(start),
+            created_at__lt=_day_start(today),
+        )
+        .annotate(day=TruncDate("created_at"))
+        .values_list("item_id", "day")
+        .annotate(qty=Sum("quantity"))
+        .order_by()
+    )
+    for item_id, day, qty in rows:
+        col = (day - start).days
+        if 0 <= col < window:
+            usage[row_of[item_id], col] += qty
+
+    past_wd = np.array([(start + timedelta(days=d)).weekday() for d in range(window)])
+    future_wd = np.array([(today + timedelta(days=d)).weekday() for d in range(horizon)])
+
+    recent = usage[:, -p["rate_days"]:]
+    rate = recent.mean(axis=1)
+    rate_7d = usage[:, -7:].mean(axis=1)
+    sigma = recent.std(axis=1)
+
+    # Estacionalidad semanal: media del weekday / media global (1.0 si no hay consumo)
+    overall = usage.mean(axis=1)[:, None]
+    wd_mean = np.stack([usage[:, past_wd == w].mean(axis=1) for w in range(7)], axis=1)
+    factors = np.divide(wd_mean, overall, out=np.ones_like(wd_mean), where=overall > 0)
+
+    projected = rate[:, None] * factors[:, future_wd]           # items × horizonte
+    cumulative = np.cumsum(projected, axis=1)
+
+    stock = np.array([it.stock for it in items], dtype=float)
+    min_stock = np.array([it.min_stock for it in items], dtype=float)
+    available = stock - min_stock
+
+    exceeded = cumulative > available[:, None]
+    first = exceeded.argmax(axis=1)
+    cover = np.where(available <= 0, 0, np.where(exceeded.any(axis=1), first, -1))
+
+    needed_days = p["lead_time_days"] + p["review_days"]
+    demand = cumulative[:, needed_days - 1]
+    safety = p["service_z"] * sigma * math.sqrt(p["lead_time_days"])
+    reorder = np.ceil(np.maximum(0.0, demand + safety + min_stock - stock))
+
+    out = {}
+    for i, it in enumerate(items):
+        days = int(cover[i])
+        out[it.pk] = {
+            "daily_consumption": round(float(rate[i]), 3),
+            "daily_consumption_7d": round(float(rate_7d[i]), 3),
+            "weekday_factors": [round(float(f), 3) for f in factors[i]],
+            "days_of_cover": days if days >= 0 else None,
+            "stockout_date": (today + timedelta(days=days)).isoformat() if days >= 0 else None,
+            "forecast_demand": round(float(demand[i]), 2),
+            "reorder_qty": int(reorder[i]),
+        }
+    return out
+
+
+def forecast_items(items):
+    """
+    Pronóstico por item ({item_id: dict}). Usa la caché y recalcula, en un solo
+    lote vectorizado, solo los items sin pronóstico vigente.
+    """
+    if np is None:
+        raise ForecastUnavailable("numpy no está instalado")
+    items = list(items)
+    today = timezone.localdate()
+    p = _params()
+    keys = {it.pk: _cache_key(it, today, p) for it in items}
+    cached = cache.get_many(list(keys.values()))
+    result = {pk: cached[k] for pk, k in keys.items() if k in cached}
+
+    stale = [it for it in items if it.pk not in result]
+    if stale:
+        fresh = _compute(stale, today, p)
+        cache.set_many({keys[pk]: data for pk, data in fresh.items()}, timeout=24 * 3600)
+        result.update(fresh)
+    return result
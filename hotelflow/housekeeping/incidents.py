@@ -0,0 +1,38 @@
+# housekeeping/incidents.py
+from .inventory import apply_movements
+from .models import IncidentLine, IncidentReport, InventoryMovement
+from .rollups import apply_incident_rows, report_day
+
+# MISSING/BROKEN/EXTRA_SUPPLY => salida de stock (OUT); al borrar la línea => IN
+OUTCOMES_TO_OUT = {"MISSING", "BROKEN", "EXTRA_SUPPLY"}
+
+
+def mk_reason_from_incident(line: IncidentLine, reverse: bool = False) -> str:
+    base = f"Incident #{line.report_id} · outcome={line.outcome}"
+    return f"REVERT {base}" if reverse else base
+
+
+def record_incident_lines(report: IncidentReport, lines):
+    """
+    Efectos de las líneas recién creadas con bulk_create (que no dispara señales):
+    - Un movimiento OUT por línea, con el mismo motivo que su reversión al
+      borrarla (mk_reason_from_incident); apply_movements agrega el delta y
+      hace un solo update de stock por item.
+    - Rollup diario de incidencias.
+    Debe llamarse dentro de la misma transacción que creó las líneas.
+    """
+    movements = [
+        {
+            "item": ln.inventory_item_id,
+            "type": InventoryMovement.Type.OUT,
+            "quantity": ln.quantity,
+            "reason": mk_reason_from_incident(ln),
+        }
+        for ln in lines
+        if ln.inventory_item_id and ln.outcome in OUTCOMES_TO_OUT
+    ]
+    # La pérdida ya ocurrió: no se valida contra min_stock
+    apply_movements(movements, created_by=report.reported_by, enforce_min_stock=False)
+
+    day = report_day(report.created_at)
+    apply_incident_rows((day, ln.inventory_item_id, ln.outcome, ln.quantity) for ln in lines)
@@ -0,0 +1,81 @@
+# housekeeping/inventory.py
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from core.metrics import observe_movements
+
+from .models import InventoryItem, InventoryMovement
+
+
+class InsufficientStock(Exception):
+    def __init__(self, item_id, requested, stock=None, min_stock=None):
+        self.item_id = item_id
+        self.requested = requested
+        self.stock = stock
+        self.min_stock = min_stock
+        super().__init__(
+            f"Stock insuficiente para item {item_id}: se piden {requested}, "
+            f"stock={stock}, min_stock={min_stock}."
+        )
+
+
+def _signed(type_, quantity) -> int:
+    qty = int(quantity)
+    return qty if type_ == InventoryMovement.Type.IN else -qty
+
+
+def apply_movements(lines, created_by=None, enforce_min_stock=True):
+    """
+    Aplica movimientos de inventario de forma atómica y sin lecturas previas.
+
+    `lines`: iterable de dicts con item (InventoryItem o id), type, quantity y
+    opcionalmente reason/notes/created_by.
+
+    - Se agrega el efecto neto por item y se hace UN update condicional por item:
+        UPDATE item SET stock = stock + delta
+        WHERE id = ? AND stock + delta >= max(min_stock, 0)
+      Si no se actualiza ninguna fila, otro escritor se llevó el stock antes:
+      se lanza InsufficientStock y se revierte todo el lote.
+    - Los items se actualizan en orden de id (evita deadlocks en Postgres).
+    - Los movimientos se insertan con bulk_create; como no disparan post_save,
+      la señal invmovement_created no vuelve a aplicar el stock.
+
+    Con enforce_min_stock=False (p.ej. incidencias: la pérdida ya ocurrió)
+    el update es incondicional, pero sigue siendo atómico.
+    """
+    movements = []
+    deltas = defaultdict(int)
+    for line in lines:
+        item = line["item"]
+        item_id = item.pk if isinstance(item, InventoryItem) else int(item)
+        mv = InventoryMovement(
+            item_id=item_id,
+            type=line["type"],
+            quantity=int(line["quantity"]),
+            reason=line.get("reason") or "",
+            notes=line.get("notes") or "",
+            created_by=line.get("created_by") or created_by,
+        )
+        movements.append(mv)
+        deltas[item_id] += _signed(mv.type, mv.quantity)
+
+    if not movements:
+        return []
+
+    with transaction.atomic():
+        for item_id in sorted(deltas):
+            delta = deltas[item_id]
+            if not delta:
+                continue
+            qs = InventoryItem.objects.filter(pk=item_id)
+            if delta < 0 and enforce_min_stock:
+                qs = qs.filter(stock__gte=Greatest(F("min_stock"), Value(0)) - delta)
+            if not qs.update(stock=F("stock") + delta):
+                current = InventoryItem.objects.filter(pk=item_id).values("stock", "min_stock").first() or {}
+                raise InsufficientStock(item_id, -delta, current.get("stock"), current.get("min_stock"))
+        InventoryMovement.objects.bulk_create(movements, batch_size=500)
+        transaction.on_commit(lambda: observe_movements(movements))
+    return movements
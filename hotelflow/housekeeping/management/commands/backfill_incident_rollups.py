@@ -0,0 +1,24 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from housekeeping.rollups import backfill_rollups
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el rollup diario de incidencias (IncidentDailyRollup) desde las líneas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date-from", type=str, help="YYYY-MM-DD (opcional)")
+        parser.add_argument("--date-to", type=str, help="YYYY-MM-DD (opcional)")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = datetime.date.fromisoformat(options["date_from"]) if options.get("date_from") else None
+            date_to = datetime.date.fromisoformat(options["date_to"]) if options.get("date_to") else None
+        except ValueError:
+            self.stderr.write(self.style.ERROR("Formato inválido, usa YYYY-MM-DD"))
+            return
+
+        created = backfill_rollups(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(f"Rollup reconstruido: {created} filas"))
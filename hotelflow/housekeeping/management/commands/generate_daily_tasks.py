@@ -0,0 +1,31 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from housekeeping.daily_tasks import generate_daily_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera las tareas de housekeeping desde la ocupación (RoomOccupancy). "
+        "Idempotente: se puede volver a correr tras cambios tardíos sin duplicar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=str, help="YYYY-MM-DD (por defecto hoy)")
+        parser.add_argument("--days", type=int, default=1, help="Días a generar desde --date")
+        parser.add_argument("--dry-run", action="store_true", help="Solo mostrar qué cambiaría")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = datetime.date.fromisoformat(options["date"]) if options.get("date") else timezone.localdate()
+        except ValueError:
+            raise CommandError("Formato inválido, usa YYYY-MM-DD")
+        date_to = date_from + datetime.timedelta(days=max(options["days"], 1) - 1)
+        result = generate_daily_tasks(date_from, date_to, dry_run=options["dry_run"])
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Tareas {date_from}..{date_to}: {result['created']} creadas, {result['updated']} actualizadas, "
+            f"{result['removed']} eliminadas, {result['kept']} conservadas, {result['checklist_items']} ítems de checklist"
+        ))
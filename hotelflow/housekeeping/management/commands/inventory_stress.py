@@ -0,0 +1,119 @@
+import json
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+
+from housekeeping.inventory import InsufficientStock, apply_movements
+from housekeeping.models import InventoryItem, InventoryMovement
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress test del ledger de inventario: varios hilos aplican movimientos IN/OUT "
+        "en paralelo sobre el mismo item y se verifica que no se pierdan updates "
+        "ni se baje de min_stock."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Hilos escritores en paralelo")
+        parser.add_argument("--ops", type=int, default=200, help="Operaciones por hilo")
+        parser.add_argument("--batch", type=int, default=5, help="Movimientos por operación (apply_movements)")
+        parser.add_argument("--initial-stock", type=int, default=100)
+        parser.add_argument("--min-stock", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--json", action="store_true", help="Imprime el resultado como JSON")
+        parser.add_argument("--keep", action="store_true", help="No borra el item de prueba al terminar")
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        ops = options["ops"]
+        batch = options["batch"]
+        rng = random.Random(options["seed"])
+
+        item = InventoryItem.objects.create(
+            name="Stress test item",
+            sku=f"STRESS-{int(time.time() * 1000)}-{rng.randint(0, 9999)}",
+            stock=options["initial_stock"],
+            min_stock=options["min_stock"],
+        )
+        lock = threading.Lock()
+        stats = {"applied": 0, "rejected": 0, "retries": 0}
+
+        def worker(seed):
+            wrng = random.Random(seed)
+            try:
+                for _ in range(ops):
+                    lines = [
+                        {
+                            "item": item.pk,
+                            "type": wrng.choice(["IN", "OUT"]),
+                            "quantity": wrng.randint(1, 5),
+                            "reason": "stress",
+                        }
+                        for _ in range(batch)
+                    ]
+                    for attempt in range(50):
+                        try:
+                            apply_movements(lines)
+                            key = "applied"
+                            break
+                        except InsufficientStock:
+                            key = "rejected"
+                            break
+                        except OperationalError:
+                            # SQLite: "database is locked" bajo contención; reintentar
+                            with lock:
+                                stats["retries"] += 1
+                            time.sleep(0.001 * (attempt + 1))
+                    else:
+                        raise CommandError("Demasiados reintentos por bloqueo de la base de datos")
+                    with lock:
+                        stats[key] += 1
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(rng.random(),)) for _ in range(workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        item.refresh_from_db()
+        totals = dict(
+            InventoryMovement.objects.filter(item=item).values_list("type").annotate(q=Sum("quantity"))
+        )
+        expected = options["initial_stock"] + totals.get("IN", 0) - totals.get("OUT", 0)
+        result = {
+            "workers": workers,
+            "operations": workers * ops,
+            "movements_per_op": batch,
+            "applied": stats["applied"],
+            "rejected_insufficient_stock": stats["rejected"],
+            "lock_retries": stats["retries"],
+            "seconds": round(elapsed, 3),
+            "ops_per_second": round(workers * ops / elapsed, 1) if elapsed else None,
+            "final_stock": item.stock,
+            "ledger_stock": expected,
+            "min_stock": item.min_stock,
+            "lost_updates": item.stock != expected,
+            "below_min_stock": item.stock < item.min_stock,
+        }
+
+        if not options["keep"]:
+            item.delete()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(result))
+        else:
+            for k, v in result.items():
+                self.stdout.write(f"{k}: {v}")
+
+        if result["lost_updates"] or result["below_min_stock"]:
+            raise CommandError("Inconsistencia detectada en el ledger de inventario")
+        self.stdout.write(self.style.SUCCESS("Ledger consistente: sin updates perdidos ni stock bajo mínimo."))
@@ -0,0 +1,46 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+
+from housekeeping.analytics import AnalyticsUnavailable, materialize_turnarounds
+from housekeeping.models import TurnaroundSample
+
+
+class Command(BaseCommand):
+    help = (
+        "Materializa los tiempos de turnaround (TurnaroundSample) por día. "
+        "Sin fechas: incremental desde el último día materializado hasta hoy (pensado para cron: "
+        "nocturno, y cada pocos minutos si se quiere el día en curso al día)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date-from", type=str, help="YYYY-MM-DD (opcional)")
+        parser.add_argument("--date-to", type=str, help="YYYY-MM-DD (opcional, por defecto hoy)")
+        parser.add_argument("--chunk-days", type=int, default=31, help="Días por lote (acota memoria)")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = datetime.date.fromisoformat(options["date_from"]) if options.get("date_from") else None
+            date_to = datetime.date.fromisoformat(options["date_to"]) if options.get("date_to") else timezone.localdate()
+        except ValueError:
+            raise CommandError("Formato inválido, usa YYYY-MM-DD")
+        if date_from is None:
+            last = TurnaroundSample.objects.aggregate(d=Max("day"))["d"]
+            # se rehace el último día (pudo quedar a medias) y lo que falte hasta hoy
+            date_from = last or (date_to - datetime.timedelta(days=1))
+        if date_from > date_to:
+            raise CommandError("date_from posterior a date_to")
+
+        total = 0
+        day = date_from
+        step = datetime.timedelta(days=max(options["chunk_days"], 1))
+        try:
+            while day <= date_to:
+                chunk_end = min(day + step - datetime.timedelta(days=1), date_to)
+                total += materialize_turnarounds(day, chunk_end)
+                day = chunk_end + datetime.timedelta(days=1)
+        except AnalyticsUnavailable as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Turnarounds materializados {date_from}..{date_to}: {total} muestras"))
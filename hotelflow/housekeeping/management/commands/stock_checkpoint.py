@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from housekeeping.stock_history import reconcile, take_checkpoints
+
+
+class Command(BaseCommand):
+    help = "Toma checkpoints de stock por item (pensado para correr a diario por cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-movements",
+            type=int,
+            default=0,
+            help="Solo items con al menos N movimientos desde su último checkpoint",
+        )
+        parser.add_argument(
+            "--baseline",
+            action="store_true",
+            help="Marca el primer checkpoint de cada item como saldo inicial (sin historia previa)",
+        )
+        parser.add_argument(
+            "--reconcile",
+            action="store_true",
+            help="Después del checkpoint, lista items cuyo stock no coincide con el ledger",
+        )
+
+    def handle(self, *args, **options):
+        created = take_checkpoints(min_movements=options["min_movements"], baseline=options["baseline"])
+        self.stdout.write(self.style.SUCCESS(f"Checkpoints creados: {created}"))
+
+        if options["reconcile"]:
+            rows = reconcile()
+            if not rows:
+                self.stdout.write(self.style.SUCCESS("Sin diferencias entre stock y ledger."))
+            for r in rows:
+                self.stdout.write(self.style.WARNING(
+                    f"{r['sku']}: stock={r['stock']} ledger={r['ledger_stock']} drift={r['drift']}"
+                ))
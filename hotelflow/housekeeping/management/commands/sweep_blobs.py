@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from housekeeping.storage import SWEEP_GRACE, sweep_blobs
+from housekeeping.uploads import sweep_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los blobs del almacenamiento por contenido que quedaron sin referencias y las "
+        "subidas por trozos expiradas (CHUNKED_UPLOAD_EXPIRY) con sus archivos parciales (pensado para cron)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-minutes",
+            type=int,
+            default=int(SWEEP_GRACE.total_seconds() // 60),
+            help="Solo blobs sin referencias que no se tocaron en los últimos N minutos",
+        )
+
+    def handle(self, *args, **options):
+        removed = sweep_blobs(grace=timedelta(minutes=options["grace_minutes"]))
+        self.stdout.write(self.style.SUCCESS(f"Blobs borrados: {removed}"))
+        self.stdout.write(self.style.SUCCESS(f"Subidas expiradas borradas: {sweep_uploads()}"))
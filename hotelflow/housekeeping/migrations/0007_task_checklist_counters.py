@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-19 03:58
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    HousekeepingTask = apps.get_model("housekeeping", "HousekeepingTask")
+    qs = HousekeepingTask.objects.annotate(
+        total=Count("checklist"),
+        done=Count("checklist", filter=Q(checklist__is_completed=True)),
+    ).filter(total__gt=0)
+    for task in qs.iterator():
+        HousekeepingTask.objects.filter(pk=task.pk).update(checklist_total=task.total, checklist_done=task.done)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housekeeping', '0006_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='housekeepingtask',
+            name='checklist_done',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='housekeepingtask',
+            name='checklist_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
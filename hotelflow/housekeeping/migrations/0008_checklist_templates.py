@@ -0,0 +1,45 @@
+# Generated by Django 4.2.23 on 2026-10-19 04:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housekeeping', '0007_task_checklist_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChecklistTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_type', models.CharField(choices=[('TURNOVER', 'Turnover'), ('DEEP_CLEAN', 'Deep Clean'), ('AMENITIES', 'Amenities'), ('INSPECTION', 'Inspection')], max_length=20)),
+                ('room_category', models.CharField(blank=True, choices=[('STD', 'Standard'), ('DLX', 'Deluxe'), ('STE', 'Suite')], default='', help_text='Vacío = aplica a cualquier categoría', max_length=8)),
+                ('name', models.CharField(blank=True, default='', max_length=120)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['task_type', 'room_category'],
+                'unique_together': {('task_type', 'room_category')},
+            },
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='category',
+            field=models.CharField(choices=[('STD', 'Standard'), ('DLX', 'Deluxe'), ('STE', 'Suite')], default='STD', max_length=8),
+        ),
+        migrations.CreateModel(
+            name='ChecklistTemplateItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=255)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='housekeeping.checklisttemplate')),
+            ],
+            options={
+                'ordering': ['template', 'position', 'id'],
+            },
+        ),
+    ]
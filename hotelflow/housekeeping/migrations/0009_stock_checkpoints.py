@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-19 04:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housekeeping', '0008_checklist_templates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_movement_id', models.BigIntegerField(default=0, help_text='Último InventoryMovement incluido')),
+                ('ledger_stock', models.IntegerField(help_text='Saldo según movimientos')),
+                ('recorded_stock', models.IntegerField(help_text='InventoryItem.stock al tomar el checkpoint')),
+                ('movements_count', models.PositiveIntegerField(default=0, help_text='Movimientos desde el checkpoint anterior')),
+                ('is_baseline', models.BooleanField(default=False, help_text='Saldo inicial adoptado desde el stock registrado')),
+            ],
+            options={
+                'ordering': ['-taken_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inventorymovement',
+            index=models.Index(fields=['item', 'created_at'], name='housekeepin_item_id_43d401_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockcheckpoint',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='housekeeping.inventoryitem'),
+        ),
+        migrations.AddIndex(
+            model_name='stockcheckpoint',
+            index=models.Index(fields=['item', 'taken_at'], name='housekeepin_item_id_07bbe1_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.23 on 2026-10-19 04:05
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    # El summary de incidencias lee solo el rollup: se arma con las líneas existentes
+    IncidentLine = apps.get_model("housekeeping", "IncidentLine")
+    IncidentDailyRollup = apps.get_model("housekeeping", "IncidentDailyRollup")
+    agg = (
+        IncidentLine.objects.annotate(day=TruncDate("report__created_at"))
+        .values("day", "inventory_item_id", "outcome")
+        .annotate(total_qty=Sum("quantity"), lines_count=Count("id"))
+        .order_by()
+    )
+    IncidentDailyRollup.objects.bulk_create(
+        (IncidentDailyRollup(**row) for row in agg.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housekeeping', '0009_stock_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('outcome', models.CharField(choices=[('LAUNDRY_TO_RETURN', 'Devolver a lavandería'), ('LAUNDRY_REJECTED', 'Rechazada por lavandería'), ('MISSING', 'Falta en la habitación'), ('BROKEN', 'Roto/dañado'), ('EXTRA_SUPPLY', 'Se requirió reposición extra')], max_length=24)),
+                ('total_qty', models.IntegerField(default=0)),
+                ('lines_count', models.IntegerField(default=0)),
+                ('inventory_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='incident_rollups', to='housekeeping.inventoryitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='housekeepin_day_ebf649_idx')],
+                'unique_together': {('day', 'inventory_item', 'outcome')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-19 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housekeeping', '0010_incident_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='lat',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='lon',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-19 04:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('housekeeping', '0011_room_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomStatusTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('DIRTY', 'Dirty'), ('CLEANING', 'Cleaning'), ('CLEAN', 'Clean'), ('INSPECTION', 'Inspection'), ('OOO', 'Out of Order')], max_length=20)),
+                ('to_status', models.CharField(choices=[('DIRTY', 'Dirty'), ('CLEANING', 'Cleaning'), ('CLEAN', 'Clean'), ('INSPECTION', 'Inspection'), ('OOO', 'Out of Order')], max_length=20)),
+                ('floor', models.IntegerField()),
+                ('zone', models.CharField(blank=True, max_length=50)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('source', models.CharField(blank=True, default='', max_length=20)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_transitions', to='housekeeping.room')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['changed_at'], name='housekeepin_changed_bc6134_idx'), models.Index(fields=['room', 'changed_at'], name='housekeepin_room_id_86e206_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.23 on 2026-10-19 04:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('housekeeping', '0012_room_status_transitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurnaroundSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('DIRTY_TO_CLEAN', 'Dirty → Clean'), ('DIRTY_TO_INSPECTION', 'Dirty → Inspection'), ('TASK', 'Task duration')], max_length=24)),
+                ('day', models.DateField(help_text='Día local en que terminó')),
+                ('source_id', models.BigIntegerField(help_text='id de la transición final o de la tarea')),
+                ('floor', models.IntegerField()),
+                ('zone', models.CharField(blank=True, max_length=50)),
+                ('task_type', models.CharField(blank=True, max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('minutes', models.FloatField()),
+                ('housekeeper', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='housekeeping.room')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['metric', 'day'], name='housekeepin_metric_3602a3_idx')],
+                'unique_together': {('metric', 'source_id')},
+            },
+        ),
+    ]
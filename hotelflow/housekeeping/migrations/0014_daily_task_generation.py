@@ -0,0 +1,50 @@
+# Generated by Django 4.2.23 on 2026-10-19 04:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housekeeping', '0013_turnaround_samples'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('has_departure', models.BooleanField(default=False)),
+                ('has_arrival', models.BooleanField(default=False)),
+                ('is_stayover', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date', 'room_id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='housekeepingtask',
+            name='origin',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='housekeepingtask',
+            constraint=models.UniqueConstraint(condition=models.Q(('origin', ''), _negated=True), fields=('room', 'scheduled_for', 'task_type', 'origin'), name='uniq_generated_task_per_day'),
+        ),
+        migrations.AddField(
+            model_name='roomoccupancy',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='housekeeping.room'),
+        ),
+        migrations.AddIndex(
+            model_name='roomoccupancy',
+            index=models.Index(fields=['date'], name='housekeepin_date_2170cc_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='roomoccupancy',
+            unique_together={('room', 'date')},
+        ),
+    ]
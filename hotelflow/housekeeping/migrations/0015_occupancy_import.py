@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-19 04:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housekeeping', '0014_daily_task_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roomoccupancy',
+            name='pending_tasks',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.CreateModel(
+            name='OccupancyImportRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('import_ref', models.CharField(db_index=True, max_length=32)),
+                ('date', models.DateField()),
+                ('departure', models.PositiveSmallIntegerField(default=0)),
+                ('arrival', models.PositiveSmallIntegerField(default=0)),
+                ('stayover', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='housekeeping.room')),
+            ],
+        ),
+    ]
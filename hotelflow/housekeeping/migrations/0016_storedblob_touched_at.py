@@ -0,0 +1,19 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:13
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housekeeping', '0015_occupancy_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedblob',
+            name='touched_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
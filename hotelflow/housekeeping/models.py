@@ -1,5 +1,8 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 User = settings.AUTH_USER_MODEL
 
@@ -12,16 +15,84 @@ class Room(models.Model):
         INSPECTION = "INSPECTION", "Inspection"
         OOO = "OOO", "Out of Order"
 
+    class Category(models.TextChoices):
+        # mismas claves que TaskTimeEstimate.ROOM_CATEGORY (scheduling)
+        STD = "STD", "Standard"
+        DLX = "DLX", "Deluxe"
+        STE = "STE", "Suite"
+
     number = models.CharField(max_length=20, unique=True)
     floor = models.IntegerField(default=1)
     zone = models.CharField(max_length=50, blank=True, help_text="Ej: Ala Norte / Piso A")
+    category = models.CharField(max_length=8, choices=Category.choices, default=Category.STD)
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.DIRTY)
     notes = models.TextField(blank=True)
+    # Ubicación (mismo formato que StaffAvailability) para buscar al personal más cercano
+    lat = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    lon = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
 
     def __str__(self):
         return f"Room {self.number} ({self.get_status_display()})"
 
 
+class RoomStatusTransition(models.Model):
+    """
+    Log append-only de cambios de Room.status (housekeeping/room_events.py).
+    floor/zone se copian al momento del cambio para filtrar el feed sin joins.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="status_transitions")
+    from_status = models.CharField(max_length=20, choices=Room.Status.choices, blank=True)
+    to_status = models.CharField(max_length=20, choices=Room.Status.choices)
+    floor = models.IntegerField()
+    zone = models.CharField(max_length=50, blank=True)
+    changed_at = models.DateTimeField(default=timezone.now)
+    changed_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    source = models.CharField(max_length=20, blank=True, default="")
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["changed_at"]),
+            models.Index(fields=["room", "changed_at"]),
+        ]
+
+    def __str__(self):
+        return f"Room {self.room_id}: {self.from_status or '-'} → {self.to_status}"
+
+
+class TurnaroundSample(models.Model):
+    """
+    Tiempos de turnaround ya emparejados, uno por ocurrencia, materializados
+    por día (housekeeping/analytics.py). Las consultas de percentiles leen
+    solo estas columnas.
+    """
+    class Metric(models.TextChoices):
+        DIRTY_TO_CLEAN = "DIRTY_TO_CLEAN", "Dirty → Clean"
+        DIRTY_TO_INSPECTION = "DIRTY_TO_INSPECTION", "Dirty → Inspection"
+        TASK = "TASK", "Task duration"
+
+    metric = models.CharField(max_length=24, choices=Metric.choices)
+    day = models.DateField(help_text="Día local en que terminó")
+    source_id = models.BigIntegerField(help_text="id de la transición final o de la tarea")
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="+")
+    floor = models.IntegerField()
+    zone = models.CharField(max_length=50, blank=True)
+    task_type = models.CharField(max_length=20, blank=True)
+    housekeeper = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    minutes = models.FloatField()
+
+    class Meta:
+        unique_together = ("metric", "source_id")
+        indexes = [
+            models.Index(fields=["metric", "day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} room={self.room_id} {self.minutes:.1f}m"
+
+
 class StaffAvailability(models.Model):
     """Disponibilidad y ubicación del personal en tiempo cercano a real."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="availability")
@@ -64,11 +135,98 @@ class HousekeepingTask(models.Model):
     started_at = models.DateTimeField(null=True, blank=True)
     finished_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Progreso del checklist desnormalizado (mantenido con F() en housekeeping/checklists.py)
+    checklist_total = models.PositiveIntegerField(default=0)
+    checklist_done = models.PositiveIntegerField(default=0)
+    # "" = creada a mano / app; OCCUPANCY = generada desde RoomOccupancy (housekeeping/daily_tasks.py)
+    origin = models.CharField(max_length=20, blank=True, default="")
+
+    class Meta:
+        constraints = [
+            # idempotencia del generador diario: una tarea por habitación/día/tipo/origen
+            models.UniqueConstraint(
+                fields=["room", "scheduled_for", "task_type", "origin"],
+                condition=~models.Q(origin=""),
+                name="uniq_generated_task_per_day",
+            ),
+        ]
 
     def __str__(self):
         return f"[{self.get_status_display()}] {self.title} - {self.room}"
 
 
+class RoomOccupancy(models.Model):
+    """Ocupación de una habitación en un día (salida / llegada / continuación), base de la generación diaria."""
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="occupancy")
+    date = models.DateField()
+    has_departure = models.BooleanField(default=False)
+    has_arrival = models.BooleanField(default=False)
+    is_stayover = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Cambió (importación PMS) y faltan regenerar sus tareas: el change set persistido
+    pending_tasks = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        unique_together = ("room", "date")
+        ordering = ["date", "room_id"]
+        indexes = [
+            models.Index(fields=["date"]),
+        ]
+
+    def __str__(self):
+        return f"Room {self.room_id} {self.date}"
+
+
+class OccupancyImportRow(models.Model):
+    """
+    Staging de una importación PMS en curso (housekeeping/pms_import.py): los
+    registros se vuelcan por lotes y se combinan con un GROUP BY al final.
+    Flags como 0/1 para poder agregarlos con MAX en cualquier base.
+    """
+    import_ref = models.CharField(max_length=32, db_index=True)
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="+")
+    date = models.DateField()
+    departure = models.PositiveSmallIntegerField(default=0)
+    arrival = models.PositiveSmallIntegerField(default=0)
+    stayover = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+# ==== Media direccionada por contenido ====
+class StoredBlob(models.Model):
+    """Blob único en el storage CAS (ver housekeeping/storage.py), con conteo de referencias."""
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # último _save/release: el barrido no borra blobs sin referencias tocados hace poco
+    touched_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.size} bytes, refs={self.ref_count})"
+
+
+class UploadSession(models.Model):
+    """Subida reanudable por trozos (ver housekeeping/uploads.py)."""
+    class Status(models.TextChoices):
+        OPEN = "OPEN", "Open"
+        COMPLETE = "COMPLETE", "Complete"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="upload_sessions")
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    size = models.BigIntegerField(help_text="Tamaño total esperado en bytes")
+    offset = models.BigIntegerField(default=0, help_text="Bytes recibidos hasta ahora")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.OPEN)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.id} {self.filename} {self.offset}/{self.size}"
+
+
 def photo_upload_path(instance, filename):
     return f"checklists/task_{instance.task_id}/{instance.id or 'new'}/{filename}"
 
@@ -86,6 +244,37 @@ class ChecklistItem(models.Model):
         return f"ChecklistItem({self.text[:20]}...) for {self.task_id}"
 
 
+# ==== Plantillas de checklist ====
+class ChecklistTemplate(models.Model):
+    """Checklist estándar por tipo de tarea (y opcionalmente categoría de habitación)."""
+    task_type = models.CharField(max_length=20, choices=HousekeepingTask.TaskType.choices)
+    room_category = models.CharField(
+        max_length=8, choices=Room.Category.choices, blank=True, default="",
+        help_text="Vacío = aplica a cualquier categoría",
+    )
+    name = models.CharField(max_length=120, blank=True, default="")
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ("task_type", "room_category")
+        ordering = ["task_type", "room_category"]
+
+    def __str__(self):
+        return self.name or f"{self.task_type}/{self.room_category or '*'}"
+
+
+class ChecklistTemplateItem(models.Model):
+    template = models.ForeignKey(ChecklistTemplate, on_delete=models.CASCADE, related_name="items")
+    text = models.CharField(max_length=255)
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["template", "position", "id"]
+
+    def __str__(self):
+        return f"{self.template} #{self.position}: {self.text[:20]}"
+
+
 # ==== Inventory (Paso 6) ====
 class InventoryItem(models.Model):
     class Meta:
@@ -123,9 +312,40 @@ class InventoryMovement(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["item", "created_at"]),
+        ]
 
     def __str__(self):
         return f"{self.type} {self.quantity} {self.item.sku}"
+
+
+class StockCheckpoint(models.Model):
+    """
+    Saldo de un item según el ledger de movimientos hasta `last_movement_id`.
+    Permite responder "stock a fecha X" y conciliar InventoryItem.stock
+    sumando solo los movimientos posteriores (ver housekeeping/stock_history.py).
+    """
+    item = models.ForeignKey(InventoryItem, related_name="checkpoints", on_delete=models.CASCADE)
+    taken_at = models.DateTimeField(default=timezone.now)
+    last_movement_id = models.BigIntegerField(default=0, help_text="Último InventoryMovement incluido")
+    ledger_stock = models.IntegerField(help_text="Saldo según movimientos")
+    recorded_stock = models.IntegerField(help_text="InventoryItem.stock al tomar el checkpoint")
+    movements_count = models.PositiveIntegerField(default=0, help_text="Movimientos desde el checkpoint anterior")
+    is_baseline = models.BooleanField(default=False, help_text="Saldo inicial adoptado desde el stock registrado")
+
+    class Meta:
+        ordering = ["-taken_at"]
+        indexes = [
+            models.Index(fields=["item", "taken_at"]),
+        ]
+
+    def __str__(self):
+        return f"Checkpoint {self.item_id} @ {self.taken_at:%Y-%m-%d %H:%M} = {self.ledger_stock}"
+
+    @property
+    def drift(self):
+        return self.recorded_stock - self.ledger_stock
     
 
 
@@ -178,6 +398,27 @@ class IncidentLine(models.Model):
     
     
 
+class IncidentDailyRollup(models.Model):
+    """
+    Totales diarios de incidencias por (día, item, outcome), mantenidos
+    incrementalmente (housekeeping/rollups.py). Alimenta incidents/summary.
+    """
+    day = models.DateField()
+    inventory_item = models.ForeignKey("housekeeping.InventoryItem", null=True, blank=True, on_delete=models.SET_NULL, related_name="incident_rollups")
+    outcome = models.CharField(max_length=24, choices=IncidentLine.Outcome.choices)
+    total_qty = models.IntegerField(default=0)
+    lines_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("day", "inventory_item", "outcome")
+        indexes = [
+            models.Index(fields=["day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.day} item={self.inventory_item_id} {self.outcome} x{self.total_qty}"
+
+
 # ==== Chat Interno ====
 class ChatRoom(models.Model):
     class RoomType(models.TextChoices):
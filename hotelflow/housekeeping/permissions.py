@@ -1,19 +1,31 @@
 from rest_framework.permissions import BasePermission
 
+from accounts.authz import get_authz
+
 ALLOWED_GROUPS = {"housekeepers", "supervisor", "maintenance", "frontdesk"}
 
 class IsHKStaffOrHasModelView(BasePermission):
     """
     Permite acceso si el usuario pertenece a alguno de los grupos permitidos
     o si tiene permiso de modelo 'view_*' sobre Room.
+    Grupos y permisos salen del contexto cacheado (accounts/authz.py).
+    """
+    def has_permission(self, request, view):
+        u = request.user
+        if not u or not u.is_authenticated:
+            return False
+        ctx = get_authz(u)
+        return ctx.in_any_group(ALLOWED_GROUPS) or ctx.has_perm("housekeeping.view_room")
+
+
+class CanChangeRooms(BasePermission):
+    """
+    Escritura masiva de habitaciones: staff o permiso 'change_room'
+    (view_room solo alcanza para leer).
     """
     def has_permission(self, request, view):
         u = request.user
         if not u or not u.is_authenticated:
             return False
-        # grupos
-        user_groups = {g.name.lower() for g in u.groups.all()}
-        if user_groups & ALLOWED_GROUPS:
-            return True
-        # permiso de modelo
-        return u.has_perm("housekeeping.view_room")
\ No newline at end of file
+        ctx = get_authz(u)
+        return ctx.is_staff or ctx.has_perm("housekeeping.change_room")
@@ -0,0 +1,383 @@
+# housekeeping/pms_import.py
+import codecs
+import csv
+import io
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, Q
+from django.utils import timezone
+
+from .models import OccupancyImportRow, Room, RoomOccupancy
+
+BATCH_SIZE = 2000     # registros (habitación, día) por upsert
+MAX_ERRORS = 200      # errores por fila que se devuelven (el total se cuenta igual)
+MAX_NIGHTS = 60       # reservas más largas se consideran error de datos
+STAGING_TTL = timedelta(days=1)
+
+FLAGS = ("has_departure", "has_arrival", "is_stayover")
+EVENT_FLAG = {"DEPARTURE": 0, "ARRIVAL": 1, "STAYOVER": 2}
+
+# Columnas CSV aceptadas (en minúsculas) -> nombre interno
+CSV_ALIASES = {
+    "room": "room", "room_number": "room",
+    "property": "property", "property_code": "property",
+    "date": "date", "event": "event",
+    "arrival_date": "arrival", "departure_date": "departure",
+    "status": "status",
+}
+
+
+class PmsImportError(Exception):
+    """Archivo ilegible en conjunto (cabecera, formato); los errores por fila no cortan la importación."""
+
+
+class RowError(ValueError):
+    pass
+
+
+def _parse_day(value):
+    value = (value or "").strip()
+    if not value:
+        raise RowError("fecha vacía")
+    try:
+        if len(value) == 8 and value.isdigit():       # ICS: 20260302
+            return date(int(value[:4]), int(value[4:6]), int(value[6:]))
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise RowError(f"fecha inválida: {value}")
+
+
+# =========================================
+# Lectores (streaming, una fila a la vez)
+# =========================================
+
+def _text(stream):
+    """Binario o texto -> texto por líneas sin leer todo el archivo (tolera BOM)."""
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return codecs.getreader("utf-8-sig")(stream, errors="replace")
+
+
+def _stay_records(room, arrival, departure):
+    """Reserva -> registros diarios: llegada, noches intermedias (continuación) y salida."""
+    if departure < arrival:
+        raise RowError("salida anterior a la llegada")
+    if (departure - arrival).days > MAX_NIGHTS:
+        raise RowError(f"estadía de más de {MAX_NIGHTS} noches")
+    yield room, arrival, 1
+    day = arrival + timedelta(days=1)
+    while day < departure:
+        yield room, day, 2
+        day += timedelta(days=1)
+    yield room, departure, 0
+
+
+def read_csv(stream):
+    """
+    Filas (nº_línea, propiedad, [(room, día, índice_flag)]) de un CSV con:
+    - por reserva: room, arrival_date, departure_date [, property, status]
+    - por día: room, date, event (ARRIVAL|DEPARTURE|STAYOVER) [, property]
+    Los errores de una fila se devuelven como RowError en lugar de registros.
+    Las canceladas (status CANCELLED/NO_SHOW) traen sus días con flag None:
+    cubiertos pero sin ocupación.
+    """
+    reader = csv.reader(_text(stream))
+    try:
+        header = next(reader)
+    except StopIteration:
+        return
+    cols = {CSV_ALIASES[h.strip().lower()]: i for i, h in enumerate(header) if h.strip().lower() in CSV_ALIASES}
+    per_stay = "arrival" in cols and "departure" in cols
+    if "room" not in cols or not (per_stay or ("date" in cols and "event" in cols)):
+        raise PmsImportError("Cabecera CSV: se requiere room + arrival_date/departure_date, o room + date + event.")
+
+    def get(row, key):
+        i = cols.get(key)
+        return row[i].strip() if i is not None and i < len(row) else ""
+
+    for row in reader:
+        line = reader.line_num
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            room = get(row, "room")
+            if not room:
+                raise RowError("habitación vacía")
+            cancelled = get(row, "status").upper() in ("CANCELLED", "CANCELED", "NO_SHOW")
+            if per_stay:
+                records = list(_stay_records(room, _parse_day(get(row, "arrival")), _parse_day(get(row, "departure"))))
+            else:
+                event = get(row, "event").upper()
+                if event not in EVENT_FLAG:
+                    raise RowError(f"event inválido: {event or '-'}")
+                records = [(room, _parse_day(get(row, "date")), EVENT_FLAG[event])]
+            if cancelled:
+                records = [(number, day, None) for number, day, _ in records]
+            yield line, get(row, "property"), records
+        except RowError as e:
+            yield line, get(row, "property"), e
+
+
+def _ics_lines(stream):
+    """Líneas lógicas de un ICS (RFC 5545: las que empiezan con espacio continúan la anterior)."""
+    current, start = None, 0
+    for n, raw in enumerate(_text(stream), 1):
+        raw = raw.rstrip("\r\n")
+        if raw[:1] in (" ", "\t") and current is not None:
+            current += raw[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = raw, n
+    if current is not None:
+        yield start, current
+
+
+def read_ics(stream):
+    """
+    Reservas de un ICS: un VEVENT por estadía con DTSTART (llegada), DTEND
+    (salida), LOCATION o X-PMS-ROOM (habitación) y opcional X-PMS-PROPERTY.
+    STATUS:CANCELLED trae sus días con flag None. Mismo formato de salida que read_csv.
+    """
+    event, line = None, 0
+    for n, text in _ics_lines(stream):
+        name, _, value = text.partition(":")
+        key = name.split(";", 1)[0].upper()
+        if key == "BEGIN" and value.upper() == "VEVENT":
+            event, line = {}, n
+        elif event is None:
+            continue
+        elif key == "END" and value.upper() == "VEVENT":
+            prop = event.get("X-PMS-PROPERTY", "")
+            try:
+                room = event.get("X-PMS-ROOM") or event.get("LOCATION", "")
+                if not room:
+                    raise RowError("VEVENT sin LOCATION/X-PMS-ROOM")
+                records = list(_stay_records(room, _parse_day(event.get("DTSTART")), _parse_day(event.get("DTEND"))))
+                if event.get("STATUS", "").upper() == "CANCELLED":
+                    records = [(number, day, None) for number, day, _ in records]
+                yield line, prop, records
+            except RowError as e:
+                yield line, prop, e
+            event = None
+        else:
+            event[key] = value.replace("\\,", ",").strip()
+
+
+READERS = {"csv": read_csv, "ics": read_ics}
+
+
+def detect_format(filename, explicit=None):
+    kind = (explicit or "").lower() or ("ics" if (filename or "").lower().endswith((".ics", ".ical")) else "csv")
+    if kind not in READERS:
+        raise PmsImportError(f"Formato no soportado: {kind} (csv | ics)")
+    return kind
+
+
+# =========================================
+# Upsert por lotes
+# =========================================
+
+class OccupancyImporter:
+    """
+    Importa un archivo PMS con memoria acotada por el lote, no por el archivo:
+    1) los registros (habitación, día, flag) se vuelcan por lotes a la tabla
+       de staging OccupancyImportRow
+    2) un GROUP BY combina los flags de cada habitación/día (una salida y una
+       llegada del mismo día suelen venir en filas distintas) y se compara por
+       tramos con RoomOccupancy: solo se escriben las filas nuevas o distintas
+       (un UPDATE por combinación de flags, no por fila)
+    3) con replace=True, las habitaciones/días cubiertos por el archivo que no
+       vinieron en él se limpian (reservas movidas); los días de una reserva
+       cancelada cuentan como cubiertos y sin ocupación, así que también se
+       limpian. Sin replace las canceladas se ignoran: el archivo puede no
+       traer otra reserva del mismo día.
+
+    Room.number es único en todo el sistema (no por propiedad). En un archivo
+    de varias propiedades cada fila se resuelve en la suya: primero la
+    habitación "<propiedad>-<número>" (p.ej. "SUR-101") y si no existe, el
+    número tal cual; una misma habitación reclamada por dos propiedades es
+    error de fila, para no mezclar homónimas sin aviso. property_code importa
+    solo una propiedad y salta el resto.
+
+    Cada fila que cambia queda con pending_tasks=True: ese es el change set
+    que consume daily_tasks.sync_pending_occupancy. Reimportar el mismo
+    archivo no cambia nada.
+    """
+
+    def __init__(self, property_code="", date_from=None, date_to=None, replace=False):
+        self.ref = uuid.uuid4().hex
+        self.property_code = property_code
+        self.date_from, self.date_to = date_from, date_to
+        self.replace = replace
+        self.rooms = dict(Room.objects.values_list("number", "id"))
+        self.room_property = {}           # room_id -> propiedad que la usó (números sin prefijo)
+        self.batch = {}
+        self.changes = defaultdict(int)   # día -> habitaciones que cambiaron
+        self.errors = []
+        self.stats = {"rows": 0, "skipped": 0, "records": 0, "created": 0, "updated": 0, "unchanged": 0, "cleared": 0, "errors": 0}
+
+    def _error(self, line, message):
+        self.stats["errors"] += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def _room_id(self, prop, number):
+        if prop:
+            room_id = self.rooms.get(f"{prop}-{number}")
+            if room_id is not None:
+                return room_id
+        room_id = self.rooms.get(number)
+        if room_id is None:
+            raise RowError(f"habitación desconocida: {number}")
+        owner = self.room_property.setdefault(room_id, prop)
+        if owner != prop:
+            raise RowError(f"la habitación {number} ya vino de la propiedad {owner or '-'} (usa <propiedad>-<número>)")
+        return room_id
+
+    def feed(self, rows):
+        # restos de importaciones interrumpidas
+        OccupancyImportRow.objects.filter(created_at__lt=timezone.now() - STAGING_TTL).delete()
+        try:
+            for line, prop, records in rows:
+                self.stats["rows"] += 1
+                if self.property_code and prop and prop != self.property_code:
+                    self.stats["skipped"] += 1
+                    continue
+                if isinstance(records, Exception):
+                    self._error(line, str(records))
+                    continue
+                if not records or (records[0][2] is None and not self.replace):
+                    continue
+                try:
+                    room_id = self._room_id(prop, records[0][0])
+                except RowError as e:
+                    self._error(line, str(e))
+                    continue
+                for number, day, flag in records:
+                    if (self.date_from and day < self.date_from) or (self.date_to and day > self.date_to):
+                        continue
+                    flags = self.batch.setdefault((room_id, day), [0, 0, 0])
+                    if flag is not None:
+                        flags[flag] = 1
+                if len(self.batch) >= BATCH_SIZE:
+                    self._stage()
+            self._stage()
+            self._merge()
+            if self.replace:
+                self._clear_missing()
+        finally:
+            OccupancyImportRow.objects.filter(import_ref=self.ref).delete()
+        return self.result()
+
+    def _stage(self):
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, {}
+        OccupancyImportRow.objects.bulk_create(
+            [
+                OccupancyImportRow(import_ref=self.ref, room_id=room_id, date=day, departure=f[0], arrival=f[1], stayover=f[2])
+                for (room_id, day), f in batch.items()
+            ],
+            batch_size=500,
+        )
+
+    def _staged(self):
+        return OccupancyImportRow.objects.filter(import_ref=self.ref)
+
+    def _merge(self):
+        merged = (
+            self._staged()
+            .values_list("room_id", "date")
+            .annotate(dep=Max("departure"), arr=Max("arrival"), stay=Max("stayover"))
+            .order_by("date", "room_id")
+        )
+        chunk = []
+        for row in merged.iterator(chunk_size=BATCH_SIZE):
+            chunk.append(row)
+            if len(chunk) >= BATCH_SIZE:
+                self._apply(chunk)
+                chunk = []
+        self._apply(chunk)
+
+    def _apply(self, chunk):
+        """Compara un tramo ya combinado con lo guardado y escribe solo las diferencias."""
+        if not chunk:
+            return
+        self.stats["records"] += len(chunk)
+        by_day = defaultdict(list)
+        for room_id, day, *_ in chunk:
+            by_day[day].append(room_id)
+        # claves exactas (un término por día): room_id__in × date__in traería el producto cruzado
+        keys = Q()
+        for day, room_ids in by_day.items():
+            keys |= Q(date=day, room_id__in=room_ids)
+
+        with transaction.atomic():
+            existing = {
+                (room_id, day): (pk, flags)
+                for pk, room_id, day, *flags in (
+                    RoomOccupancy.objects.select_for_update().filter(keys).values_list("pk", "room_id", "date", *FLAGS)
+                )
+            }
+            to_create = []
+            to_update = defaultdict(list)   # flags nuevos -> [pks]
+            for room_id, day, dep, arr, stay in chunk:
+                flags = (bool(dep), bool(arr), bool(stay))
+                current = existing.get((room_id, day))
+                if current is None:
+                    if not any(flags):
+                        continue   # cancelada sin ocupación guardada: nada que limpiar
+                    to_create.append(RoomOccupancy(room_id=room_id, date=day, pending_tasks=True, **dict(zip(FLAGS, flags))))
+                elif tuple(current[1]) != flags:
+                    to_update[flags].append(current[0])
+                else:
+                    self.stats["unchanged"] += 1
+                    continue
+                self.changes[day] += 1
+            RoomOccupancy.objects.bulk_create(to_create, batch_size=500)
+            now = timezone.now()
+            for flags, pks in to_update.items():
+                RoomOccupancy.objects.filter(pk__in=pks).update(pending_tasks=True, updated_at=now, **dict(zip(FLAGS, flags)))
+        cleared = len(to_update.get((False, False, False), ()))
+        self.stats["created"] += len(to_create)
+        self.stats["updated"] += sum(len(pks) for pks in to_update.values()) - cleared
+        self.stats["cleared"] += cleared
+
+    def _clear_missing(self):
+        """
+        Filas de habitaciones/días cubiertos por el archivo que no vinieron en él:
+        sin ocupación. Cubiertos = habitaciones y días que aparecen en el archivo
+        (no todo el rango entre el primer y el último día: los huecos no se tocan).
+        """
+        days = self._staged().values("date").distinct()
+        with transaction.atomic():
+            stale = (
+                RoomOccupancy.objects
+                .filter(room_id__in=self._staged().values("room_id"), date__in=days)
+                .exclude(has_departure=False, has_arrival=False, is_stayover=False)
+                .exclude(Exists(self._staged().filter(room_id=OuterRef("room_id"), date=OuterRef("date"))))
+            )
+            for day, n in stale.values_list("date").annotate(n=Count("id")).order_by():
+                self.changes[day] += n
+            self.stats["cleared"] += stale.update(
+                has_departure=False, has_arrival=False, is_stayover=False,
+                pending_tasks=True, updated_at=timezone.now(),
+            )
+
+    def result(self):
+        return {
+            "import_ref": self.ref,
+            **self.stats,
+            "changes": [{"date": d.isoformat(), "rooms": n} for d, n in sorted(self.changes.items())],
+            "error_list": self.errors,
+        }
+
+
+def import_occupancy(stream, filename="", file_format=None, **options):
+    """Lee `stream` (CSV o ICS) y hace el upsert. Devuelve el resumen del OccupancyImporter."""
+    reader = READERS[detect_format(filename, file_format)]
+    return OccupancyImporter(**options).feed(reader(stream))
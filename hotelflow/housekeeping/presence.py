@@ -0,0 +1,218 @@
+# housekeeping/presence.py
+import atexit
+import heapq
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import StaffAvailability
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 60  # s que puede esperar una posición pendiente (settings.PRESENCE_FLUSH_INTERVAL)
+MAX_AGE = 15 * 60    # s; posiciones ya escritas más viejas salen de memoria (settings.PRESENCE_MAX_AGE)
+MAX_ENTRIES = 10000  # tope de personas en memoria (settings.PRESENCE_MAX_ENTRIES)
+
+# user_id -> (lat, lon, ts). Solo la última posición por persona.
+_positions = {}
+_dirty = set()
+_dirty_since = None  # monotonic del primer pendiente desde el último flush
+_timer = None
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_version = 0
+
+
+def _interval():
+    return getattr(settings, "PRESENCE_FLUSH_INTERVAL", FLUSH_INTERVAL)
+
+
+def _max_age():
+    return getattr(settings, "PRESENCE_MAX_AGE", MAX_AGE)
+
+
+def _max_entries():
+    return getattr(settings, "PRESENCE_MAX_ENTRIES", MAX_ENTRIES)
+
+
+def record_pings(pings):
+    """
+    Registra posiciones [(user_id, lat, lon, ts)] en memoria, sin tocar la base.
+    Por persona se queda la de ts más reciente (los pings pueden llegar
+    desordenados desde el buffer offline del dispositivo).
+    Devuelve cuántos pings actualizaron una posición.
+    """
+    global _version, _dirty_since
+    changed = 0
+    with _lock:
+        for user_id, lat, lon, ts in pings:
+            current = _positions.get(user_id)
+            if current is not None and current[2] >= ts:
+                continue
+            _positions[user_id] = (lat, lon, ts)
+            _dirty.add(user_id)
+            changed += 1
+        if changed:
+            _version += 1
+            if _dirty_since is None:
+                _dirty_since = time.monotonic()
+            _schedule_flush()
+    return changed
+
+
+def positions():
+    """Copia de {user_id: (lat, lon, ts)} para lectura."""
+    with _lock:
+        return dict(_positions)
+
+
+def version():
+    """Cambia cada vez que se mueve alguien (el índice espacial la compara)."""
+    return _version
+
+
+def flush_presence():
+    """
+    Escribe las posiciones pendientes en StaffAvailability con UN solo UPDATE
+    (CASE por usuario). La condición last_seen < ts evita que un proceso con
+    datos viejos pise una posición más nueva escrita por otro worker.
+    Los usuarios sin fila de disponibilidad se crean con bulk_create
+    (bulk_create/update no disparan señales: el índice espacial ya ve las
+    posiciones desde este store).
+    Después saca de memoria lo ya escrito que sobra (ver _evict).
+    Devuelve cuántas posiciones se enviaron.
+    """
+    global _dirty_since
+    with _lock:
+        batch = {u: _positions[u] for u in _dirty}
+        _dirty.clear()
+        _dirty_since = None
+    if not batch:
+        _evict()
+        return 0
+    try:
+        existing = set(StaffAvailability.objects.filter(user_id__in=batch).values_list("user_id", flat=True))
+        missing = [u for u in batch if u not in existing]
+        if missing:
+            missing = list(get_user_model().objects.filter(pk__in=missing).values_list("pk", flat=True))
+        if missing:
+            StaffAvailability.objects.bulk_create(
+                [StaffAvailability(user_id=u, lat=batch[u][0], lon=batch[u][1], last_seen=batch[u][2]) for u in missing],
+                ignore_conflicts=True,
+            )
+            from .spatial import invalidate_staff_index  # import local: spatial importa presence
+            invalidate_staff_index()
+        if existing:
+            def case(field, pick):
+                output = StaffAvailability._meta.get_field(field)
+                return Case(
+                    *[When(user_id=u, last_seen__lt=batch[u][2], then=Value(pick(batch[u]), output_field=output))
+                      for u in existing],
+                    default=F(field),
+                    output_field=output,
+                )
+            StaffAvailability.objects.filter(user_id__in=existing).update(
+                lat=case("lat", lambda p: p[0]),
+                lon=case("lon", lambda p: p[1]),
+                last_seen=case("last_seen", lambda p: p[2]),
+            )
+    except Exception:
+        # se reintenta en el próximo flush (salvo que llegue una posición más nueva)
+        with _lock:
+            _dirty.update(u for u in batch if _positions.get(u) == batch[u])
+            if _dirty and _dirty_since is None:
+                _dirty_since = time.monotonic()
+        raise
+    _evict()
+    return len(batch)
+
+
+def _evict():
+    """
+    Saca de memoria posiciones ya escritas en la base: las de ts más viejo que
+    MAX_AGE y, si aún se pasa de MAX_ENTRIES, las más antiguas. Las pendientes
+    nunca (se perderían); el índice espacial vuelve a tomar esas de la base.
+    Devuelve cuántas sacó.
+    """
+    global _version
+    cutoff = timezone.now() - timedelta(seconds=_max_age())
+    with _lock:
+        clean = [(p[2], u) for u, p in _positions.items() if u not in _dirty]
+        evicted = [u for ts, u in clean if ts < cutoff]
+        excess = len(_positions) - len(evicted) - _max_entries()
+        if excess > 0:
+            evicted += [u for _, u in heapq.nsmallest(excess, [(ts, u) for ts, u in clean if ts >= cutoff])]
+        for u in evicted:
+            del _positions[u]
+        if evicted:
+            _version += 1
+    return len(evicted)
+
+
+def _flush_due():
+    """Hay un pendiente con más de FLUSH_INTERVAL, o el store pasó su tope."""
+    if len(_positions) > _max_entries():
+        return True
+    since = _dirty_since
+    return since is not None and time.monotonic() - since >= _interval()
+
+
+def maybe_flush(force=False):
+    """Flush si hace falta (ver _flush_due); no bloquea si otro hilo ya está escribiendo."""
+    if not (force or _flush_due()):
+        return False
+    if not _flush_lock.acquire(blocking=False):
+        return False
+    try:
+        flush_presence()
+    finally:
+        _flush_lock.release()
+    return True
+
+
+def _schedule_flush():
+    """
+    Con posiciones pendientes queda armado un Timer (uno por proceso, con
+    _lock tomado): se escriben a tiempo aunque no llegue otro ping.
+    """
+    global _timer
+    if _timer is None:
+        _timer = threading.Timer(_interval(), _flush_from_timer)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _flush_from_timer():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        maybe_flush(force=True)
+    except Exception:
+        logger.exception("No se pudieron guardar las posiciones pendientes")
+    finally:
+        connections.close_all()  # conexiones de este hilo
+    with _lock:
+        if _dirty:
+            _schedule_flush()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush_presence()
+    except Exception:
+        logger.exception("No se pudieron guardar las posiciones pendientes al salir")
+
+
+def clamp_ts(ts):
+    """Timestamp del cliente: sin valor o en el futuro => ahora."""
+    now = timezone.now()
+    return now if ts is None or ts > now else ts
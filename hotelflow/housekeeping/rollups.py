@@ -0,0 +1,67 @@
+# housekeeping/rollups.py
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import IncidentDailyRollup, IncidentLine
+
+
+def report_day(created_at):
+    """Día (zona local) al que se imputa un reporte."""
+    return timezone.localdate(created_at) if created_at else timezone.localdate()
+
+
+def apply_incident_rows(rows, sign: int = 1):
+    """
+    Suma (sign=1) o resta (sign=-1) líneas al rollup diario.
+    rows: iterable de (day, inventory_item_id, outcome, quantity).
+    Se agregan en memoria y se hace un UPDATE con F() por clave; solo si la
+    fila no existe se crea (con reintento si otro proceso la creó a la vez).
+    """
+    agg = defaultdict(lambda: [0, 0])
+    for day, item_id, outcome, qty in rows:
+        agg[(day, item_id, outcome)][0] += int(qty)
+        agg[(day, item_id, outcome)][1] += 1
+
+    for (day, item_id, outcome), (qty, count) in agg.items():
+        qs = IncidentDailyRollup.objects.filter(day=day, inventory_item_id=item_id, outcome=outcome)
+        changes = {"total_qty": F("total_qty") + sign * qty, "lines_count": F("lines_count") + sign * count}
+        if qs.update(**changes) or sign < 0:
+            continue
+        try:
+            with transaction.atomic():
+                IncidentDailyRollup.objects.create(
+                    day=day, inventory_item_id=item_id, outcome=outcome, total_qty=qty, lines_count=count
+                )
+        except IntegrityError:
+            qs.update(**changes)
+
+
+def backfill_rollups(date_from=None, date_to=None) -> int:
+    """Reconstruye el rollup para un rango de días (o completo) desde IncidentLine."""
+    lines = IncidentLine.objects.all()
+    rollups = IncidentDailyRollup.objects.all()
+    if date_from:
+        lines = lines.filter(report__created_at__gte=timezone.make_aware(datetime.combine(date_from, time.min)))
+        rollups = rollups.filter(day__gte=date_from)
+    if date_to:
+        lines = lines.filter(report__created_at__lte=timezone.make_aware(datetime.combine(date_to, time.max)))
+        rollups = rollups.filter(day__lte=date_to)
+
+    agg = (
+        lines.annotate(day=TruncDate("report__created_at"))
+        .values("day", "inventory_item_id", "outcome")
+        .annotate(total_qty=Sum("quantity"), lines_count=Count("id"))
+        .order_by()
+    )
+    with transaction.atomic():
+        rollups.delete()
+        objs = IncidentDailyRollup.objects.bulk_create(
+            (IncidentDailyRollup(**row) for row in agg.iterator()),
+            batch_size=1000,
+        )
+    return len(objs)
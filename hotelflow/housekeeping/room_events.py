@@ -0,0 +1,217 @@
+# housekeeping/room_events.py
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from rest_framework.renderers import BaseRenderer
+
+from .models import Room, RoomStatusTransition
+
+FEED_POLL_SECONDS = 2        # consulta a la base entre avisos (otros procesos)
+FEED_HEARTBEAT_SECONDS = 15  # comentario SSE para que proxies no corten la conexión
+FEED_MAX_SECONDS = 60        # settings.ROOM_FEED_MAX_SECONDS; el cliente reconecta con Last-Event-ID
+FEED_BATCH = 500
+# ids que se releen por vuelta: en Postgres un commit tardío puede dejar un id menor
+# al último enviado (las secuencias no siguen el orden de commit). < FEED_BATCH
+FEED_OVERLAP = 200
+
+_local = threading.local()
+_new_events = threading.Condition()
+
+
+# =========================================
+# Registro de transiciones
+# =========================================
+
+def make_transition(room: Room, from_status, to_status, user=None, source=""):
+    return RoomStatusTransition(
+        room_id=room.pk,
+        from_status=from_status or "",
+        to_status=to_status,
+        floor=room.floor,
+        zone=room.zone or "",
+        changed_by=user if (user and getattr(user, "is_authenticated", False)) else None,
+        source=source,
+    )
+
+
+def record_transitions(transitions):
+    """
+    Guarda transiciones en la misma transacción que el cambio de estado (si se
+    revierte, el log también). Dentro de collect() se acumulan y se escriben
+    juntas al salir del bloque; fuera (shell, código suelto) es un INSERT por llamada.
+    """
+    transitions = list(transitions)
+    if not transitions:
+        return transitions
+    buffer = getattr(_local, "buffer", None)
+    if buffer is not None:
+        buffer.extend(transitions)
+        return transitions
+    RoomStatusTransition.objects.bulk_create(transitions, batch_size=FEED_BATCH)
+    transaction.on_commit(notify_new_events)
+    return transitions
+
+
+@contextmanager
+def collect():
+    """
+    Agrupa las transiciones de todos los Room.save() del bloque en un solo
+    bulk_create al salir. Si el bloque falla no se escribe nada: usarlo dentro
+    de transaction.atomic() (RoomViewSet.dispatch lo hace en las escrituras).
+    """
+    if getattr(_local, "buffer", None) is not None:
+        yield _local.buffer  # anidado: escribe el bloque exterior
+        return
+    _local.buffer = buffer = []
+    try:
+        yield buffer
+    finally:
+        _local.buffer = None
+    record_transitions(buffer)
+
+
+def notify_new_events():
+    """Despierta a los streams SSE de este proceso (los demás se enteran por polling)."""
+    with _new_events:
+        _new_events.notify_all()
+
+
+# =========================================
+# Transición en bloque
+# =========================================
+
+S = Room.Status
+ALLOWED_TRANSITIONS = {
+    S.DIRTY: {S.CLEANING, S.INSPECTION, S.CLEAN, S.OOO},
+    S.CLEANING: {S.DIRTY, S.INSPECTION, S.CLEAN, S.OOO},
+    S.INSPECTION: {S.CLEAN, S.DIRTY, S.CLEANING, S.OOO},
+    S.CLEAN: {S.DIRTY, S.INSPECTION, S.OOO},
+    S.OOO: {S.DIRTY, S.INSPECTION},
+}
+
+
+class TransitionRejected(Exception):
+    def __init__(self, rejected):
+        self.rejected = rejected
+        super().__init__(f"{len(rejected)} habitaciones no admiten la transición")
+
+
+def bulk_transition(target, room_ids=None, floor=None, zone=None, from_statuses=None, user=None, strict=False):
+    """
+    Cambia el estado de muchas habitaciones a `target`:
+    - lee y bloquea la selección (1 query) y valida ALLOWED_TRANSITIONS en memoria
+    - aplica UN UPDATE set-based (condicionado a los estados de origen válidos)
+    - registra todas las transiciones en un bulk_create y avisa al feed una vez
+    Las que ya están en `target` se ignoran. Con strict=True, si alguna no
+    admite la transición no se cambia ninguna (TransitionRejected).
+    Devuelve {"updated": [ids], "unchanged": [ids], "rejected": [{room, from_status}]}.
+    """
+    qs = Room.objects.all()
+    if room_ids is not None:
+        qs = qs.filter(pk__in=room_ids)
+    if floor is not None:
+        qs = qs.filter(floor=floor)
+    if zone:
+        qs = qs.filter(zone=zone)
+    if from_statuses:
+        qs = qs.filter(status__in=from_statuses)
+
+    with transaction.atomic():
+        rows = list(qs.select_for_update().order_by("pk").values_list("pk", "status", "floor", "zone", "number"))
+        updated, unchanged, rejected = [], [], []
+        for row in rows:
+            pk, status = row[0], row[1]
+            if status == target:
+                unchanged.append(pk)
+            elif target in ALLOWED_TRANSITIONS.get(status, ()):
+                updated.append(row)
+            else:
+                rejected.append({"room": pk, "number": row[4], "from_status": status})
+        if strict and rejected:
+            raise TransitionRejected(rejected)
+
+        if updated:
+            valid_from = [s for s, targets in ALLOWED_TRANSITIONS.items() if target in targets]
+            Room.objects.filter(pk__in=[r[0] for r in updated], status__in=valid_from).update(status=target)
+            record_transitions(
+                make_transition(Room(pk=pk, floor=fl, zone=zn), status, target, user=user, source="bulk")
+                for pk, status, fl, zn, _ in updated
+            )
+    return {"updated": [r[0] for r in updated], "unchanged": unchanged, "rejected": rejected}
+
+
+# =========================================
+# Lectura incremental / feed SSE
+# =========================================
+
+def transitions_since(last_id=0, floors=None, zone=None, statuses=None, limit=FEED_BATCH):
+    qs = RoomStatusTransition.objects.filter(id__gt=last_id)
+    if floors:
+        qs = qs.filter(floor__in=floors)
+    if zone:
+        qs = qs.filter(zone=zone)
+    if statuses:
+        qs = qs.filter(to_status__in=statuses)
+    return list(
+        qs.order_by("id").values(
+            "id", "room_id", "room__number", "floor", "zone", "from_status", "to_status", "changed_at", "changed_by_id", "source",
+        )[:limit]
+    )
+
+
+def latest_transition_id():
+    return RoomStatusTransition.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def _sse(event):
+    return f"id: {event['id']}\nevent: room_status\ndata: {json.dumps(event, cls=DjangoJSONEncoder)}\n\n"
+
+
+def event_stream(last_id, floors=None, zone=None, statuses=None, max_seconds=None):
+    """
+    Generador SSE. Espera avisos de commits locales (o el intervalo de polling),
+    lee las filas nuevas por PK y las emite. Relee las últimas FEED_OVERLAP ids
+    (sin repetir las ya enviadas) para no saltear commits que llegan fuera de
+    orden; el piso es el id con el que se conectó el cliente.
+    Termina tras ROOM_FEED_MAX_SECONDS y el navegador reconecta solo con
+    Last-Event-ID. Mientras dura ocupa un worker síncrono entero: con gunicorn
+    dimensionar workers/threads (gthread) para los feeds abiertos, o usar el
+    polling de transitions/. Con ASGI, Django acumula los iteradores síncronos:
+    servir por WSGI.
+    """
+    if max_seconds is None:
+        max_seconds = getattr(settings, "ROOM_FEED_MAX_SECONDS", FEED_MAX_SECONDS)
+    yield "retry: 3000\n\n"
+    floor_id, sent = last_id, set()
+    started = last_beat = time.monotonic()
+    while time.monotonic() - started < max_seconds:
+        rows = transitions_since(max(floor_id, last_id - FEED_OVERLAP), floors, zone, statuses)
+        for row in rows:
+            if row["id"] in sent:
+                continue
+            sent.add(row["id"])
+            last_id = max(last_id, row["id"])
+            yield _sse(row)
+        sent = {i for i in sent if i > last_id - FEED_OVERLAP}
+        if len(rows) == FEED_BATCH:
+            continue
+        if time.monotonic() - last_beat >= FEED_HEARTBEAT_SECONDS:
+            last_beat = time.monotonic()
+            yield ": ping\n\n"
+        with _new_events:
+            _new_events.wait(FEED_POLL_SECONDS)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Permite negociar Accept: text/event-stream (los errores salen como JSON)."""
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder)
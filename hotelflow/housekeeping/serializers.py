@@ -1,8 +1,13 @@
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 from .models import Room, HousekeepingTask, ChecklistItem, StaffAvailability, InventoryItem, InventoryMovement, IncidentReport, IncidentLine
 from django.contrib.auth import get_user_model
 User = get_user_model()
-from .models import ChatRoom, ChatMessage
+from .models import ChatRoom, ChatMessage, UploadSession
+from .models import ChecklistTemplate, ChecklistTemplateItem
+from .incidents import record_incident_lines
+from .models import RoomOccupancy
 
 class RoomSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,11 +25,99 @@ class HousekeepingTaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = HousekeepingTask
         fields = "__all__"
+        # origin lo asigna el generador de tareas diarias: solo esas se regeneran/borran
+        read_only_fields = ("checklist_total", "checklist_done", "origin")
+
+
+class ChecklistItemCompactSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChecklistItem
+        fields = ["id", "text", "is_completed", "completed_at"]
+
+
+class HousekeepingTaskListSerializer(serializers.ModelSerializer):
+    """
+    Listado: el progreso va en checklist_total/checklist_done. Los ítems
+    (compactos, sin fotos) solo con ?include=checklist, servidos por prefetch.
+    """
+    checklist = ChecklistItemCompactSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = HousekeepingTask
+        fields = "__all__"
+        read_only_fields = ("checklist_total", "checklist_done", "origin")
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.context.get("include_checklist"):
+            fields.pop("checklist")
+        return fields
+
+class ChecklistTemplateItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChecklistTemplateItem
+        fields = ["id", "text", "position"]
+
+
+class ChecklistTemplateSerializer(serializers.ModelSerializer):
+    items = ChecklistTemplateItemSerializer(many=True, required=False)
+
+    class Meta:
+        model = ChecklistTemplate
+        fields = ["id", "task_type", "room_category", "name", "is_active", "items"]
+
+    def _write_items(self, template, items_data):
+        ChecklistTemplateItem.objects.bulk_create([
+            ChecklistTemplateItem(template=template, text=it["text"], position=it.get("position", i))
+            for i, it in enumerate(items_data)
+        ])
+
+    def create(self, validated_data):
+        items_data = validated_data.pop("items", [])
+        template = ChecklistTemplate.objects.create(**validated_data)
+        self._write_items(template, items_data)
+        return template
+
+    def update(self, instance, validated_data):
+        # Si se envían items, reemplazan a los existentes
+        items_data = validated_data.pop("items", None)
+        for attr, val in validated_data.items():
+            setattr(instance, attr, val)
+        instance.save()
+        if items_data is not None:
+            instance.items.all().delete()
+            self._write_items(instance, items_data)
+        return instance
 
 class StaffAvailabilitySerializer(serializers.ModelSerializer):
     class Meta:
         model = StaffAvailability
         fields = "__all__"
+
+
+class RoomOccupancySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RoomOccupancy
+        fields = ["id", "room", "date", "has_departure", "has_arrival", "is_stayover", "pending_tasks", "updated_at"]
+        read_only_fields = ["pending_tasks", "updated_at"]
+
+
+class PresencePingSerializer(serializers.Serializer):
+    # Float (no Decimal): los GPS mandan más de 6 decimales; se redondea al guardar
+    user = serializers.IntegerField(required=False)
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    ts = serializers.DateTimeField(required=False)
+
+
+class ChecklistCompleteSerializer(serializers.Serializer):
+    items = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    all = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+        if not attrs["all"] and not attrs.get("items"):
+            raise serializers.ValidationError("Se requiere 'items' (lista de ids) o 'all': true.")
+        return attrs
         
         
 
@@ -47,17 +140,11 @@ class InventoryMovementSerializer(serializers.ModelSerializer):
         read_only_fields = ("created_at", "created_by")
 
     def validate(self, attrs):
-        item = attrs.get("item")
-        type_ = attrs.get("type")
         qty = attrs.get("quantity")
         if qty is None or qty <= 0:
             raise serializers.ValidationError({"quantity": "Debe ser > 0"})
-        if type_ == "OUT":
-            new_stock = (item.stock or 0) - int(qty)
-            if new_stock < 0:
-                raise serializers.ValidationError({"quantity": "Stock insuficiente (no puede quedar negativo)."})
-            if new_stock < (item.min_stock or 0):
-                raise serializers.ValidationError({"quantity": f"Operacion dejaría stock ({new_stock}) por debajo de min_stock ({item.min_stock})."})
+        # El control de stock/min_stock lo hace el ledger (housekeeping/inventory.py)
+        # con un UPDATE condicional: validarlo aquí usaría un valor posiblemente viejo.
         return attrs
     
 
@@ -75,8 +162,14 @@ class IncidentLineSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class IncidentReportLineSerializer(IncidentLineSerializer):
+    """Línea anidada en el reporte: el report lo asigna el padre."""
+    class Meta(IncidentLineSerializer.Meta):
+        read_only_fields = ["report"]
+
+
 class IncidentReportSerializer(serializers.ModelSerializer):
-    lines = IncidentLineSerializer(many=True)
+    lines = IncidentReportLineSerializer(many=True)
     reported_by = serializers.PrimaryKeyRelatedField(read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
 
@@ -89,9 +182,13 @@ class IncidentReportSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         if request and getattr(request, "user", None) and request.user.is_authenticated:
             validated_data["reported_by"] = request.user
-        report = IncidentReport.objects.create(**validated_data)
-        for line in lines_data:
-            IncidentLine.objects.create(report=report, **line)
+        with transaction.atomic():
+            report = IncidentReport.objects.create(**validated_data)
+            # Líneas en un solo INSERT; stock y rollup se aplican agregados por item
+            lines = IncidentLine.objects.bulk_create([IncidentLine(report=report, **line) for line in lines_data])
+            record_incident_lines(report, lines)
+        # La respuesta lista las líneas con el nombre del item: 2 queries, no N
+        prefetch_related_objects([report], "lines__inventory_item")
         return report
 
     def update(self, instance, validated_data):
@@ -121,4 +218,20 @@ class ChatRoomSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatRoom
         fields = ["id", "room_type", "name", "participants", "task", "room", "messages", "created_at"]
-        read_only_fields = ["created_at"]
\ No newline at end of file
+        read_only_fields = ["created_at"]
+
+
+# ==== Uploads reanudables ====
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ["id", "filename", "content_type", "size", "offset", "status", "created_at"]
+        read_only_fields = ["offset", "status", "created_at"]
+
+    def validate_size(self, value):
+        from .uploads import max_upload_size
+        if value <= 0:
+            raise serializers.ValidationError("Debe ser > 0")
+        if value > max_upload_size():
+            raise serializers.ValidationError(f"Máximo {max_upload_size()} bytes")
+        return value
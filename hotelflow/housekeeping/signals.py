@@ -1,56 +1,70 @@
 # housekeeping/signals.py
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete, m2m_changed
+from django.db import transaction
+from django.db.models import F
 from django.dispatch import receiver
-from django.utils import timezone
 
 from .models import (
     ChecklistItem,
-    HousekeepingTask,
     InventoryItem,
     InventoryMovement,
     IncidentReport,
     IncidentLine,
+    ChatMessage,
+    ChatRoom,
+    StaffAvailability,
+    Room,
 )
+from .storage import acquire_blob, release_blob
+from .checklists import apply_checklist_delta, counters_deferred, sync_task_state, recount_checklists
+from .rollups import apply_incident_rows, report_day
+from .incidents import OUTCOMES_TO_OUT, mk_reason_from_incident
+from .spatial import invalidate_staff_index
+from .room_events import make_transition, record_transitions
+from accounts.authz import invalidate_users
+from core.metrics import observe_movements
 
 # =========================
 # CHECKLIST → estado tarea
 # =========================
 
-def _recalc_task(task: HousekeepingTask):
-    total = task.checklist.count()
-    done = task.checklist.filter(is_completed=True).count()
-    if total > 0 and done == total:
-        # Todo completo => DONE + finished_at
-        updates = []
-        if task.status != HousekeepingTask.Status.DONE:
-            task.status = HousekeepingTask.Status.DONE
-            updates.append("status")
-        if not task.finished_at:
-            task.finished_at = timezone.now()
-            updates.append("finished_at")
-        if updates:
-            task.save(update_fields=updates)
-    else:
-        # Si estaba DONE y alguien desmarca, vuelve a IN_PROGRESS
-        if task.status == HousekeepingTask.Status.DONE:
-            task.status = HousekeepingTask.Status.IN_PROGRESS
-            task.finished_at = None
-            task.save(update_fields=["status", "finished_at"])
+# Los contadores checklist_total/checklist_done se ajustan con F() y el
+# estado se recalcula a partir de ellos (sin COUNT por cada tick).
+
+@receiver(post_init, sender=ChecklistItem)
+def checklistitem_init(sender, instance: ChecklistItem, **kwargs):
+    instance._progress_snapshot = (instance.__dict__.get("task_id"), instance.__dict__.get("is_completed"))
 
 @receiver(post_save, sender=ChecklistItem)
 def checklistitem_saved(sender, instance: ChecklistItem, created, **kwargs):
-    task = instance.task
-    # Primer completado pasa la tarea a IN_PROGRESS y setea started_at
-    if instance.is_completed and task.started_at is None:
-        task.started_at = timezone.now()
-        if task.status == HousekeepingTask.Status.PENDING:
-            task.status = HousekeepingTask.Status.IN_PROGRESS
-        task.save(update_fields=["started_at", "status"])
-    _recalc_task(task)
+    done = 1 if instance.is_completed else 0
+    old_task_id, was_completed = getattr(instance, "_progress_snapshot", (None, None))
+    if counters_deferred(instance.task_id, old_task_id):
+        pass  # se recuentan al salir de deferred_counters()
+    elif created:
+        apply_checklist_delta(instance.task_id, total=1, done=done)
+        sync_task_state(instance.task_id)
+    else:
+        if was_completed is None:
+            # campo diferido: no sabemos el valor previo, recontamos
+            recount_checklists([instance.task_id])
+            sync_task_state(instance.task_id)
+        elif old_task_id != instance.task_id:
+            apply_checklist_delta(old_task_id, total=-1, done=-int(was_completed))
+            apply_checklist_delta(instance.task_id, total=1, done=done)
+            sync_task_state(old_task_id)
+            sync_task_state(instance.task_id)
+        elif done != int(was_completed):
+            apply_checklist_delta(instance.task_id, done=done - int(was_completed))
+            sync_task_state(instance.task_id)
+    instance._progress_snapshot = (instance.task_id, instance.is_completed)
 
 @receiver(post_delete, sender=ChecklistItem)
 def checklistitem_deleted(sender, instance: ChecklistItem, **kwargs):
-    _recalc_task(instance.task)
+    if counters_deferred(instance.task_id):
+        return
+    apply_checklist_delta(instance.task_id, total=-1, done=-1 if instance.is_completed else 0)
+    sync_task_state(instance.task_id)
 
 
 # =======================================
@@ -59,26 +73,27 @@ def checklistitem_deleted(sender, instance: ChecklistItem, **kwargs):
 #  de verdad para sumar/restar stock)
 # =======================================
 
+# Los movimientos creados vía housekeeping.inventory.apply_movements usan
+# bulk_create (sin señales) y ya aplican el stock con un update condicional.
+# Estas señales cubren los .create() sueltos (admin, incidencias): el ajuste
+# es un UPDATE atómico con F(), sin leer-modificar-escribir.
+
+def _apply_stock_delta(item_id, delta: int):
+    InventoryItem.objects.filter(pk=item_id).update(stock=F("stock") + delta)
+
 @receiver(post_save, sender=InventoryMovement)
 def invmovement_created(sender, instance: InventoryMovement, created, **kwargs):
     if not created:
         return  # inmutable: solo al crear
-    item = instance.item
-    if instance.type == InventoryMovement.Type.IN:
-        item.stock = (item.stock or 0) + int(instance.quantity)
-    else:
-        item.stock = (item.stock or 0) - int(instance.quantity)
-    item.save(update_fields=["stock"])
+    qty = int(instance.quantity)
+    _apply_stock_delta(instance.item_id, qty if instance.type == InventoryMovement.Type.IN else -qty)
+    transaction.on_commit(lambda: observe_movements([instance]))
 
 @receiver(post_delete, sender=InventoryMovement)
 def invmovement_deleted(sender, instance: InventoryMovement, **kwargs):
     # revertir efecto al borrar
-    item = instance.item
-    if instance.type == InventoryMovement.Type.IN:
-        item.stock = (item.stock or 0) - int(instance.quantity)
-    else:
-        item.stock = (item.stock or 0) + int(instance.quantity)
-    item.save(update_fields=["stock"])
+    qty = int(instance.quantity)
+    _apply_stock_delta(instance.item_id, -qty if instance.type == InventoryMovement.Type.IN else qty)
 
 
 # ======================================================
@@ -86,11 +101,8 @@ def invmovement_deleted(sender, instance: InventoryMovement, **kwargs):
 # (MISSING/BROKEN/EXTRA_SUPPLY => OUT; al borrar => IN)
 # ======================================================
 
-OUTCOMES_TO_OUT = {"MISSING", "BROKEN", "EXTRA_SUPPLY"}
-
-def _mk_reason_from_incident(line: IncidentLine, reverse: bool = False) -> str:
-    base = f"Incident #{line.report_id} · outcome={line.outcome}"
-    return f"REVERT {base}" if reverse else base
+# (los reportes creados vía API usan el camino en lote de
+#  housekeeping/incidents.py; estas señales cubren las líneas sueltas)
 
 @receiver(post_save, sender=IncidentLine)
 def incidentline_created_to_movement(sender, instance: IncidentLine, created, **kwargs):
@@ -103,7 +115,7 @@ def incidentline_created_to_movement(sender, instance: IncidentLine, created, **
             item=instance.inventory_item,
             type=InventoryMovement.Type.OUT,
             quantity=instance.quantity,
-            reason=_mk_reason_from_incident(instance),
+            reason=mk_reason_from_incident(instance),
             created_by=getattr(instance.report, "reported_by", None),
         )
 
@@ -114,6 +126,142 @@ def incidentline_deleted_to_movement(sender, instance: IncidentLine, **kwargs):
             item=instance.inventory_item,
             type=InventoryMovement.Type.IN,
             quantity=instance.quantity,
-            reason=_mk_reason_from_incident(instance, reverse=True),
+            reason=mk_reason_from_incident(instance, reverse=True),
             created_by=getattr(instance.report, "reported_by", None),
-        )
\ No newline at end of file
+        )
+
+
+# ==================================================
+# MEDIA (CAS) → conteo de referencias de StoredBlob
+# ==================================================
+
+BLOB_FIELDS = {
+    ChecklistItem: ("photo_before", "photo_after"),
+    IncidentReport: ("photo",),
+    ChatMessage: ("attachment",),
+}
+
+def _blob_snapshot(instance, fields):
+    # Lee el valor crudo (sin pasar por el descriptor); campos diferidos no aparecen
+    snap = {}
+    for f in fields:
+        if f in instance.__dict__:
+            val = instance.__dict__[f]
+            snap[f] = getattr(val, "name", val) or ""
+    return snap
+
+def blob_post_init(sender, instance, **kwargs):
+    instance._blob_snapshot = _blob_snapshot(instance, BLOB_FIELDS[sender])
+
+def blob_post_save(sender, instance, update_fields=None, **kwargs):
+    fields = BLOB_FIELDS[sender]
+    if update_fields is not None:
+        fields = [f for f in fields if f in update_fields]
+    previous = getattr(instance, "_blob_snapshot", {})
+    current = _blob_snapshot(instance, fields)
+    for f, new in current.items():
+        old = previous.get(f, "")
+        if new != old:
+            acquire_blob(new)
+            release_blob(old)
+    previous.update(current)
+    instance._blob_snapshot = previous
+
+def blob_post_delete(sender, instance, **kwargs):
+    for name in _blob_snapshot(instance, BLOB_FIELDS[sender]).values():
+        release_blob(name)
+
+for _model in BLOB_FIELDS:
+    post_init.connect(blob_post_init, sender=_model, dispatch_uid=f"blob_init_{_model.__name__}")
+    post_save.connect(blob_post_save, sender=_model, dispatch_uid=f"blob_save_{_model.__name__}")
+    post_delete.connect(blob_post_delete, sender=_model, dispatch_uid=f"blob_delete_{_model.__name__}")
+
+
+# ===========================================
+# INCIDENT LINE → rollup diario (summary)
+# ===========================================
+
+def _incident_row(line: IncidentLine, snapshot=None):
+    report_id, item_id, outcome, qty = snapshot or (
+        line.report_id, line.inventory_item_id, line.outcome, line.quantity
+    )
+    report = line.report if report_id == line.report_id else IncidentReport.objects.get(pk=report_id)
+    return (report_day(report.created_at), item_id, outcome, qty)
+
+@receiver(post_init, sender=IncidentLine)
+def incidentline_init(sender, instance: IncidentLine, **kwargs):
+    d = instance.__dict__
+    instance._rollup_snapshot = (d.get("report_id"), d.get("inventory_item_id"), d.get("outcome"), d.get("quantity"))
+
+@receiver(post_save, sender=IncidentLine)
+def incidentline_rollup(sender, instance: IncidentLine, created, **kwargs):
+    current = (instance.report_id, instance.inventory_item_id, instance.outcome, instance.quantity)
+    previous = getattr(instance, "_rollup_snapshot", None)
+    if created:
+        apply_incident_rows([_incident_row(instance)])
+    elif previous != current:
+        if previous and None not in (previous[0], previous[2], previous[3]):
+            apply_incident_rows([_incident_row(instance, previous)], sign=-1)
+        apply_incident_rows([_incident_row(instance)])
+    instance._rollup_snapshot = current
+
+@receiver(post_delete, sender=IncidentLine)
+def incidentline_rollup_deleted(sender, instance: IncidentLine, **kwargs):
+    apply_incident_rows([_incident_row(instance)], sign=-1)
+
+
+# ==========================================
+# STAFF AVAILABILITY → índice espacial
+# ==========================================
+
+@receiver(post_save, sender=StaffAvailability)
+@receiver(post_delete, sender=StaffAvailability)
+def staffavailability_changed(sender, instance: StaffAvailability, **kwargs):
+    invalidate_staff_index()
+
+
+# ==========================================
+# ROOM STATUS → log de transiciones
+# ==========================================
+
+# Quien cambia el estado puede anotar room._changed_by / room._transition_source
+# antes de save() (p.ej. RoomViewSet). Los UPDATE en bloque registran aparte.
+
+@receiver(post_init, sender=Room)
+def room_init(sender, instance: Room, **kwargs):
+    instance._status_snapshot = instance.__dict__.get("status")
+
+@receiver(post_save, sender=Room)
+def room_status_changed(sender, instance: Room, created, update_fields=None, **kwargs):
+    if update_fields is not None and "status" not in update_fields:
+        return
+    old = "" if created else getattr(instance, "_status_snapshot", None)
+    if old is None or old == instance.status:
+        # sin cambio (o status diferido: no sabemos el valor anterior)
+        return
+    record_transitions([make_transition(
+        instance, old, instance.status,
+        user=getattr(instance, "_changed_by", None),
+        source=getattr(instance, "_transition_source", "save"),
+    )])
+    instance._status_snapshot = instance.status
+
+
+# ==========================================
+# CHAT: membresías → contexto de autorización
+# ==========================================
+
+@receiver(m2m_changed, sender=ChatRoom.participants.through)
+def chat_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and not reverse:
+        # en post_clear ya no se sabe quiénes estaban
+        instance._cleared_participants = list(instance.participants.values_list("pk", flat=True))
+        return
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        invalidate_users([instance.pk])
+    elif pk_set is not None:
+        invalidate_users(pk_set)
+    else:
+        invalidate_users(getattr(instance, "_cleared_participants", None) or [])
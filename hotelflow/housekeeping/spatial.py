@@ -0,0 +1,181 @@
+# housekeeping/spatial.py
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+try:
+    import numpy as np
+except Exception:
+    np = None  # sin numpy no hay índice: las búsquedas devuelven vacío
+
+from . import presence
+from .models import StaffAvailability
+from .utils import ALLOWED_ROLES
+
+EARTH_R = 6371000.0
+CELL_DEG = 0.0005   # ~55 m de lado en latitud: un hotel ocupa pocas celdas
+INDEX_TTL = 30      # s; tope de desfase entre procesos (la invalidación es local)
+
+
+def haversine_np(lat, lon, lats, lons):
+    """Distancia (m) de un punto a muchos. Todo en grados; vectorizado."""
+    phi1, phi2 = np.radians(lat), np.radians(lats)
+    dphi = phi2 - phi1
+    dlmb = np.radians(lons) - np.radians(lon)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    return 2 * EARTH_R * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _cell(lat, lon):
+    return (math.floor(lat / CELL_DEG), math.floor(lon / CELL_DEG))
+
+
+class StaffIndex:
+    """
+    Posiciones del personal disponible en memoria, agrupadas en una rejilla.
+    La consulta visita las celdas ocupadas por anillos (distancia de Chebyshev
+    en celdas) desde el punto y calcula la distancia exacta, vectorizada, solo
+    para los candidatos visitados; se detiene cuando ningún anillo restante
+    puede mejorar los k mejores.
+    """
+
+    def __init__(self, rows):
+        # rows: [(user_id, username, lat, lon)]
+        self.user_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.usernames = [r[1] for r in rows]
+        self.lats = np.array([r[2] for r in rows], dtype=float)
+        self.lons = np.array([r[3] for r in rows], dtype=float)
+        self.built_at = time.monotonic()
+        grid = defaultdict(list)
+        for i, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+            grid[_cell(lat, lon)].append(i)
+        self.cells = np.array(list(grid), dtype=np.int64).reshape(-1, 2)
+        self.members = [np.array(v, dtype=np.int64) for v in grid.values()]
+        # lado mínimo de celda en metros (en longitud se achica con la latitud)
+        max_lat = float(np.abs(self.lats).max()) if len(rows) else 0.0
+        self.cell_m = math.radians(CELL_DEG) * EARTH_R * math.cos(math.radians(max_lat))
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def nearest(self, lat, lon, k=5, exclude=None):
+        """[(índice, distancia_m)] de los k más cercanos."""
+        if not len(self):
+            return []
+        exclude = set(exclude or ())
+        lat, lon = float(lat), float(lon)
+        rings = np.abs(self.cells - np.array(_cell(lat, lon))).max(axis=1)
+        order = np.argsort(rings, kind="stable")
+
+        idx_parts, d_parts, best = [], [], []
+        pos = 0
+        while pos < len(order):
+            r = rings[order[pos]]
+            ring_cells = []
+            while pos < len(order) and rings[order[pos]] == r:
+                ring_cells.append(self.members[order[pos]])
+                pos += 1
+            idx = np.concatenate(ring_cells)
+            idx_parts.append(idx)
+            d_parts.append(haversine_np(lat, lon, self.lats[idx], self.lons[idx]))
+
+            all_idx, all_d = np.concatenate(idx_parts), np.concatenate(d_parts)
+            best = [
+                (int(all_idx[i]), float(all_d[i]))
+                for i in np.argsort(all_d, kind="stable")
+                if int(self.user_ids[all_idx[i]]) not in exclude
+            ][:k]
+            # Una celda a r' anillos está al menos a (r'-1) lados de celda
+            if len(best) >= k and pos < len(order) and best[-1][1] <= (rings[order[pos]] - 1) * self.cell_m:
+                break
+        return best
+
+    def distances(self, lat, lon):
+        """{user_id: distancia_m} para todos (un solo cálculo vectorizado)."""
+        if not len(self):
+            return {}
+        d = haversine_np(float(lat), float(lon), self.lats, self.lons)
+        return dict(zip(self.user_ids.tolist(), d.tolist()))
+
+
+_lock = threading.Lock()
+_index = None
+_staff_rows = None  # (cargado_en, [(user_id, username, lat, lon)]) desde la base
+
+
+def _load_rows():
+    rows = list(
+        StaffAvailability.objects
+        .filter(is_available=True, user__role__in=ALLOWED_ROLES)
+        .order_by("user_id")
+        .values_list("user_id", "user__username", "lat", "lon")
+    )
+    return time.monotonic(), rows
+
+
+def _build(rows, live, live_version):
+    """Posición más reciente: la del presence store si existe, si no la de la base."""
+    out = []
+    for user_id, name, lat, lon in rows:
+        if user_id in live:
+            lat, lon = live[user_id][0], live[user_id][1]
+        if lat is not None and lon is not None:
+            out.append((user_id, name, float(lat), float(lon)))
+    idx = StaffIndex(out)
+    idx.presence_version = live_version
+    return idx
+
+
+def get_staff_index():
+    """
+    Índice vigente. La lista de personal (1 query) se recarga si fue invalidada
+    o venció el TTL; si solo cambiaron posiciones en el presence store, el
+    índice se rehace en memoria sin consultar la base.
+    """
+    global _index, _staff_rows
+    if np is None:
+        return None
+    ttl = getattr(settings, "STAFF_INDEX_TTL", INDEX_TTL)
+    rows, idx = _staff_rows, _index
+    fresh = rows is not None and time.monotonic() - rows[0] < ttl
+    if fresh and idx is not None and idx.presence_version == presence.version():
+        return idx
+    with _lock:
+        if _staff_rows is None or time.monotonic() - _staff_rows[0] >= ttl:
+            _staff_rows = _load_rows()
+            _index = None
+        live_version = presence.version()
+        if _index is None or _index.presence_version != live_version:
+            _index = _build(_staff_rows[1], presence.positions(), live_version)
+        return _index
+
+
+def invalidate_staff_index():
+    """Llamado al cambiar StaffAvailability (posición, disponibilidad)."""
+    global _index, _staff_rows
+    _staff_rows = None
+    _index = None
+
+
+def nearest_staff(room, k=5, exclude=None):
+    """[{user_id, username, distance_m}] más cercanos a la habitación (vacío si no tiene coordenadas)."""
+    if room.lat is None or room.lon is None:
+        return []
+    idx = get_staff_index()
+    if idx is None:
+        return []
+    return [
+        {"user_id": int(idx.user_ids[i]), "username": idx.usernames[i], "distance_m": round(d, 1)}
+        for i, d in idx.nearest(room.lat, room.lon, k=k, exclude=exclude)
+    ]
+
+
+def staff_distances(room):
+    """{user_id: metros} de todo el personal indexado a la habitación ({} si no aplica)."""
+    if room.lat is None or room.lon is None:
+        return {}
+    idx = get_staff_index()
+    return idx.distances(room.lat, room.lon) if idx is not None else {}
@@ -0,0 +1,149 @@
+# housekeeping/stock_history.py
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import InventoryItem, InventoryMovement, StockCheckpoint
+
+
+def _signed_quantity(prefix: str = ""):
+    return Case(
+        When(**{f"{prefix}type": InventoryMovement.Type.IN}, then=F(f"{prefix}quantity")),
+        default=-F(f"{prefix}quantity"),
+        output_field=IntegerField(),
+    )
+
+
+def _ledger_state(items_qs):
+    """
+    Anota cada item con su último checkpoint y el efecto de los movimientos
+    POSTERIORES a él (una sola query, acotada a lo nuevo):
+      cp_ledger, cp_last_mv, new_delta, new_count, max_mv
+    """
+    last_cp = StockCheckpoint.objects.filter(item=OuterRef("pk")).order_by("-last_movement_id", "-id")
+    after = Q(movements__id__gt=F("cp_last_mv"))
+    return (
+        items_qs
+        .annotate(
+            cp_id=Subquery(last_cp.values("id")[:1]),
+            cp_ledger=Subquery(last_cp.values("ledger_stock")[:1]),
+            cp_last_mv=Coalesce(Subquery(last_cp.values("last_movement_id")[:1]), Value(0)),
+        )
+        .annotate(
+            new_delta=Coalesce(Sum(_signed_quantity("movements__"), filter=after), Value(0)),
+            new_count=Count("movements", filter=after),
+            max_mv=Max("movements__id"),
+        )
+    )
+
+
+def take_checkpoints(item_ids=None, min_movements: int = 0, baseline: bool = False) -> int:
+    """
+    Crea un checkpoint por item con el saldo del ledger.
+
+    - Solo se suman movimientos posteriores al checkpoint anterior.
+    - El primero de cada item parte de InventoryItem.stock: ya incluye todos sus
+      movimientos (hasta max_mv) y el saldo cargado antes del ledger, así que
+      tomar un checkpoint no cambia lo que responden stock_at/reconcile.
+    - min_movements: salta items con menos movimientos nuevos (checkpoint "cada N").
+    - baseline: además marca ese primer checkpoint como saldo inicial: stock_at
+      no reconstruye instantes anteriores a él (historia no fiable).
+    Los items se bloquean (select_for_update) para leer stock y ledger consistentes.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        locked = InventoryItem.objects.select_for_update()
+        if item_ids is not None:
+            locked = locked.filter(pk__in=item_ids)
+        ids = list(locked.values_list("id", flat=True))
+        if not ids:
+            return 0
+
+        to_create = []
+        for it in _ledger_state(InventoryItem.objects.filter(pk__in=ids)).iterator():
+            has_cp = it.cp_id is not None
+            if has_cp and it.new_count < max(min_movements, 1):
+                continue
+            if not has_cp:
+                ledger, is_baseline = it.stock, baseline
+            else:
+                ledger, is_baseline = it.cp_ledger + it.new_delta, False
+            to_create.append(StockCheckpoint(
+                item_id=it.pk,
+                taken_at=now,
+                last_movement_id=max(it.max_mv or 0, it.cp_last_mv),
+                ledger_stock=ledger,
+                recorded_stock=it.stock,
+                movements_count=it.new_count,
+                is_baseline=is_baseline,
+            ))
+        StockCheckpoint.objects.bulk_create(to_create, batch_size=500)
+    return len(to_create)
+
+
+def stock_at(item: InventoryItem, at):
+    """
+    Stock del item en el instante `at`, según el ledger.
+    Usa el checkpoint más cercano anterior y suma los movimientos posteriores;
+    si no hay ninguno anterior, parte del primero posterior y resta hacia atrás.
+    Sin checkpoints, el stock actual del item hace de checkpoint implícito
+    (restando los movimientos posteriores a `at`): el ledger desde cero
+    ignoraría un saldo inicial cargado sin movimientos.
+    Devuelve (stock, checkpoint_usado) o (None, None) si no se puede determinar.
+    """
+    movements = InventoryMovement.objects.filter(item=item)
+    signed = Coalesce(Sum(_signed_quantity()), Value(0))
+
+    cp = item.checkpoints.filter(taken_at__lte=at).order_by("-taken_at", "-id").first()
+    if cp is not None:
+        delta = movements.filter(id__gt=cp.last_movement_id, created_at__lte=at).aggregate(d=signed)["d"]
+        return cp.ledger_stock + delta, cp
+
+    cp = item.checkpoints.filter(taken_at__gt=at).order_by("taken_at", "id").first()
+    if cp is not None:
+        delta = movements.filter(id__lte=cp.last_movement_id, created_at__gt=at).aggregate(d=signed)["d"]
+        if cp.is_baseline and delta:
+            # antes del saldo adoptado no hay historia fiable
+            return None, None
+        return cp.ledger_stock - delta, cp
+
+    # Sin checkpoints: hacia atrás desde el stock actual (leído en la misma query)
+    row = (
+        InventoryItem.objects.filter(pk=item.pk)
+        .annotate(delta=Subquery(
+            movements.filter(created_at__gt=at).values("item").annotate(d=Sum(_signed_quantity())).values("d")[:1]
+        ))
+        .values("stock", "delta")
+        .first()
+    )
+    if row is None:
+        return None, None
+    return row["stock"] - (row["delta"] or 0), None
+
+
+def reconcile(item_ids=None, only_drift: bool = True):
+    """
+    Compara InventoryItem.stock con (último checkpoint + movimientos posteriores).
+    El costo depende de los movimientos desde el último checkpoint, no del historial.
+    """
+    qs = InventoryItem.objects.all()
+    if item_ids is not None:
+        qs = qs.filter(pk__in=item_ids)
+    out = []
+    for it in _ledger_state(qs).order_by("name").iterator():
+        ledger = (it.cp_ledger or 0) + it.new_delta
+        drift = it.stock - ledger
+        if only_drift and not drift:
+            continue
+        out.append({
+            "item": it.pk,
+            "name": it.name,
+            "sku": it.sku,
+            "stock": it.stock,
+            "ledger_stock": ledger,
+            "drift": drift,
+            "movements_since_checkpoint": it.new_count,
+            "checkpoint": it.cp_id,
+        })
+    return out
@@ -0,0 +1,143 @@
+# housekeeping/storage.py
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+# Carpeta (relativa a MEDIA_ROOT) donde viven los blobs direccionados por contenido
+CAS_PREFIX = "cas"
+CHUNK_SIZE = 64 * 1024
+SWEEP_GRACE = timedelta(hours=1)   # blobs sin referencias más nuevos que esto no se barren
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Storage que guarda cada archivo una sola vez, nombrado por su SHA-256.
+
+    - El hash se calcula mientras el contenido se escribe a disco (una sola pasada,
+      sin cargar el archivo completo en memoria).
+    - El `upload_to` de cada campo solo se usa para conservar la extensión;
+      el nombre final es `cas/ab/cd/<sha256><ext>`.
+    - Si el blob ya existe se descarta la copia temporal (deduplicación).
+    - Cada blob tiene una fila StoredBlob con `ref_count`, mantenida por las
+      señales de housekeeping/signals.py (ver acquire_blob / release_blob).
+    - Los blobs sin referencias no se borran al soltarlos: los barre
+      sweep_blobs pasado SWEEP_GRACE, con la fila bloqueada (ver sweep_blobs).
+
+    Se configura como storage por defecto (settings.STORAGES), así los
+    FileField/ImageField existentes no cambian.
+    """
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower()
+        tmp_dir = self.path(os.path.join(CAS_PREFIX, "tmp"))
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+
+            digest = hasher.hexdigest()
+            blob_name = blob_name_for(digest, ext)
+            full_path = self.path(blob_name)
+            # Con la fila bloqueada (el barrido usa el mismo lock): si el archivo
+            # ya está se descarta la copia; si no, se mueve la nuestra.
+            with transaction.atomic():
+                _lock_blob(blob_name, digest, size)
+                if os.path.exists(full_path):
+                    os.remove(tmp_path)
+                else:
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    os.replace(tmp_path, full_path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(full_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return blob_name
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre real lo decide el hash en _save; no hace falta buscar uno libre.
+        return name
+
+
+def _lock_blob(name, digest, size):
+    """Fila del blob bloqueada (creada si falta) y marcada como recién usada."""
+    from .models import StoredBlob
+    try:
+        with transaction.atomic():
+            StoredBlob.objects.get_or_create(name=name, defaults={"sha256": digest, "size": size})
+    except IntegrityError:
+        pass  # otro proceso la creó a la vez: se usa esa
+    blob = StoredBlob.objects.select_for_update().get(name=name)
+    blob.touched_at = timezone.now()
+    blob.save(update_fields=["touched_at"])
+    return blob
+
+
+def blob_name_for(digest: str, ext: str = "") -> str:
+    return f"{CAS_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def is_blob_name(name) -> bool:
+    return bool(name) and str(name).startswith(f"{CAS_PREFIX}/")
+
+
+def acquire_blob(name):
+    """Suma una referencia al blob (no-op para archivos fuera del CAS)."""
+    if not is_blob_name(name):
+        return
+    from .models import StoredBlob
+    StoredBlob.objects.filter(name=name).update(ref_count=F("ref_count") + 1)
+
+
+def release_blob(name):
+    """
+    Resta una referencia. No borra nada: una subida concurrente del mismo
+    contenido puede estar por referenciarlo; el archivo lo borra sweep_blobs.
+    """
+    if not is_blob_name(name):
+        return
+    from .models import StoredBlob
+    StoredBlob.objects.filter(name=name).update(ref_count=F("ref_count") - 1, touched_at=timezone.now())
+
+
+def sweep_blobs(grace=SWEEP_GRACE) -> int:
+    """
+    Borra archivo y fila de los blobs sin referencias no tocados en `grace`.
+    Cada uno se revisa de nuevo con la fila bloqueada (ref_count y touched_at)
+    y el archivo se borra dentro del lock: un _save concurrente espera y, si
+    el archivo ya no está, lo vuelve a escribir. Devuelve cuántos borró.
+    """
+    from django.core.files.storage import default_storage
+    from .models import StoredBlob
+    cutoff = timezone.now() - grace
+    removed = 0
+    candidates = StoredBlob.objects.filter(ref_count__lte=0, touched_at__lt=cutoff).values_list("pk", flat=True)
+    for pk in list(candidates):
+        with transaction.atomic():
+            blob = (
+                StoredBlob.objects.select_for_update()
+                .filter(pk=pk, ref_count__lte=0, touched_at__lt=cutoff)
+                .first()
+            )
+            if blob is None:
+                continue
+            default_storage.delete(blob.name)
+            blob.delete()
+            removed += 1
+    return removed
@@ -1,3 +1,1053 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.testing import QueryBudgetTestMixin
+from scheduling.models import StaffProfile, Zone
+
+from .models import (
+    ChatMessage, ChatRoom, ChecklistItem, ChecklistTemplate, ChecklistTemplateItem, HousekeepingTask, IncidentLine,
+    IncidentReport, InventoryItem, InventoryMovement, Room, RoomOccupancy, RoomStatusTransition, StaffAvailability,
+    StoredBlob, TurnaroundSample, UploadSession,
+)
+from . import assignment, presence, room_events, spatial
+from .checklists import deferred_counters, instantiate_checklists, recount_checklists
+from .daily_tasks import ORIGIN, generate_daily_tasks
+from .pms_import import import_occupancy
+from .stock_history import reconcile, stock_at, take_checkpoints
+from .spatial import invalidate_staff_index
+from .storage import sweep_blobs
+from .uploads import UploadError, part_path, upload_dir, write_chunk
+from .views import InventoryItemViewSet
+
+
+class MediaTestMixin:
+    """MEDIA_ROOT temporal por test (el storage por defecto cachea la ruta: se limpia)."""
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        for attr in ("base_location", "location"):
+            default_storage.__dict__.pop(attr, None)
+            self.addCleanup(default_storage.__dict__.pop, attr, None)
+        self.media = media
+        override = override_settings(CHUNKED_UPLOAD_DIR=os.path.join(media, "uploads_tmp"))
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class ContentAddressedStorageTests(MediaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(username="blob", password="x")
+        self.room = ChatRoom.objects.create()
+
+    def _message(self, content=b"same-bytes"):
+        msg = ChatMessage(room=self.room, sender=self.user, text="x")
+        msg.attachment.save("pic.jpg", ContentFile(content), save=True)
+        return msg
+
+    def test_dedup_and_ref_count(self):
+        first, second = self._message(), self._message()
+        self.assertEqual(first.attachment.name, second.attachment.name)
+        self.assertEqual(StoredBlob.objects.get().ref_count, 2)
+
+        first.delete()
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+
+    def test_release_keeps_file_until_sweep(self):
+        msg = self._message()
+        path = os.path.join(self.media, msg.attachment.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            msg.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(sweep_blobs(), 0)  # dentro del período de gracia
+
+        self.assertEqual(sweep_blobs(grace=timedelta(0)), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_reupload_after_release_survives_sweep(self):
+        msg = self._message()
+        name = msg.attachment.name
+        msg.delete()
+        again = self._message()  # mismo contenido: reusa archivo y fila
+        self.assertEqual(again.attachment.name, name)
+        self.assertEqual(sweep_blobs(grace=timedelta(0)), 0)
+        self.assertTrue(os.path.exists(os.path.join(self.media, name)))
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+
+    def test_blobs_not_served_by_django_outside_debug(self):
+        msg = self._message()
+        self.assertTrue(msg.attachment.name.startswith("cas/"))
+        self.assertEqual(self.client.get(msg.attachment.url).status_code, 404)
+
+    def test_save_rewrites_missing_file(self):
+        msg = self._message()
+        path = os.path.join(self.media, msg.attachment.name)
+        os.remove(path)
+        self._message()
+        self.assertTrue(os.path.exists(path))
+
+
+class UploadFinalizeTests(MediaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.reporter = User.objects.create_user(username="reporter", password="x")
+        self.other = User.objects.create_user(username="other", password="x")
+        self.report = IncidentReport.objects.create(room=Room.objects.create(number="101"), reported_by=self.reporter)
+
+    def _upload(self, user, data=b"x" * 1000):
+        client = APIClient()
+        client.force_authenticate(user)
+        sid = client.post("/api/housekeeping/uploads/", {"filename": "p.jpg", "size": len(data)}, format="json").data["id"]
+        r = client.put(f"/api/housekeeping/uploads/{sid}/chunk/", data,
+                       content_type="application/octet-stream", HTTP_UPLOAD_OFFSET="0")
+        self.assertEqual(r.status_code, 200)
+        return client, sid
+
+    def _finalize(self, client, sid, object_id):
+        return client.post(f"/api/housekeeping/uploads/{sid}/finalize/",
+                           {"target": "incident.photo", "object_id": object_id}, format="json")
+
+    def test_owner_can_attach(self):
+        client, sid = self._upload(self.reporter)
+        r = self._finalize(client, sid, self.report.pk)
+        self.assertEqual(r.status_code, 200)
+        self.report.refresh_from_db()
+        self.assertTrue(self.report.photo.name)
+
+    def test_non_owner_gets_403(self):
+        client, sid = self._upload(self.other)
+        r = self._finalize(client, sid, self.report.pk)
+        self.assertEqual(r.status_code, 403)
+        self.report.refresh_from_db()
+        self.assertFalse(self.report.photo)
+
+    def test_change_permission_allows_non_owner(self):
+        self.other.user_permissions.add(Permission.objects.get(codename="change_incidentreport"))
+        client, sid = self._upload(get_user_model().objects.get(pk=self.other.pk))
+        self.assertEqual(self._finalize(client, sid, self.report.pk).status_code, 200)
+
+    def test_non_integer_object_id_is_400(self):
+        client, sid = self._upload(self.reporter)
+        self.assertEqual(self._finalize(client, sid, "abc").status_code, 400)
+
+
+class UploadSessionTests(MediaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(username="up", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _session(self, size=8):
+        return UploadSession.objects.create(owner=self.user, filename="p.jpg", size=size)
+
+    def _put(self, session, data, offset=0):
+        return self.client.put(f"/api/housekeeping/uploads/{session.pk}/chunk/", data,
+                               content_type="application/octet-stream", HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_stale_session_does_not_overwrite_bytes(self):
+        session = self._session()
+        stale = UploadSession.objects.get(pk=session.pk)
+        self.assertEqual(self._put(session, b"abcd").status_code, 200)
+        # otro PUT que leyó la sesión antes: relee con la fila bloqueada y no toca el archivo
+        with self.assertRaises(UploadError) as err:
+            write_chunk(stale, 0, io.BytesIO(b"XXXX"), 4)
+        self.assertEqual(err.exception.status, 409)
+        self.assertEqual(stale.offset, 4)
+        with open(part_path(session), "rb") as fh:
+            self.assertEqual(fh.read(), b"abcd")
+
+    def test_expired_session_is_410(self):
+        session = self._session()
+        self.assertEqual(self._put(session, b"abcd").status_code, 200)
+        UploadSession.objects.filter(pk=session.pk).update(updated_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(self._put(session, b"efgh", offset=4).status_code, 410)
+
+    def test_sweep_removes_expired_sessions_and_orphan_parts(self):
+        old, fresh = self._session(), self._session()
+        for session in (old, fresh):
+            self.assertEqual(self._put(session, b"abcd").status_code, 200)
+        UploadSession.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=2))
+        orphan = os.path.join(upload_dir(), f"{uuid.uuid4()}.part")
+        with open(orphan, "wb") as fh:
+            fh.write(b"x")
+
+        out = io.StringIO()
+        call_command("sweep_blobs", stdout=out)
+        self.assertIn("Subidas expiradas borradas: 1", out.getvalue())
+        self.assertEqual(list(UploadSession.objects.values_list("pk", flat=True)), [fresh.pk])
+        self.assertFalse(os.path.exists(part_path(old)))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(part_path(fresh)))
+
+
+class ChecklistCompleteTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username="sup", password="x", is_staff=True))
+        self.task = HousekeepingTask.objects.create(room=Room.objects.create(number="201"), title="t")
+        self.items = [ChecklistItem.objects.create(task=self.task, text=f"i{i}") for i in range(3)]
+        self.url = f"/api/housekeeping/tasks/{self.task.pk}/checklist/complete/"
+
+    def test_complete_selected_items(self):
+        r = self.client.post(self.url, {"items": [self.items[0].pk, self.items[1].pk]}, format="json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual((r.data["completed"], r.data["checklist_done"]), (2, 2))
+
+    def test_complete_all(self):
+        r = self.client.post(self.url, {"all": True}, format="json")
+        self.assertEqual(r.data["checklist_done"], 3)
+
+    def test_invalid_ids_are_400(self):
+        for body in ({"items": ["abc"]}, {"items": [{"id": 1}]}, {"items": []}, {}):
+            self.assertEqual(self.client.post(self.url, body, format="json").status_code, 400, body)
+
+
+class ChecklistCounterTests(TestCase):
+    """checklist_total/checklist_done se mantienen con F() desde las señales, sin recontar."""
+
+    def setUp(self):
+        room = Room.objects.create(number="301")
+        self.task = HousekeepingTask.objects.create(room=room, title="t")
+        self.other = HousekeepingTask.objects.create(room=room, title="otra")
+
+    def _state(self, task=None):
+        task = task or self.task
+        task.refresh_from_db()
+        return task.checklist_total, task.checklist_done, task.status
+
+    def test_create_toggle_and_delete(self):
+        S = HousekeepingTask.Status
+        first = ChecklistItem.objects.create(task=self.task, text="a", is_completed=True)
+        second = ChecklistItem.objects.create(task=self.task, text="b")
+        self.assertEqual(self._state(), (2, 1, S.IN_PROGRESS))
+        self.assertIsNotNone(self.task.started_at)
+
+        second.is_completed = True
+        second.save()
+        self.assertEqual(self._state(), (2, 2, S.DONE))
+        self.assertIsNotNone(self.task.finished_at)
+
+        first.is_completed = False
+        first.save()
+        self.assertEqual(self._state(), (2, 1, S.IN_PROGRESS))
+        self.assertIsNone(self.task.finished_at)
+
+        first.delete()
+        self.assertEqual(self._state(), (1, 1, S.DONE))
+        self.assertEqual(recount_checklists(), 0)
+
+    def test_moving_item_between_tasks(self):
+        item = ChecklistItem.objects.create(task=self.task, text="a", is_completed=True)
+        ChecklistItem.objects.create(task=self.task, text="b")
+        item.task = self.other
+        item.save()
+        self.assertEqual(self._state()[:2], (1, 0))
+        self.assertEqual(self._state(self.other)[:2], (1, 1))
+        self.assertEqual(recount_checklists(), 0)
+
+
+class ChecklistTemplateTests(TestCase):
+    def setUp(self):
+        T = HousekeepingTask.TaskType
+        generic = ChecklistTemplate.objects.create(task_type=T.TURNOVER)
+        suite = ChecklistTemplate.objects.create(task_type=T.TURNOVER, room_category=Room.Category.STE)
+        ChecklistTemplateItem.objects.bulk_create(
+            [ChecklistTemplateItem(template=generic, text=f"g{i}", position=i) for i in range(3)]
+            + [ChecklistTemplateItem(template=suite, text=f"s{i}", position=i) for i in range(5)]
+        )
+        std, ste = Room.objects.create(number="401"), Room.objects.create(number="402", category=Room.Category.STE)
+        self.tasks = [
+            HousekeepingTask.objects.create(room=std, title="std", task_type=T.TURNOVER),
+            HousekeepingTask.objects.create(room=ste, title="ste", task_type=T.TURNOVER),
+            HousekeepingTask.objects.create(room=std, title="sin plantilla", task_type=T.DEEP_CLEAN),
+        ]
+
+    def test_bulk_instantiation_sets_counters(self):
+        with CaptureQueriesContext(connection) as queries:
+            created = instantiate_checklists(self.tasks)
+        self.assertEqual(created, 8)
+        inserts = [q for q in queries.captured_queries if q["sql"].startswith('INSERT INTO "housekeeping_checklistitem"')]
+        self.assertEqual(len(inserts), 1)
+        texts = {t.title: list(t.checklist.order_by("pk").values_list("text", flat=True)) for t in self.tasks}
+        self.assertEqual(texts, {"std": ["g0", "g1", "g2"], "ste": [f"s{i}" for i in range(5)], "sin plantilla": []})
+        self.assertEqual([t.checklist_total for t in self.tasks], [3, 5, 0])
+        self.assertEqual(recount_checklists(), 0)
+
+        # las que ya tienen checklist no se duplican
+        self.assertEqual(instantiate_checklists(self.tasks), 0)
+        self.assertEqual(ChecklistItem.objects.count(), 8)
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username="sup", password="x", is_staff=True))
+        # saldo inicial cargado a mano, sin movimientos ni checkpoint
+        self.item = InventoryItem.objects.create(name="Toallas", sku="TW-1", stock=50)
+        self.before = timezone.now()
+        InventoryMovement.objects.create(item=self.item, type=InventoryMovement.Type.IN, quantity=10)
+        InventoryMovement.objects.create(item=self.item, type=InventoryMovement.Type.OUT, quantity=4)
+        self.url = f"/api/housekeeping/inventory/items/{self.item.pk}/stock_at/"
+
+    def test_movements_update_stock(self):
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 56)
+
+    def test_stock_at_without_checkpoint_starts_from_current_stock(self):
+        r = self.client.get(self.url, {"at": self.before.isoformat()})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data["stock"], 50)
+        self.assertIsNone(r.data["checkpoint"])
+        self.assertEqual(self.client.get(self.url, {"at": timezone.now().isoformat()}).data["stock"], 56)
+
+    def test_first_checkpoint_keeps_pre_ledger_stock(self):
+        now = timezone.now()
+        self.assertEqual(take_checkpoints(), 1)
+        cp = self.item.checkpoints.get()
+        self.assertEqual((cp.ledger_stock, cp.is_baseline), (56, False))
+        self.assertEqual(stock_at(self.item, timezone.now())[0], 56)
+        self.assertEqual(stock_at(self.item, now)[0], 56)
+        self.assertEqual(stock_at(self.item, self.before)[0], 50)
+        self.assertEqual(reconcile(), [])
+
+        InventoryMovement.objects.create(item=self.item, type=InventoryMovement.Type.OUT, quantity=6)
+        self.assertEqual(take_checkpoints(), 1)
+        self.assertEqual(self.item.checkpoints.order_by("-id").first().ledger_stock, 50)
+        self.assertEqual(reconcile(), [])
+
+    def test_impossible_date_is_400(self):
+        for at in ("2025-13-01", "2025-02-30T10:00", "nope", ""):
+            self.assertEqual(self.client.get(self.url, {"at": at}).status_code, 400, at)
+
+
+class BulkMovementTests(TestCase):
+    url = "/api/housekeeping/inventory/movements/bulk/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username="sup", password="x"))
+        self.a = InventoryItem.objects.create(name="a", sku="A", stock=10, min_stock=2)
+        self.b = InventoryItem.objects.create(name="b", sku="B", stock=5, min_stock=4)
+
+    def _lines(self, b_out=1):
+        return [
+            {"item": self.a.pk, "type": "OUT", "quantity": 3, "reason": "uso"},
+            {"item": self.a.pk, "type": "IN", "quantity": 1},
+            {"item": self.b.pk, "type": "OUT", "quantity": b_out},
+        ]
+
+    def test_object_and_list_bodies(self):
+        r = self.client.post(self.url, {"movements": self._lines()}, format="json")
+        self.assertEqual(r.status_code, 201, r.data)
+        self.assertEqual(r.data["stock"], [{"item": self.a.pk, "stock": 8}, {"item": self.b.pk, "stock": 4}])
+        r = self.client.post(self.url, self._lines()[:2], format="json")
+        self.assertEqual((r.status_code, r.data["created"]), (201, 2))
+        self.assertEqual(InventoryItem.objects.get(pk=self.a.pk).stock, 6)
+
+    def test_malformed_body_is_400(self):
+        for body in ({}, {"items": self._lines()}, {"movements": []}, {"movements": "x"}, [], "x"):
+            self.assertEqual(self.client.post(self.url, body, format="json").status_code, 400, body)
+
+    def test_min_stock_rejects_whole_batch(self):
+        r = self.client.post(self.url, {"movements": self._lines(b_out=2)}, format="json")
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.data["item"], self.b.pk)
+        # todo o nada: las líneas de `a` tampoco se aplicaron
+        self.assertEqual([it.stock for it in InventoryItem.objects.order_by("pk")], [10, 5])
+        self.assertFalse(InventoryMovement.objects.exists())
+
+
+class ForecastAlertTests(TestCase):
+    url = "/api/housekeeping/inventory/items/alerts/?forecast=true"
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username="sup", password="x", is_staff=True))
+        self.items = [InventoryItem.objects.create(name=f"i{i}", sku=f"s{i}", stock=40, min_stock=5) for i in range(3)]
+        now = timezone.now()
+        for days_ago in range(1, 15):
+            for item in self.items[:2]:
+                mv = InventoryMovement.objects.create(item=item, type=InventoryMovement.Type.OUT, quantity=2)
+                InventoryMovement.objects.filter(pk=mv.pk).update(created_at=now - timedelta(days=days_ago))
+
+    def test_stock_change_refreshes_cached_forecast(self):
+        first = {r["id"]: r for r in self.client.get(self.url).data}
+        # Sin invalidación explícita: la clave depende del stock guardado en la base
+        InventoryItem.objects.filter(pk=self.items[0].pk).update(stock=10)
+        second = {r["id"]: r for r in self.client.get(self.url).data}
+        self.assertGreater(second[self.items[0].pk]["reorder_qty"], first[self.items[0].pk]["reorder_qty"])
+        self.assertEqual(second[self.items[1].pk], first[self.items[1].pk])
+
+    def test_short_window_has_no_nan(self):
+        with self.settings(INVENTORY_FORECAST={"window_days": 3, "rate_days": 3}):
+            r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotIn("NaN", r.content.decode())
+
+    def test_forecast_is_paginated_like_the_list(self):
+        from rest_framework.pagination import LimitOffsetPagination
+        with mock.patch.object(InventoryItemViewSet, "pagination_class", LimitOffsetPagination):
+            r = self.client.get(self.url + "&limit=2")
+        self.assertEqual(r.data["count"], 3)
+        self.assertEqual(len(r.data["results"]), 2)
+        # primero los que se quedan sin stock antes
+        self.assertIsNotNone(r.data["results"][0]["days_of_cover"])
+
+
+class ExportTests(TestCase):
+    url = "/api/housekeeping/inventory/movements/export/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username="sup", password="x"))
+        item = InventoryItem.objects.create(name="Toallas", sku="TW-1")
+        now = timezone.now()
+        for days_ago in (0, 1, 5):
+            mv = InventoryMovement.objects.create(item=item, type=InventoryMovement.Type.IN, quantity=days_ago + 1)
+            InventoryMovement.objects.filter(pk=mv.pk).update(created_at=now - timedelta(days=days_ago))
+        self.today = timezone.localdate()
+
+    def _export(self, url=None, **params):
+        r = self.client.get(url or self.url, params)
+        self.assertEqual(r.status_code, 200)
+        return r, b"".join(r.streaming_content).decode()
+
+    def test_csv(self):
+        r, body = self._export()
+        self.assertTrue(r["Content-Type"].startswith("text/csv"))
+        self.assertIn('filename="inventory-movements-', r["Content-Disposition"])
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0][:3], ["id", "created_at", "item"])
+        self.assertEqual(sorted(int(row[6]) for row in rows[1:]), [1, 2, 6])
+
+    def test_ndjson_and_date_range(self):
+        r, body = self._export(output="ndjson", date_from=(self.today - timedelta(days=2)).isoformat(),
+                               date_to=self.today.isoformat())
+        self.assertEqual(r["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(sorted(row["quantity"] for row in rows), [1, 2])
+        self.assertEqual(rows[0]["sku"], "TW-1")
+
+    def test_invalid_input_is_400(self):
+        for params in ({"date_from": "2025-13-01"}, {"date_to": "2025-02-30"}, {"date_to": "ayer"},
+                       {"output": "xlsx"}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+        self.assertEqual(self.client.get("/api/housekeeping/tasks/export/", {"date_from": "2025-13-01"}).status_code, 400)
+
+
+class IncidentRollupMigrationTests(TransactionTestCase):
+    """0010 crea el rollup con las líneas que ya existían (el summary solo lee el rollup)."""
+    before = [("housekeeping", "0009_stock_checkpoints")]
+    after = [("housekeeping", "0010_incident_daily_rollup")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_backfill(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        room = apps.get_model("housekeeping", "Room").objects.create(number="301")
+        item = apps.get_model("housekeeping", "InventoryItem").objects.create(name="Toalla", sku="TW")
+        report = apps.get_model("housekeeping", "IncidentReport").objects.create(room=room)
+        IncidentLine = apps.get_model("housekeeping", "IncidentLine")
+        for qty in (2, 3):
+            IncidentLine.objects.create(report=report, category="LINEN", inventory_item=item, outcome="BROKEN", quantity=qty)
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        row = apps.get_model("housekeeping", "IncidentDailyRollup").objects.get()
+        self.assertEqual((row.inventory_item_id, row.outcome, row.total_qty, row.lines_count), (item.pk, "BROKEN", 5, 2))
+
+
+class IncidentLinesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_superuser(username="sup", password="x"))
+        self.room = Room.objects.create(number="401")
+        self.items = [InventoryItem.objects.create(name=f"i{i}", sku=f"s{i}", stock=20) for i in range(2)]
+
+    def _report(self):
+        lines = [
+            {"category": "LINEN", "inventory_item": self.items[0].pk, "outcome": "MISSING", "quantity": 2},
+            {"category": "LINEN", "inventory_item": self.items[0].pk, "outcome": "BROKEN", "quantity": 3},
+            {"category": "LINEN", "inventory_item": self.items[1].pk, "outcome": "BROKEN", "quantity": 1},
+            {"category": "LINEN", "inventory_item": self.items[1].pk, "outcome": "LAUNDRY_TO_RETURN", "quantity": 4},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.post("/api/housekeeping/incidents/", {"room": self.room.pk, "lines": lines}, format="json")
+        self.assertEqual(r.status_code, 201, r.data)
+        stock_updates = [q for q in ctx.captured_queries
+                         if q["sql"].startswith('UPDATE "housekeeping_inventoryitem"')]
+        self.assertEqual(len(stock_updates), 2)  # uno por item, no por línea
+        return IncidentReport.objects.get(pk=r.data["id"])
+
+    def test_one_movement_per_line_and_symmetric_revert(self):
+        report = self._report()
+        self.assertEqual([it.stock for it in InventoryItem.objects.order_by("pk")], [15, 19])
+        out = InventoryMovement.objects.filter(type=InventoryMovement.Type.OUT)
+        self.assertEqual(out.count(), 3)
+
+        line = IncidentLine.objects.get(report=report, outcome="BROKEN", inventory_item=self.items[0])
+        line.delete()
+        revert = InventoryMovement.objects.get(type=InventoryMovement.Type.IN)
+        original = out.get(item=self.items[0], quantity=3)
+        self.assertEqual(revert.reason, f"REVERT {original.reason}")
+        self.assertEqual(InventoryItem.objects.get(pk=self.items[0].pk).stock, 18)
+
+
+class IncidentLineValidationTests(TestCase):
+    """Las líneas anidadas no llevan `report` (lo asigna el padre); las sueltas sí."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_superuser(username="sup", password="x"))
+        self.room = Room.objects.create(number="402")
+
+    def test_nested_lines_without_report(self):
+        r = self.client.post("/api/housekeeping/incidents/", {
+            "room": self.room.pk,
+            "lines": [{"category": "OTHER", "outcome": "MISSING", "quantity": 1}],
+        }, format="json")
+        self.assertEqual(r.status_code, 201, r.data)
+        self.assertEqual(r.data["lines"][0]["report"], r.data["id"])
+
+    def test_nested_line_errors_are_400(self):
+        r = self.client.post("/api/housekeeping/incidents/", {
+            "room": self.room.pk,
+            "lines": [{"category": "OTHER", "outcome": "NOPE", "quantity": 1}],
+        }, format="json")
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(IncidentReport.objects.exists())
+
+    def test_standalone_line_requires_report(self):
+        r = self.client.post("/api/housekeeping/incident-lines/",
+                             {"category": "OTHER", "outcome": "MISSING", "quantity": 1}, format="json")
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("report", r.data)
+
+
+class AutoAssignTests(TestCase):
+    url = "/api/housekeeping/tasks/auto_assign/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username="sup", password="x", is_staff=True))
+        HousekeepingTask.objects.create(room=Room.objects.create(number="501"), title="t")
+
+    def test_non_positive_capacity_is_400(self):
+        for value in (0, -30, "abc"):
+            self.assertEqual(self.client.get(self.url, {"capacity_minutes": value}).status_code, 400, value)
+            r = self.client.post(self.url, {"capacity_minutes": value}, format="json")
+            self.assertEqual(r.status_code, 400, value)
+        self.assertFalse(HousekeepingTask.objects.exclude(assigned_to=None).exists())
+
+
+@skipIf(assignment.np is None, "requiere numpy")
+class AutoAssignPlanTests(TestCase):
+    url = "/api/housekeeping/tasks/auto_assign/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username="sup", password="x", is_staff=True))
+        User = get_user_model()
+        north, south = Zone.objects.create(name="Norte"), Zone.objects.create(name="Sur")
+        self.staff = {}
+        for name, zone in (("ana", north), ("beto", south)):
+            user = User.objects.create_user(username=name, password="x", role="HOUSEKEEPER")
+            StaffAvailability.objects.create(user=user)
+            StaffProfile.objects.create(user=user).preferred_zones.add(zone)
+            self.staff[name] = user
+
+    def _tasks(self, zone, n):
+        return [
+            HousekeepingTask.objects.create(room=Room.objects.create(number=f"{zone[0]}{i}", zone=zone), title="t")
+            for i in range(n)
+        ]
+
+    def _assignees(self, tasks):
+        return [HousekeepingTask.objects.get(pk=t.pk).assigned_to_id for t in tasks]
+
+    def test_preferred_zone_wins(self):
+        north, south = self._tasks("Norte", 1), self._tasks("Sur", 1)
+        r = self.client.post(self.url, {"capacity_minutes": 480}, format="json")
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertEqual(self._assignees(north + south), [self.staff["ana"].pk, self.staff["beto"].pk])
+
+    def test_capacity_leaves_overflow_unassigned(self):
+        tasks = self._tasks("Norte", 3)
+        r = self.client.post(self.url, {"capacity_minutes": 30}, format="json")  # 30 min por tarea: una por persona
+        self.assertEqual(len(r.data["assignments"]), 2)
+        self.assertEqual(len(r.data["unassigned"]), 1)
+        self.assertEqual(sorted(filter(None, self._assignees(tasks))), sorted(u.pk for u in self.staff.values()))
+
+    def test_active_load_counts_against_capacity(self):
+        busy = self._tasks("Sur", 1)[0]
+        busy.assigned_to, busy.status = self.staff["ana"], HousekeepingTask.Status.ASSIGNED
+        busy.save()
+        north = self._tasks("Norte", 1)
+        # ana prefiere Norte pero ya tiene su jornada llena
+        r = self.client.get(self.url, {"capacity_minutes": 30})
+        self.assertEqual([a["user_id"] for a in r.data["assignments"]], [self.staff["beto"].pk])
+        self.assertEqual(self._assignees(north), [None])  # GET no escribe
+
+
+class PresenceTests(TestCase):
+    """Store de posiciones en memoria (presence.py) y el índice espacial que lo usa."""
+
+    def setUp(self):
+        self._reset()
+        self.addCleanup(self._reset)
+        timer = mock.patch.object(presence.threading, "Timer")
+        self.timer = timer.start()
+        self.addCleanup(timer.stop)
+        User = get_user_model()
+        self.users = [User.objects.create_user(username=f"hk{i}", password="x", role="HOUSEKEEPER") for i in range(3)]
+        self.room = Room.objects.create(number="101", lat=Decimal("40.000000"), lon=Decimal("-3.000000"))
+
+    def _reset(self):
+        with presence._lock:
+            presence._positions.clear()
+            presence._dirty.clear()
+            presence._dirty_since = None
+            presence._timer = None
+        invalidate_staff_index()
+
+    def _ping(self, user, lat, ts=None):
+        return presence.record_pings([(user.pk, Decimal(lat), Decimal("-3.000000"), ts or timezone.now())])
+
+    def test_keeps_newest_ping_and_arms_one_timer(self):
+        now = timezone.now()
+        self._ping(self.users[0], "40.001000", now)
+        self.assertEqual(self._ping(self.users[0], "40.009000", now - timedelta(minutes=1)), 0)  # llegó tarde
+        self._ping(self.users[1], "40.002000", now)
+        self.assertEqual(presence.positions()[self.users[0].pk][0], Decimal("40.001000"))
+        self.timer.assert_called_once()
+        self.timer.return_value.start.assert_called_once()
+
+    def test_timer_flushes_without_new_pings(self):
+        self._ping(self.users[0], "40.001000")
+        interval, target = self.timer.call_args[0]
+        with mock.patch.object(presence, "connections"):
+            target()
+        self.assertEqual(StaffAvailability.objects.get(user=self.users[0]).lat, Decimal("40.001000"))
+        self.assertFalse(presence._dirty)
+        self.assertEqual(self.timer.call_count, 1)  # nada pendiente: no se vuelve a armar
+
+    def test_maybe_flush_waits_for_oldest_pending(self):
+        StaffAvailability.objects.create(user=self.users[0], lat=Decimal("40.005000"), lon=Decimal("-3.000000"))
+        self._ping(self.users[0], "40.001000", timezone.now() + timedelta(seconds=1))
+        self.assertFalse(presence.maybe_flush())
+        presence._dirty_since -= presence.FLUSH_INTERVAL
+        self.assertTrue(presence.maybe_flush())
+        self.assertEqual(StaffAvailability.objects.get(user=self.users[0]).lat, Decimal("40.001000"))
+
+    @override_settings(PRESENCE_MAX_ENTRIES=2)
+    def test_flush_evicts_stale_and_bounds_size(self):
+        now = timezone.now()
+        self._ping(self.users[0], "40.001000", now - timedelta(seconds=2))
+        self._ping(self.users[1], "40.002000", now - timedelta(seconds=1))
+        self._ping(self.users[2], "40.003000", now)
+        self.assertTrue(presence.maybe_flush())  # pasó el tope: no espera el intervalo
+        self.assertEqual(set(presence.positions()), {self.users[1].pk, self.users[2].pk})
+
+        # lo pendiente no se saca aunque sea viejo
+        self._ping(self.users[0], "40.001000", now - timedelta(hours=1))
+        presence._evict()
+        self.assertIn(self.users[0].pk, presence.positions())
+        presence.flush_presence()
+        self.assertNotIn(self.users[0].pk, presence.positions())
+
+    @skipIf(spatial.np is None, "requiere numpy")
+    def test_nearest_staff_uses_live_positions(self):
+        for user, lat in zip(self.users, ("40.001000", "40.002000", "40.010000")):
+            StaffAvailability.objects.create(user=user, lat=Decimal(lat), lon=Decimal("-3.000000"))
+        near = spatial.nearest_staff(self.room, k=2)
+        self.assertEqual([r["user_id"] for r in near], [self.users[0].pk, self.users[1].pk])
+        self.assertAlmostEqual(near[0]["distance_m"], 111.2, delta=1)
+        self.assertEqual([r["user_id"] for r in spatial.nearest_staff(self.room, k=2, exclude={self.users[0].pk})],
+                         [self.users[1].pk, self.users[2].pk])
+
+        # el ping mueve al tercero al lado de la habitación sin pasar por la base
+        self._ping(self.users[2], "40.000100")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(spatial.nearest_staff(self.room, k=1)[0]["user_id"], self.users[2].pk)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(spatial.nearest_staff(Room(number="x")), [])
+
+
+class BulkTransitionTests(TestCase):
+    url = "/api/housekeeping/rooms/bulk_transition/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_superuser(username="sup", password="x"))
+        self.dirty = Room.objects.create(number="701", floor=7, status=Room.Status.DIRTY)
+        self.ooo = Room.objects.create(number="702", floor=7, status=Room.Status.OOO)  # OOO -> CLEAN no vale
+
+    def test_multipart_false_is_not_strict(self):
+        r = self.client.post(self.url, {"status": "CLEAN", "floor": "7", "strict": "false"}, format="multipart")
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertEqual(r.data["updated_count"], 1)
+
+    def test_multipart_true_is_strict(self):
+        r = self.client.post(self.url, {"status": "CLEAN", "floor": "7", "strict": "true"}, format="multipart")
+        self.assertEqual(r.status_code, 409)
+        self.dirty.refresh_from_db()
+        self.assertEqual(self.dirty.status, Room.Status.DIRTY)
+
+    def test_invalid_strict_is_400(self):
+        r = self.client.post(self.url, {"status": "CLEAN", "floor": 7, "strict": "maybe"}, format="json")
+        self.assertEqual(r.status_code, 400)
+
+    def test_room_ids_json_and_multipart(self):
+        others = [Room.objects.create(number=f"1{i}", status=Room.Status.DIRTY) for i in range(3)]
+        ids = [self.dirty.pk, others[0].pk]
+        r = self.client.post(self.url, {"status": "CLEAN", "rooms": ids}, format="json")
+        self.assertEqual(sorted(r.data["updated"]), sorted(ids))
+        # multipart: cada valor es un id completo, no sus dígitos
+        r = self.client.post(self.url, {"status": "INSPECTION", "rooms": [str(others[1].pk), str(others[2].pk)]},
+                             format="multipart")
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertEqual(sorted(r.data["updated"]), sorted([others[1].pk, others[2].pk]))
+        self.assertEqual(Room.objects.filter(status=Room.Status.INSPECTION).count(), 2)
+
+    def test_bare_string_rooms_is_400(self):
+        r = self.client.post(self.url, {"status": "CLEAN", "rooms": "12"}, format="json")
+        self.assertEqual(r.status_code, 400)
+
+    def test_view_only_user_cannot_bulk_change(self):
+        viewer = get_user_model().objects.create_user(username="viewer", password="x")
+        viewer.user_permissions.add(Permission.objects.get(codename="view_room"))
+        client = APIClient()
+        client.force_authenticate(viewer)
+        self.assertEqual(client.get("/api/housekeeping/rooms/").status_code, 200)
+        r = client.post(self.url, {"status": "CLEAN", "rooms": [self.dirty.pk]}, format="json")
+        self.assertEqual(r.status_code, 403)
+        viewer.user_permissions.add(Permission.objects.get(codename="change_room"))
+        client.force_authenticate(get_user_model().objects.get(pk=viewer.pk))
+        self.assertEqual(client.post(self.url, {"status": "CLEAN", "rooms": [self.dirty.pk]}, format="json").status_code, 200)
+
+
+class RoomTransitionLogTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser(username="sup", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rooms = [Room.objects.create(number=f"80{i}", floor=8 if i < 2 else 9, status=Room.Status.DIRTY)
+                      for i in range(3)]
+        RoomStatusTransition.objects.all().delete()   # las altas también se registran
+
+    def _inserts(self, ctx):
+        return [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "housekeeping_roomstatustransition"')]
+
+    def test_api_update_records_transition(self):
+        r = self.client.patch(f"/api/housekeeping/rooms/{self.rooms[0].pk}/", {"status": "CLEAN"}, format="json")
+        self.assertEqual(r.status_code, 200, r.data)
+        t = RoomStatusTransition.objects.get()
+        self.assertEqual((t.from_status, t.to_status, t.source, t.changed_by_id, t.floor),
+                         ("DIRTY", "CLEAN", "api", self.user.pk, 8))
+
+    def test_saves_in_collect_are_one_insert(self):
+        with CaptureQueriesContext(connection) as ctx, transaction.atomic(), room_events.collect():
+            for room in self.rooms:
+                room.status = Room.Status.CLEANING
+                room.save()
+        self.assertEqual(len(self._inserts(ctx)), 1)
+        self.assertEqual(RoomStatusTransition.objects.count(), 3)
+
+    def test_bulk_transition_is_one_insert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.post("/api/housekeeping/rooms/bulk_transition/", {"status": "CLEAN", "floor": 8}, format="json")
+        self.assertEqual(r.data["updated_count"], 2)
+        self.assertEqual(len(self._inserts(ctx)), 1)
+        self.assertEqual(set(RoomStatusTransition.objects.values_list("source", flat=True)), {"bulk"})
+
+    def test_transitions_feed_filters(self):
+        room_events.bulk_transition(Room.Status.CLEAN, room_ids=[r.pk for r in self.rooms])
+        first = RoomStatusTransition.objects.order_by("id").first().id
+        r = self.client.get("/api/housekeeping/rooms/transitions/", {"floor": "9", "status": "CLEAN"})
+        self.assertEqual([row["room_id"] for row in r.data["results"]], [self.rooms[2].pk])
+        r = self.client.get("/api/housekeeping/rooms/transitions/", {"since_id": first})
+        self.assertEqual(len(r.data["results"]), 2)
+        self.assertEqual(self.client.get("/api/housekeeping/rooms/transitions/", {"status": "NOPE"}).status_code, 400)
+
+    def test_event_stream_rereads_late_commits(self):
+        room = self.rooms[0]
+        RoomStatusTransition.objects.create(id=50, room=room, from_status="DIRTY", to_status="CLEAN", floor=8)
+        with mock.patch.object(room_events, "FEED_POLL_SECONDS", 0):
+            stream = room_events.event_stream(10, max_seconds=30)
+            self.assertTrue(next(stream).startswith("retry:"))
+            self.assertIn("id: 50\n", next(stream))
+            # otra transacción tomó el id 40 antes pero confirmó después
+            RoomStatusTransition.objects.create(id=40, room=room, from_status="CLEAN", to_status="DIRTY", floor=8)
+            RoomStatusTransition.objects.create(id=5, room=room, from_status="DIRTY", to_status="OOO", floor=8)
+            self.assertIn("id: 40\n", next(stream))
+            RoomStatusTransition.objects.create(id=60, room=room, from_status="DIRTY", to_status="CLEAN", floor=8)
+            self.assertIn("id: 60\n", next(stream))   # ni 50 repetido ni 5 (anterior al Last-Event-ID)
+            stream.close()
+
+
+class TurnaroundAnalyticsTests(TestCase):
+    url = "/api/housekeeping/analytics/turnaround/"
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username="sup", password="x", is_staff=True))
+        room = Room.objects.create(number="601", status=Room.Status.DIRTY)
+        for status in (Room.Status.CLEANING, Room.Status.CLEAN):
+            room.status = status
+            room.save()
+
+    def test_get_does_not_write_by_default(self):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(TurnaroundSample.objects.exists())
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "DELETE"))])
+
+    @override_settings(TURNAROUND_REFRESH_ON_READ=True)
+    def test_refresh_on_read_materializes_today(self):
+        r = self.client.get(self.url)
+        self.assertEqual(r.data["overall"]["count"], 1)
+
+    @override_settings(TURNAROUND_REFRESH_ON_READ=True)
+    def test_concurrent_materialization_is_not_a_500(self):
+        with mock.patch("housekeeping.analytics.materialize_turnarounds", side_effect=IntegrityError):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_impossible_dates_are_400(self):
+        for params in ({"date_to": "2025-02-30"}, {"date_from": "2025-13-01"}, {"date_from": "2025-05-02", "date_to": "2025-05-01"}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+
+class DailyTasksTests(TestCase):
+    day = date(2026, 3, 2)
+
+    def setUp(self):
+        self.rooms = Room.objects.bulk_create([Room(number=str(800 + i)) for i in range(4)])
+        self._occupy()
+
+    def _occupy(self):
+        RoomOccupancy.objects.bulk_create([RoomOccupancy(room=r, date=self.day, has_departure=True) for r in self.rooms])
+        generate_daily_tasks(self.day)
+
+    def _cancel_and_regenerate(self, items_per_task):
+        tasks = list(HousekeepingTask.objects.filter(origin=ORIGIN))
+        ChecklistItem.objects.bulk_create([
+            ChecklistItem(task=t, text=f"i{j}") for t in tasks for j in range(items_per_task)
+        ])
+        HousekeepingTask.objects.update(checklist_total=items_per_task)  # bulk_create no dispara señales
+        RoomOccupancy.objects.all().delete()
+        with CaptureQueriesContext(connection) as ctx:
+            result = generate_daily_tasks(self.day)
+        self.assertEqual(result["removed"], len(tasks))
+        self.assertFalse(HousekeepingTask.objects.exists())
+        self.assertFalse(ChecklistItem.objects.exists())
+        return len(ctx)
+
+    def test_stale_delete_does_not_scale_with_items(self):
+        few = self._cancel_and_regenerate(1)
+        self._occupy()
+        many = self._cancel_and_regenerate(20)
+        self.assertEqual(few, many)
+
+    def test_deferred_counters_recount_surviving_tasks(self):
+        task = HousekeepingTask.objects.filter(origin=ORIGIN).first()
+        items = [ChecklistItem.objects.create(task=task, text=f"i{j}", is_completed=j < 2) for j in range(3)]
+        with deferred_counters():
+            items[2].delete()
+            task.refresh_from_db()
+            self.assertEqual((task.checklist_total, task.checklist_done), (3, 2))  # aún sin recontar
+        task.refresh_from_db()
+        self.assertEqual((task.checklist_total, task.checklist_done), (2, 2))
+        self.assertEqual(task.status, HousekeepingTask.Status.DONE)
+
+    def test_origin_is_read_only(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_superuser(username="sup", password="x"))
+        r = client.post("/api/housekeeping/tasks/", {"room": self.rooms[0].pk, "title": "manual", "origin": ORIGIN}, format="json")
+        self.assertEqual(r.status_code, 201, r.data)
+        self.assertNotEqual(HousekeepingTask.objects.get(pk=r.data["id"]).origin, ORIGIN)
+
+
+class PmsImportTests(TestCase):
+    def setUp(self):
+        self.rooms = {n: Room.objects.create(number=n) for n in ("101", "102")}
+
+    def _import(self, text, **options):
+        return import_occupancy(io.BytesIO(text.encode()), "export.csv", **options)
+
+    def _flags(self, number, day):
+        occ = RoomOccupancy.objects.filter(room=self.rooms[number], date=day).first()
+        return occ and (occ.has_departure, occ.has_arrival, occ.is_stayover)
+
+    def test_stay_rows_and_reimport_is_idempotent(self):
+        csv_text = "room,arrival_date,departure_date\n101,2026-03-01,2026-03-03\n102,2026-03-03,2026-03-04\n"
+        result = self._import(csv_text)
+        self.assertEqual((result["created"], result["errors"]), (5, 0))
+        self.assertEqual(self._flags("101", date(2026, 3, 2)), (False, False, True))
+        self.assertEqual(self._flags("101", date(2026, 3, 3)), (True, False, False))
+        self.assertEqual(self._import(csv_text)["unchanged"], 5)
+
+    def test_unknown_room_is_row_error(self):
+        result = self._import("room,date,event\n999,2026-03-01,ARRIVAL\n101,2026-03-01,ARRIVAL\n")
+        self.assertEqual((result["created"], result["errors"]), (1, 1))
+        self.assertEqual(result["error_list"][0]["line"], 2)
+
+    def test_multi_property_rooms_resolve_per_property(self):
+        sur = Room.objects.create(number="SUR-101")
+        csv_text = (
+            "room,date,event,property\n"
+            "101,2026-03-01,ARRIVAL,NORTE\n"
+            "101,2026-03-01,DEPARTURE,SUR\n"      # SUR-101, no la 101 de NORTE
+            "102,2026-03-01,ARRIVAL,SUR\n"
+            "102,2026-03-02,ARRIVAL,NORTE\n"      # 102 ya es de SUR: ambigua
+        )
+        result = self._import(csv_text)
+        self.assertEqual((result["created"], result["errors"]), (3, 1))
+        self.assertEqual(result["error_list"][0]["line"], 5)
+        self.assertEqual(self._flags("101", date(2026, 3, 1)), (False, True, False))
+        self.assertTrue(RoomOccupancy.objects.get(room=sur).has_departure)
+
+        RoomOccupancy.objects.all().delete()
+        result = self._import(csv_text, property_code="SUR")
+        self.assertEqual((result["created"], result["skipped"], result["errors"]), (2, 2, 0))
+
+    def test_cancelled_stay_is_cleared_with_replace(self):
+        stay = "room,arrival_date,departure_date,status\n101,2026-03-01,2026-03-03,{}\n"
+        self._import(stay.format("CONFIRMED"))
+        self.assertEqual(self._import(stay.format("CANCELLED"))["cleared"], 0)   # sin replace: se ignora
+        self.assertEqual(self._flags("101", date(2026, 3, 2)), (False, False, True))
+
+        result = self._import(stay.format("CANCELLED"), replace=True)
+        self.assertEqual((result["cleared"], result["created"]), (3, 0))
+        self.assertEqual(self._flags("101", date(2026, 3, 2)), (False, False, False))
+        self.assertTrue(RoomOccupancy.objects.get(room=self.rooms["101"], date=date(2026, 3, 1)).pending_tasks)
+
+    def test_endpoint_date_range(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username="sup", password="x"))
+        upload = lambda: io.BytesIO(b"room,arrival_date,departure_date\n101,2026-03-01,2026-03-05\n")
+        r = client.post("/api/housekeeping/occupancy/import/",
+                        {"file": upload(), "date_from": "2026-03-02", "date_to": "2026-03-03"}, format="multipart")
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertEqual(sorted(RoomOccupancy.objects.values_list("date", flat=True)),
+                         [date(2026, 3, 2), date(2026, 3, 3)])
+        for bad in ("2026-02-30", "mañana"):
+            r = client.post("/api/housekeeping/occupancy/import/", {"file": upload(), "date_to": bad}, format="multipart")
+            self.assertEqual(r.status_code, 400, bad)
+
+    def test_replace_clears_only_covered_days(self):
+        self._import("room,date,event\n" + "".join(f"101,2026-03-0{d},STAYOVER\n" for d in range(1, 6)))
+        result = self._import("room,date,event\n101,2026-03-01,STAYOVER\n101,2026-03-05,ARRIVAL\n", replace=True)
+        # días 2-4 no vienen en el archivo: no se consideran cubiertos
+        self.assertEqual(result["cleared"], 0)
+        self.assertEqual(self._flags("101", date(2026, 3, 3)), (False, False, True))
+        self.assertEqual(self._flags("101", date(2026, 3, 5)), (False, True, False))
+
+        # el día 3 sí está cubierto (vino 102) y 101 no vino ese día: se limpia
+        result = self._import("room,date,event\n102,2026-03-03,ARRIVAL\n101,2026-03-04,ARRIVAL\n", replace=True)
+        self.assertEqual(result["cleared"], 1)
+        self.assertEqual(self._flags("101", date(2026, 3, 3)), (False, False, False))
+        self.assertEqual(self._flags("101", date(2026, 3, 2)), (False, False, True))
+
+
+class ApiQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Listados con varias filas y sesión real: un N+1 rompe el query_budget de la vista."""
+
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="sup", password="x", is_staff=True, role="SUPERVISOR")
+        self.user.groups.add(Group.objects.create(name="supervisor"))
+        others = [User.objects.create_user(username=f"hk{i}", password="x") for i in range(3)]
+        self.client = APIClient()
+        self.client.force_login(self.user)
+
+        items = [InventoryItem.objects.create(name=f"i{i}", sku=f"s{i}", stock=50) for i in range(2)]
+        self.rooms = [Room.objects.create(number=f"5{i:02d}") for i in range(4)]
+        for n, room in enumerate(self.rooms):
+            task = HousekeepingTask.objects.create(room=room, title=f"t{n}", assigned_to=others[n % 3])
+            for k in range(3):
+                ChecklistItem.objects.create(task=task, text=f"c{k}")
+            report = IncidentReport.objects.create(room=room, task=task, reported_by=others[n % 3])
+            for item in items:
+                IncidentLine.objects.create(report=report, category="LINEN", inventory_item=item,
+                                            outcome="BROKEN", quantity=1)
+            chat = ChatRoom.objects.create(name=f"chat{n}", room=room)
+            chat.participants.add(self.user, *others)
+            for sender in others:
+                ChatMessage.objects.create(room=chat, sender=sender, text="hola")
+        self.task = HousekeepingTask.objects.first()
+        self.chat = ChatRoom.objects.first()
+
+    def _get(self, url):
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200, url)
+        return r
+
+    def test_rooms(self):
+        self._get("/api/housekeeping/rooms/")
+        self._get(f"/api/housekeeping/rooms/{self.rooms[0].pk}/")
+
+    def test_tasks(self):
+        self._get("/api/housekeeping/tasks/")
+        self._get("/api/housekeeping/tasks/?include=checklist")
+        self._get(f"/api/housekeeping/tasks/{self.task.pk}/")
+
+    def test_incidents(self):
+        self._get("/api/housekeeping/incidents/")
+        r = self._get("/api/housekeeping/incidents/summary/")
+        self.assertEqual(sum(row["total_qty"] for row in r.data), 8)
+
+    def test_chat_rooms(self):
+        self._get("/api/housekeeping/chat/rooms/")
+        self._get(f"/api/housekeeping/chat/rooms/{self.chat.pk}/")
+
+    def test_chat_message_metrics_on_commit_without_extra_count(self):
+        with mock.patch("housekeeping.views.observe_chat_message") as observe:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks, CaptureQueriesContext(connection) as ctx:
+                r = self.client.post("/api/housekeeping/chat/messages/", {"room": self.chat.pk, "text": "hola"}, format="json")
+            self.assertEqual(r.status_code, 201, r.data)
+            observe.assert_not_called()  # hasta el commit no se cuenta
+            for callback in callbacks:
+                callback()
+        observe.assert_called_once_with(4)  # sup + 3 housekeepers
+        # el fan-out sale de la consulta de la sala, no de un COUNT aparte
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith("SELECT COUNT(")])
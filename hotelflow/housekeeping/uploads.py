@@ -0,0 +1,187 @@
+# housekeeping/uploads.py
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadSession, ChecklistItem, IncidentReport, ChatMessage
+
+CHUNK_SIZE = 64 * 1024
+
+# Destinos permitidos al finalizar: target -> (modelo, campo, dueño del objeto)
+UPLOAD_TARGETS = {
+    "checklist.photo_before": (ChecklistItem, "photo_before", lambda obj: obj.task.assigned_to_id),
+    "checklist.photo_after": (ChecklistItem, "photo_after", lambda obj: obj.task.assigned_to_id),
+    "incident.photo": (IncidentReport, "photo", lambda obj: obj.reported_by_id),
+    "chat.attachment": (ChatMessage, "attachment", lambda obj: obj.sender_id),
+}
+
+
+class UploadError(Exception):
+    """Error de negocio en una subida; `status` es el código HTTP sugerido."""
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def upload_dir() -> str:
+    return str(getattr(settings, "CHUNKED_UPLOAD_DIR", os.path.join(settings.MEDIA_ROOT, "uploads_tmp")))
+
+
+def max_upload_size() -> int:
+    return int(getattr(settings, "CHUNKED_UPLOAD_MAX_SIZE", 200 * 1024 * 1024))
+
+
+def upload_expiry() -> timedelta:
+    return getattr(settings, "CHUNKED_UPLOAD_EXPIRY", timedelta(hours=24))
+
+
+def part_path(session: UploadSession) -> str:
+    return os.path.join(upload_dir(), f"{session.id}.part")
+
+
+def _lock(session: UploadSession) -> UploadSession:
+    """
+    Relee la sesión con la fila bloqueada (dentro de una transacción) y copia
+    su estado a `session`: un segundo PUT o finalize espera al primero.
+    """
+    locked = UploadSession.objects.select_for_update().filter(pk=session.pk).first()
+    if locked is None:
+        raise UploadError("La subida expiró o fue descartada.", status=404)
+    session.status, session.offset, session.updated_at = locked.status, locked.offset, locked.updated_at
+    if session.updated_at < timezone.now() - upload_expiry():
+        raise UploadError("La subida expiró.", status=410)
+    return session
+
+
+def write_chunk(session: UploadSession, offset: int, stream, length: int) -> int:
+    """
+    Escribe `length` bytes de `stream` en la posición `offset` del archivo parcial.
+    Copia por bloques (nunca se carga el trozo completo en memoria).
+    Devuelve el nuevo offset. El offset debe coincidir con lo ya recibido:
+    así el cliente, tras un corte, consulta el offset y reanuda desde ahí.
+    La sesión queda bloqueada mientras se escriben los bytes: un PUT
+    concurrente espera y después ve el offset nuevo (409), nunca escriben
+    los dos sobre el mismo archivo.
+    """
+    if length <= 0:
+        raise UploadError("Trozo vacío.")
+    with transaction.atomic():
+        _lock(session)
+        if session.status != UploadSession.Status.OPEN:
+            raise UploadError("La subida ya fue finalizada.", status=409)
+        if offset != session.offset:
+            raise UploadError(f"Offset esperado {session.offset}, recibido {offset}.", status=409)
+        if offset + length > session.size:
+            raise UploadError("El trozo excede el tamaño declarado.")
+
+        os.makedirs(upload_dir(), exist_ok=True)
+        path = part_path(session)
+        mode = "r+b" if os.path.exists(path) else "wb"
+        written = 0
+        with open(path, mode) as out:
+            out.seek(offset)
+            while written < length:
+                buf = stream.read(min(CHUNK_SIZE, length - written))
+                if not buf:
+                    break
+                out.write(buf)
+                written += len(buf)
+            # Si la conexión se cortó a mitad, lo recibido sigue siendo válido
+            out.truncate(offset + written)
+
+        # Update condicional además del lock: SQLite no bloquea filas con select_for_update
+        now = timezone.now()
+        updated = UploadSession.objects.filter(pk=session.pk, offset=offset).update(offset=offset + written, updated_at=now)
+        if not updated:
+            raise UploadError("Subida concurrente sobre la misma sesión.", status=409)
+    session.offset, session.updated_at = offset + written, now
+    return session.offset
+
+
+def can_attach(user, obj, owner_id) -> bool:
+    """Puede adjuntar el dueño del objeto o quien tenga permiso change_<modelo>."""
+    if owner_id is not None and owner_id == user.id:
+        return True
+    opts = obj._meta
+    return user.has_perm(f"{opts.app_label}.change_{opts.model_name}")
+
+
+def finalize_upload(session: UploadSession, target: str, object_id, user):
+    """
+    Adjunta el archivo completo al objeto destino y cierra la sesión.
+    Solo el dueño del destino (asignado de la tarea, quien reportó la
+    incidencia, emisor del mensaje) o un usuario con change_<modelo>.
+    """
+    if target not in UPLOAD_TARGETS:
+        raise UploadError(f"target inválido. Opciones: {', '.join(sorted(UPLOAD_TARGETS))}")
+
+    try:
+        object_id = int(object_id)
+    except (TypeError, ValueError):
+        raise UploadError("object_id debe ser un entero.")
+
+    model, field, owner = UPLOAD_TARGETS[target]
+    obj = model.objects.filter(pk=object_id).first()
+    if obj is None:
+        raise UploadError("Objeto destino no encontrado.", status=404)
+    if not can_attach(user, obj, owner(obj)):
+        raise UploadError("No tienes permiso para adjuntar archivos a este objeto.", status=403)
+
+    path = part_path(session)
+    with transaction.atomic():
+        _lock(session)
+        if session.status != UploadSession.Status.OPEN:
+            raise UploadError("La subida ya fue finalizada.", status=409)
+        if session.offset != session.size:
+            raise UploadError(f"Subida incompleta ({session.offset}/{session.size} bytes).", status=409)
+        with open(path, "rb") as fh:
+            # El storage (CAS) calcula el hash mientras copia
+            getattr(obj, field).save(session.filename, File(fh), save=True)
+        session.status = UploadSession.Status.COMPLETE
+        session.save(update_fields=["status", "updated_at"])
+    os.remove(path)
+    return obj
+
+
+def discard_upload(session: UploadSession):
+    path = part_path(session)
+    if os.path.exists(path):
+        os.remove(path)
+    session.delete()
+
+
+def sweep_uploads(expiry=None) -> int:
+    """
+    Borra las sesiones (abiertas o ya finalizadas) sin actividad en `expiry`
+    (CHUNKED_UPLOAD_EXPIRY) junto con su archivo parcial, y los .part de
+    sesiones que ya no existen (p.ej. borradas en cascada con su dueño).
+    Cada sesión se revisa de nuevo con la fila bloqueada: un PUT en curso
+    la mantiene viva. Devuelve cuántas sesiones borró.
+    """
+    cutoff = timezone.now() - (upload_expiry() if expiry is None else expiry)
+    removed = 0
+    for pk in list(UploadSession.objects.filter(updated_at__lt=cutoff).values_list("pk", flat=True)):
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().filter(pk=pk, updated_at__lt=cutoff).first()
+            if session is None:
+                continue
+            discard_upload(session)
+            removed += 1
+
+    directory = upload_dir()
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            stem, ext = os.path.splitext(name)
+            try:
+                session_id = uuid.UUID(stem)
+            except ValueError:
+                continue
+            if ext == ".part" and not UploadSession.objects.filter(pk=session_id).exists():
+                os.remove(os.path.join(directory, name))
+    return removed
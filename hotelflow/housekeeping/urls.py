@@ -1,3 +1,4 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views import (
     RoomViewSet,
@@ -7,13 +8,19 @@ from .views import (
     InventoryItemViewSet,
     InventoryMovementViewSet,
     IncidentReportViewSet, IncidentLineViewSet,
-    ChatRoomViewSet, ChatMessageViewSet
+    ChatRoomViewSet, ChatMessageViewSet,
+    UploadSessionViewSet,
+    ChecklistTemplateViewSet,
+    RoomOccupancyViewSet,
+    TurnaroundAnalyticsView,
 )
 
 router = DefaultRouter()
 router.register(r"rooms", RoomViewSet)
 router.register(r"tasks", HousekeepingTaskViewSet)
 router.register(r"checklist", ChecklistItemViewSet)
+router.register(r"checklist-templates", ChecklistTemplateViewSet)
+router.register(r"occupancy", RoomOccupancyViewSet)
 router.register(r"staff-availability", StaffAvailabilityViewSet)
 router.register(r"inventory/items", InventoryItemViewSet, basename="inventory-items")
 router.register(r"inventory/movements", InventoryMovementViewSet, basename="inventory-movements")
@@ -21,5 +28,8 @@ router.register(r"incidents", IncidentReportViewSet, basename="incidents")
 router.register(r"incident-lines", IncidentLineViewSet, basename="incident-lines")
 router.register(r"chat/rooms", ChatRoomViewSet, basename="chatroom")
 router.register(r"chat/messages", ChatMessageViewSet, basename="chatmessage")
+router.register(r"uploads", UploadSessionViewSet, basename="uploads")
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path("analytics/turnaround/", TurnaroundAnalyticsView.as_view(), name="analytics-turnaround"),
+]
@@ -5,7 +5,7 @@ from .models import StaffAvailability, HousekeepingTask, Room
 # Roles permitidos para recibir tareas de housekeeping
 ALLOWED_ROLES = {"HOUSEKEEPER", "SUPERVISOR"}
 
-# Distancia Haversine (metros). Lista para cuando agreguemos lat/lon a Room.
+# Distancia Haversine (metros). Versión escalar; la vectorizada está en spatial.py
 def haversine_m(lat1, lon1, lat2, lon2):
     if None in (lat1, lon1, lat2, lon2):
         return None
@@ -23,6 +23,9 @@ def pick_best_staff_for_task(task: HousekeepingTask):
     Devuelve (StaffAvailability|None, info:dict)
     """
     room: Room = task.room
+    # Distancias desde el índice espacial en memoria (import local: spatial importa utils)
+    from .spatial import staff_distances
+    distances = staff_distances(room)
 
     qs = (
         StaffAvailability.objects
@@ -38,9 +41,12 @@ def pick_best_staff_for_task(task: HousekeepingTask):
 
     candidates = []
     for sa in qs:
-        # Desempate simple por zona/piso (cuando añadamos coords de Room, usaremos haversine)
+        # Desempate por distancia (si hay coords) y luego zona/piso
         same_zone_or_floor = 1 if (getattr(room, "zone", None) or getattr(room, "floor", None)) else 0
-        dist = None  # placeholder hasta tener coords en Room
+        dist = distances.get(sa.user_id)
+        if dist is None:
+            dist = haversine_m(room.lat, room.lon, sa.lat, sa.lon)
+        sa.distance_m = dist
         score = (
             getattr(sa, "active_load", 0),
             dist if dist is not None else 10_000_000,
@@ -57,5 +63,6 @@ def pick_best_staff_for_task(task: HousekeepingTask):
         "user_id": best.user_id,
         "username": best.user.username,
         "active_load": getattr(best, "active_load", 0),
-        "criteria": "availability, role, lowest active load; zone/floor tie-break",
+        "distance_m": round(best.distance_m, 1) if best.distance_m is not None else None,
+        "criteria": "availability, role, lowest active load; distance, zone/floor tie-break",
     }
\ No newline at end of file
@@ -10,9 +10,14 @@ from .serializers import (
     RoomSerializer,
     HousekeepingTaskSerializer,
     ChecklistItemSerializer,
+    ChecklistCompleteSerializer,
     StaffAvailabilitySerializer,
 )
 from .utils import pick_best_staff_for_task
+from .assignment import auto_assign_tasks, AssignmentUnavailable
+from .checklists import complete_items, instantiate_checklists
+from .models import ChecklistTemplate
+from .serializers import ChecklistTemplateSerializer
 from django.db import models  # <- para F() en alerts
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
@@ -21,12 +26,18 @@ from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import InventoryItem, InventoryMovement  
 from .serializers import InventoryItemSerializer, InventoryMovementSerializer  
-from .models import IncidentReport, IncidentLine
+from .inventory import apply_movements, InsufficientStock
+from .stock_history import stock_at, reconcile
+from .forecast import forecast_items, ForecastUnavailable
+from datetime import datetime, time as dt_time
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from .models import IncidentReport, IncidentLine, IncidentDailyRollup
 from .serializers import IncidentReportSerializer, IncidentLineSerializer
 from django.db.models import Sum
 from rest_framework.decorators import action
 
-from django.db import models
+from django.db import models, transaction
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -37,7 +48,50 @@ User = get_user_model()
 
 from .models import ChatRoom, ChatMessage
 from .serializers import ChatRoomSerializer, ChatMessageSerializer
-from .permissions import IsHKStaffOrHasModelView
+from .permissions import CanChangeRooms, IsHKStaffOrHasModelView
+from accounts.authz import get_authz
+from core.metrics import observe_chat_message
+from .storage import CAS_PREFIX
+from .models import UploadSession
+from .serializers import UploadSessionSerializer
+from .uploads import UploadError, write_chunk, finalize_upload, discard_upload
+from .exports import ExportMixin
+from .spatial import nearest_staff as find_nearest_staff
+from . import presence
+from . import room_events
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
+from datetime import timedelta
+from .models import TurnaroundSample
+from .analytics import turnaround_stats, AnalyticsUnavailable, GROUP_FIELDS
+from .serializers import PresencePingSerializer, HousekeepingTaskListSerializer
+from django.db.models import Prefetch
+from .models import RoomOccupancy
+from .serializers import RoomOccupancySerializer
+from .daily_tasks import generate_daily_tasks, rooms_summary, sync_pending_occupancy
+from .pms_import import import_occupancy, PmsImportError
+from rest_framework.parsers import MultiPartParser, FormParser
+from decimal import Decimal
+from rest_framework import mixins, serializers
+
+import os
+from django.conf import settings
+from django.views.static import serve as static_serve
+
+
+# ==== Media CAS ====
+def serve_blob(request, path):
+    """
+    Sirve blobs del storage CAS. Como el nombre es el hash del contenido,
+    el archivo nunca cambia: se puede cachear indefinidamente.
+    Solo se registra con DEBUG (hotelflow/urls.py): no autentica. En producción
+    nginx sirve /media/cas/ con la misma cabecera de caché.
+    """
+    response = static_serve(request, path, document_root=os.path.join(settings.MEDIA_ROOT, CAS_PREFIX))
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    response["ETag"] = f'"{os.path.splitext(os.path.basename(path))[0]}"'
+    return response
 
 
 class IsStaffOrReadOnly(permissions.BasePermission):
@@ -51,12 +105,153 @@ class RoomViewSet(viewsets.ModelViewSet):
     queryset = Room.objects.all().order_by("number")
     serializer_class = RoomSerializer
     permission_classes = [IsHKStaffOrHasModelView]
+    query_budget = {"list": 4, "retrieve": 4}   # consultas por request, autorización en frío incluida (core/instrumentation.py)
 
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in permissions.SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        # transiciones de estado de toda la request: un bulk_create al final, en la misma transacción
+        with transaction.atomic(), room_events.collect():
+            return super().dispatch(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        # para el log de transiciones de estado (signals.room_status_changed)
+        serializer.instance._changed_by = self.request.user
+        serializer.instance._transition_source = "api"
+        serializer.save()
+
+    def _feed_filters(self, request):
+        p = request.query_params
+        try:
+            floors = [int(f) for f in p.get("floor", "").split(",") if f.strip()]
+        except ValueError:
+            raise ValidationError({"floor": "Debe ser entero o lista separada por comas."})
+        statuses = [s.strip().upper() for s in p.get("status", "").split(",") if s.strip()]
+        invalid = set(statuses) - set(Room.Status.values)
+        if invalid:
+            raise ValidationError({"status": f"Estados inválidos: {', '.join(sorted(invalid))}"})
+        return {"floors": floors, "zone": p.get("zone") or None, "statuses": statuses}
+
+    @extend_schema(
+        request=None,
+        responses={200: None},
+        description="Cambia el estado de muchas habitaciones en un solo UPDATE. Body: "
+                    "{\"status\": \"CLEAN\", \"rooms\": [ids]} o selector {\"floor\": 3, \"zone\": \"...\"}; "
+                    "opcional from_status (lista) y strict (si alguna transición no es válida, no aplica ninguna)."
+    )
+    @staticmethod
+    def _list_field(data, key):
+        # multipart/form: rooms=1&rooms=2 (get() solo daría el último, y como texto)
+        if hasattr(data, "getlist"):
+            return data.getlist(key) or None
+        return data.get(key)
+
+    @action(detail=False, methods=["post"], url_path="bulk_transition", permission_classes=[CanChangeRooms])
+    def bulk_transition(self, request):
+        data = request.data
+        target = str(data.get("status") or "").upper()
+        if target not in Room.Status.values:
+            return Response({"detail": "status inválido."}, status=400)
+        room_ids, floor = self._list_field(data, "rooms"), data.get("floor")
+        zone = data.get("zone") or None
+        if room_ids is None and floor in (None, "") and not zone:
+            return Response({"detail": "Indica 'rooms' (lista de ids) o un selector floor/zone."}, status=400)
+        if room_ids is not None and not isinstance(room_ids, list):
+            return Response({"detail": "rooms debe ser una lista de ids."}, status=400)
+        try:
+            room_ids = [int(r) for r in room_ids] if room_ids is not None else None
+            floor = int(floor) if floor not in (None, "") else None
+        except (TypeError, ValueError):
+            return Response({"detail": "rooms/floor deben ser enteros."}, status=400)
+        from_statuses = self._list_field(data, "from_status") or None
+        if isinstance(from_statuses, str):
+            from_statuses = [from_statuses]
+        if from_statuses and not set(from_statuses) <= set(Room.Status.values):
+            return Response({"detail": "from_status inválido."}, status=400)
+
+        try:
+            # multipart manda "false"/"0" como texto: bool() los tomaría como True
+            strict = serializers.BooleanField().to_internal_value(data.get("strict") or False)
+        except ValidationError:
+            return Response({"detail": "strict debe ser booleano."}, status=400)
+
+        try:
+            result = room_events.bulk_transition(
+                target, room_ids=room_ids, floor=floor, zone=zone, from_statuses=from_statuses,
+                user=request.user, strict=strict,
+            )
+        except room_events.TransitionRejected as e:
+            return Response({"detail": str(e), "rejected": e.rejected}, status=409)
+        return Response({"status": target, **result, "updated_count": len(result["updated"])})
 
-class HousekeepingTaskViewSet(viewsets.ModelViewSet):
+    @extend_schema(
+        request=None,
+        responses={200: None},
+        description="Cambios de estado de habitaciones con id > since_id (para polling incremental). "
+                    "Filtros: floor=3,4  zone=Ala Norte  status=CLEAN"
+    )
+    @action(detail=False, methods=["get"], url_path="transitions")
+    def transitions(self, request):
+        try:
+            since_id = int(request.query_params.get("since_id", 0))
+        except ValueError:
+            return Response({"detail": "since_id debe ser entero."}, status=400)
+        rows = room_events.transitions_since(since_id, **self._feed_filters(request))
+        return Response({"results": rows, "last_id": rows[-1]["id"] if rows else since_id})
+
+    @extend_schema(
+        request=None,
+        responses={200: None},
+        description="Feed SSE (text/event-stream) de cambios de estado; p.ej. habitaciones listas: "
+                    "?status=CLEAN&floor=3. Reanuda desde Last-Event-ID o ?since_id; si no, solo eventos nuevos. "
+                    "Cada conexión ocupa un worker hasta ROOM_FEED_MAX_SECONDS (60 s) y luego el cliente reconecta."
+    )
+    @action(detail=False, methods=["get"], url_path="events",
+            renderer_classes=[room_events.EventStreamRenderer, JSONRenderer])
+    def events(self, request):
+        filters_ = self._feed_filters(request)
+        last = request.headers.get("Last-Event-ID") or request.query_params.get("since_id")
+        try:
+            last_id = int(last) if last not in (None, "") else room_events.latest_transition_id()
+        except ValueError:
+            return Response({"detail": "since_id/Last-Event-ID debe ser entero."}, status=400)
+        response = StreamingHttpResponse(
+            room_events.event_stream(last_id, **filters_), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @extend_schema(
+        request=None,
+        responses={200: None},
+        description="Personal disponible más cercano a la habitación (índice espacial en memoria). ?k=5"
+    )
+    @action(detail=True, methods=["get"], url_path="nearest_staff")
+    def nearest_staff(self, request, pk=None):
+        room = self.get_object()
+        if room.lat is None or room.lon is None:
+            return Response({"detail": "La habitación no tiene coordenadas."}, status=400)
+        try:
+            k = max(1, min(int(request.query_params.get("k", 5)), 50))
+        except ValueError:
+            return Response({"detail": "k debe ser entero."}, status=400)
+        return Response({"room": room.number, "results": find_nearest_staff(room, k=k)})
+
+
+class HousekeepingTaskViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = HousekeepingTask.objects.select_related("room", "assigned_to").all().order_by("-created_at")
     serializer_class = HousekeepingTaskSerializer
+    export_filename = "tasks"
+    export_columns = [
+        ("id", "id"), ("room", "room__number"), ("floor", "room__floor"), ("title", "title"),
+        ("task_type", "task_type"), ("priority", "priority"), ("status", "status"),
+        ("assigned_to", "assigned_to__username"), ("scheduled_for", "scheduled_for"),
+        ("created_at", "created_at"), ("started_at", "started_at"), ("finished_at", "finished_at"),
+        ("checklist_done", "checklist_done"), ("checklist_total", "checklist_total"),
+    ]
     permission_classes = [IsStaffOrReadOnly]
+    query_budget = {"list": 4, "retrieve": 4}   # ?include=checklist suma 1
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = [
         "status",
@@ -69,6 +264,38 @@ class HousekeepingTaskViewSet(viewsets.ModelViewSet):
     search_fields = ["title", "description", "room__number"]
     ordering_fields = ["priority", "status", "scheduled_for", "created_at"]
 
+    def _include_checklist(self):
+        if self.action == "retrieve":
+            return True
+        return self.action == "list" and "checklist" in self.request.query_params.get("include", "").split(",")
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == "list" and self._include_checklist():
+            # una query para todos los ítems de la página, solo columnas compactas
+            return qs.prefetch_related(Prefetch(
+                "checklist",
+                queryset=ChecklistItem.objects.only("id", "task_id", "text", "is_completed", "completed_at").order_by("id"),
+            ))
+        if self.action == "retrieve":
+            return qs.prefetch_related("checklist")
+        return qs
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return HousekeepingTaskListSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["include_checklist"] = self._include_checklist()
+        return context
+
+    def perform_create(self, serializer):
+        task = serializer.save()
+        # checklist estándar según plantilla (task_type + categoría de la habitación)
+        instantiate_checklists([task])
+
     @extend_schema(
         request=None,
         responses={200: None},
@@ -122,6 +349,125 @@ class HousekeepingTaskViewSet(viewsets.ModelViewSet):
         )
 
 
+    @extend_schema(
+        request=None,
+        responses={200: None},
+        description="Asigna en lote las tareas PENDING sin responsable (respeta los filtros del listado, "
+                    "p.ej. ?scheduled_for=2025-08-16). Reparte por carga, zona/piso y prioridad. "
+                    "GET muestra el plan; POST lo aplica. Opcional: capacity_minutes."
+    )
+    @action(detail=False, methods=["post", "get"], url_path="auto_assign")
+    def auto_assign_batch(self, request):
+        params = request.data if request.method == "POST" else request.query_params
+        overrides = {}
+        if params.get("capacity_minutes") not in (None, ""):
+            try:
+                capacity = int(params.get("capacity_minutes"))
+            except (TypeError, ValueError):
+                capacity = 0
+            if capacity <= 0:
+                return Response({"detail": "capacity_minutes debe ser un entero positivo."}, status=400)
+            overrides["capacity_minutes"] = capacity
+        try:
+            plan, unassigned = auto_assign_tasks(
+                self.filter_queryset(self.get_queryset()), overrides, commit=(request.method == "POST")
+            )
+        except AssignmentUnavailable as e:
+            return Response({"detail": str(e)}, status=503)
+
+        per_staff = {}
+        for _, sa, minutes in plan:
+            row = per_staff.setdefault(sa.user_id, {"user_id": sa.user_id, "username": sa.user.username, "tasks": 0, "minutes": 0})
+            row["tasks"] += 1
+            row["minutes"] += minutes
+        return Response(
+            {
+                "assigned": (request.method == "POST"),
+                "mode": request.method,
+                "assignments": [
+                    {"task_id": t.id, "room": t.room.number, "priority": t.priority,
+                     "user_id": sa.user_id, "username": sa.user.username, "minutes": minutes}
+                    for t, sa, minutes in plan
+                ],
+                "unassigned": [t.id for t in unassigned],
+                "staff": sorted(per_staff.values(), key=lambda r: r["username"]),
+            }
+        )
+
+    @extend_schema(
+        request=None,
+        responses={200: None},
+        description="Genera las tareas del día (o rango) desde la ocupación: salidas => TURNOVER, "
+                    "continuaciones => AMENITIES, solo llegadas => INSPECTION. Idempotente. "
+                    "GET muestra qué cambiaría; POST lo aplica. Params: date, date_to (opcional)."
+    )
+    @action(detail=False, methods=["post", "get"], url_path="generate_daily")
+    def generate_daily(self, request):
+        params = request.data if request.method == "POST" else request.query_params
+        try:
+            date_from = parse_date(str(params.get("date") or "")) or timezone.localdate()
+            date_to = parse_date(str(params.get("date_to") or "")) or date_from
+        except ValueError:
+            date_from = date_to = None
+        if not date_from or date_from > date_to or (date_to - date_from).days > 31:
+            return Response({"detail": "Rango inválido (YYYY-MM-DD, máximo 31 días)."}, status=400)
+        result = generate_daily_tasks(date_from, date_to, dry_run=(request.method == "GET"))
+        return Response(
+            {
+                "applied": (request.method == "POST"),
+                "date_from": date_from,
+                "date_to": date_to,
+                **result,
+                "rooms_summary": rooms_summary(date_from, date_to),
+            }
+        )
+
+    @extend_schema(
+        request=ChecklistCompleteSerializer,
+        responses={200: None},
+        description="Completa varios ítems del checklist en una sola transacción. "
+                    "Body: {\"items\": [ids]} o {\"all\": true}."
+    )
+    @action(detail=True, methods=["post"], url_path="checklist/complete")
+    def complete_checklist(self, request, pk=None):
+        task = self.get_object()
+        ser = ChecklistCompleteSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        item_ids = None if ser.validated_data["all"] else ser.validated_data["items"]
+        changed = complete_items(task, item_ids, request.user)
+        task.refresh_from_db(fields=["status", "started_at", "finished_at", "checklist_total", "checklist_done"])
+        return Response(
+            {
+                "task_id": task.id,
+                "completed": changed,
+                "checklist_total": task.checklist_total,
+                "checklist_done": task.checklist_done,
+                "status": task.status,
+                "finished_at": task.finished_at,
+            }
+        )
+
+
+    @extend_schema(
+        request=None,
+        responses={200: None},
+        description="Crea el checklist de la tarea desde su plantilla (solo si aún no tiene ítems)."
+    )
+    @action(detail=True, methods=["post"], url_path="checklist/instantiate")
+    def instantiate_checklist(self, request, pk=None):
+        task = self.get_object()
+        created = instantiate_checklists([task])
+        return Response({"task_id": task.id, "created": created, "checklist_total": task.checklist_total})
+
+
+class ChecklistTemplateViewSet(viewsets.ModelViewSet):
+    queryset = ChecklistTemplate.objects.prefetch_related("items").all()
+    serializer_class = ChecklistTemplateSerializer
+    permission_classes = [IsStaffOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["task_type", "room_category", "is_active"]
+
+
 class ChecklistItemViewSet(viewsets.ModelViewSet):
     queryset = ChecklistItem.objects.select_related("task").all()
     serializer_class = ChecklistItemSerializer
@@ -130,12 +476,94 @@ class ChecklistItemViewSet(viewsets.ModelViewSet):
     filterset_fields = ["task", "is_completed"]
 
 
+class RoomOccupancyViewSet(viewsets.ModelViewSet):
+    queryset = RoomOccupancy.objects.select_related("room").all()
+    serializer_class = RoomOccupancySerializer
+    permission_classes = [IsStaffOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["date", "room", "has_departure", "has_arrival", "is_stayover", "pending_tasks"]
+
+    @extend_schema(
+        request=None,
+        responses={200: None},
+        description="Importa un export del PMS (multipart 'file', CSV o ICS) leyéndolo fila a fila y "
+                    "haciendo upsert por lotes. Opcionales: file_type=csv|ics, property, date_from/date_to "
+                    "(YYYY-MM-DD, ignora los días fuera del rango), replace=true (limpia lo que no vino en el "
+                    "archivo), generate=true (regenera las tareas afectadas). "
+                    "Devuelve totales, los días cambiados y los errores por fila (máx. 200)."
+    )
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser, FormParser])
+    def import_file(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"detail": "Se requiere el archivo 'file'."}, status=400)
+        truthy = ("1", "true", "yes")
+        bounds = {}
+        for key in ("date_from", "date_to"):
+            raw = request.data.get(key) or ""
+            try:
+                bounds[key] = parse_date(raw) if raw else None
+            except ValueError:
+                bounds[key] = None
+            if raw and bounds[key] is None:
+                return Response({"detail": f"{key} inválido, usa YYYY-MM-DD."}, status=400)
+        try:
+            result = import_occupancy(
+                upload.open("rb"), upload.name, request.data.get("file_type"),
+                property_code=request.data.get("property", ""),
+                replace=str(request.data.get("replace", "")).lower() in truthy,
+                **bounds,
+            )
+        except PmsImportError as e:
+            return Response({"detail": str(e)}, status=400)
+        if str(request.data.get("generate", "")).lower() in truthy:
+            result["tasks"] = sync_pending_occupancy()
+        return Response(result)
+
+
 class StaffAvailabilityViewSet(viewsets.ModelViewSet):
     queryset = StaffAvailability.objects.select_related("user").all()
     serializer_class = StaffAvailabilitySerializer
     permission_classes = [IsStaffOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["user", "is_available"]
+
+    MAX_PINGS = 500
+
+    @extend_schema(
+        request=PresencePingSerializer(many=True),
+        responses={202: None},
+        description="Ingesta de posiciones en lote (app móvil). Body: {\"pings\": [{\"lat\":..,\"lon\":..,\"ts\":..}]}. "
+                    "Se guarda la última posición por persona en memoria y se escribe a la base "
+                    "agrupada cada PRESENCE_FLUSH_INTERVAL segundos. 'user' solo para cuentas staff."
+    )
+    @action(detail=False, methods=["post"], url_path="ping", permission_classes=[permissions.IsAuthenticated])
+    def ping(self, request):
+        data = request.data.get("pings") if isinstance(request.data, dict) and "pings" in request.data else request.data
+        if isinstance(data, dict):
+            data = [data]
+        if not isinstance(data, list) or not data:
+            return Response({"detail": "Se requiere 'pings' (lista)."}, status=400)
+        if len(data) > self.MAX_PINGS:
+            return Response({"detail": f"Máximo {self.MAX_PINGS} pings por envío."}, status=400)
+        ser = PresencePingSerializer(data=data, many=True)
+        ser.is_valid(raise_exception=True)
+
+        me = request.user
+        pings = []
+        for p in ser.validated_data:
+            user_id = p.get("user", me.pk)
+            if user_id != me.pk and not (me.is_staff or me.is_superuser):
+                return Response({"detail": "Solo staff puede enviar posiciones de otros usuarios."}, status=403)
+            pings.append((
+                user_id,
+                Decimal(str(round(p["lat"], 6))),
+                Decimal(str(round(p["lon"], 6))),
+                presence.clamp_ts(p.get("ts")),
+            ))
+        accepted = presence.record_pings(pings)
+        flushed = presence.maybe_flush()
+        return Response({"received": len(pings), "accepted": accepted, "flushed": flushed}, status=202)
     
 
 # ==== Inventory Views ====
@@ -150,6 +578,13 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["get"], url_path="alerts")
     def alerts(self, request):
+        """
+        Items con stock <= reorder_level.
+        ?forecast=true: todos los items activos con pronóstico de consumo,
+        ordenados por fecha proyectada de quiebre de stock (los sin quiebre al final).
+        """
+        if str(request.query_params.get("forecast", "")).lower() in ("1", "true", "yes", "on"):
+            return self._forecast_alerts()
         qs = self.get_queryset().filter(is_active=True, stock__lte=models.F("reorder_level"))
         page = self.paginate_queryset(qs)
         ser = self.get_serializer(page or qs, many=True)
@@ -157,24 +592,121 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
             return self.get_paginated_response(ser.data)
         return Response(ser.data)
 
+    def _forecast_alerts(self):
+        items = list(self.filter_queryset(self.get_queryset()).filter(is_active=True))
+        try:
+            forecasts = forecast_items(items)
+        except ForecastUnavailable as e:
+            return Response({"detail": str(e)}, status=503)
+        # El orden depende del pronóstico: se ordena todo y se pagina la lista
+        items.sort(key=lambda it: (
+            forecasts[it.pk]["days_of_cover"] is None,
+            forecasts[it.pk]["days_of_cover"] or 0,
+            -forecasts[it.pk]["reorder_qty"],
+        ))
+        page = self.paginate_queryset(items)
+        page_items = items if page is None else page
+        data = self.get_serializer(page_items, many=True).data
+        rows = [{**row, **forecasts[item.pk]} for item, row in zip(page_items, data)]
+        if page is not None:
+            return self.get_paginated_response(rows)
+        return Response(rows)
+
+    @action(detail=True, methods=["get"], url_path="stock_at")
+    def stock_at(self, request, pk=None):
+        """
+        Stock a una fecha/hora según el ledger (checkpoint más cercano + movimientos):
+        /api/housekeeping/inventory/items/{id}/stock_at/?at=2025-08-01T00:00
+        Si `at` es solo fecha (YYYY-MM-DD) se devuelve el stock al cierre de ese día.
+        """
+        item = self.get_object()
+        raw = (request.query_params.get("at") or "").strip()
+        try:
+            d = parse_date(raw) if len(raw) == 10 else None
+            at = datetime.combine(d, dt_time.max) if d else parse_datetime(raw)
+        except ValueError:  # bien formada pero imposible (2025-13-01)
+            at = None
+        if at is None:
+            return Response({"detail": "at requerido (YYYY-MM-DD o ISO datetime)"}, status=400)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        stock, cp = stock_at(item, at)
+        if stock is None:
+            return Response({"detail": "No hay historia suficiente para esa fecha."}, status=404)
+        return Response({
+            "item": item.id,
+            "at": at,
+            "stock": stock,
+            "checkpoint": cp.id if cp else None,
+            "checkpoint_taken_at": cp.taken_at if cp else None,
+        })
+
+    @action(detail=False, methods=["get"], url_path="reconcile")
+    def reconcile(self, request):
+        """
+        Concilia stock registrado vs ledger. Por defecto solo items con diferencia;
+        ?all=true devuelve todos.
+        """
+        show_all = str(request.query_params.get("all", "")).lower() in ("1", "true", "yes", "on")
+        return Response(reconcile(only_drift=not show_all))
+
 
-class InventoryMovementViewSet(viewsets.ModelViewSet):
+class InventoryMovementViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = InventoryMovement.objects.select_related("item").all()
     serializer_class = InventoryMovementSerializer
+    export_filename = "inventory-movements"
+    export_columns = [
+        ("id", "id"), ("created_at", "created_at"), ("item", "item_id"), ("sku", "item__sku"),
+        ("item_name", "item__name"), ("type", "type"), ("quantity", "quantity"),
+        ("reason", "reason"), ("notes", "notes"), ("created_by", "created_by__username"),
+    ]
     permission_classes = [IsStaffOrReadOnly]
     # movimientos inmutables (no update)
     http_method_names = ["get", "post", "delete", "head", "options"]
 
+    def _user(self):
+        return self.request.user if self.request.user.is_authenticated else None
+
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user if self.request.user.is_authenticated else None)
-        
+        try:
+            serializer.instance = apply_movements([serializer.validated_data], created_by=self._user())[0]
+        except InsufficientStock as e:
+            raise ValidationError({"quantity": str(e)})
+
+    @extend_schema(
+        request=None,
+        responses={201: None},
+        description="Aplica muchos movimientos en una transacción. "
+                    "Body: {\"movements\": [{\"item\":1,\"type\":\"OUT\",\"quantity\":2,\"reason\":\"...\"}, ...]} "
+                    "o directamente la lista. Si algún item quedaría bajo min_stock, no se aplica ninguno."
+    )
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        data = request.data.get("movements") if isinstance(request.data, dict) else request.data
+        if not isinstance(data, list) or not data:
+            return Response({"detail": "Se requiere 'movements' (lista no vacía)."}, status=400)
+        ser = self.get_serializer(data=data, many=True)
+        ser.is_valid(raise_exception=True)
+        try:
+            movements = apply_movements(ser.validated_data, created_by=self._user())
+        except InsufficientStock as e:
+            return Response({"detail": str(e), "item": e.item_id}, status=400)
+        stock = dict(
+            InventoryItem.objects.filter(pk__in={m.item_id for m in movements}).values_list("id", "stock")
+        )
+        return Response(
+            {"created": len(movements), "stock": [{"item": k, "stock": v} for k, v in sorted(stock.items())]},
+            status=status.HTTP_201_CREATED,
+        )
+
         
 
 # ==== Incident Views ====
 class IncidentReportViewSet(viewsets.ModelViewSet):
-    queryset = IncidentReport.objects.select_related("room", "task", "reported_by").prefetch_related("lines")
+    queryset = IncidentReport.objects.select_related("room", "task", "reported_by").prefetch_related("lines__inventory_item")
     serializer_class = IncidentReportSerializer
     permission_classes = [IsStaffOrReadOnly]
+    query_budget = {"list": 5, "summary": 3}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["status", "room", "task", "reported_by"]
     search_fields = ["notes", "room__number"]
@@ -189,22 +721,33 @@ class IncidentReportViewSet(viewsets.ModelViewSet):
         """
         date_from = request.query_params.get("date_from")
         date_to = request.query_params.get("date_to")
-        qs = IncidentLine.objects.select_related("inventory_item", "report")
+        # Lee del rollup diario (una fila por día/item/outcome), no de las líneas
+        qs = IncidentDailyRollup.objects.all()
         if date_from:
-            qs = qs.filter(report__created_at__date__gte=date_from)
+            qs = qs.filter(day__gte=date_from)
         if date_to:
-            qs = qs.filter(report__created_at__date__lte=date_to)
+            qs = qs.filter(day__lte=date_to)
         agg = (
             qs.values("inventory_item_id", "inventory_item__name", "outcome")
-              .annotate(total_qty=Sum("quantity"))
+              .annotate(total_qty=Sum("total_qty"))
+              .filter(total_qty__gt=0)
               .order_by("inventory_item__name", "outcome")
         )
         return Response(list(agg), status=200)
 
 
-class IncidentLineViewSet(viewsets.ModelViewSet):
+class IncidentLineViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = IncidentLine.objects.select_related("report", "inventory_item").all()
     serializer_class = IncidentLineSerializer
+    export_filename = "incident-lines"
+    export_date_field = "report__created_at"
+    export_columns = [
+        ("id", "id"), ("report", "report_id"), ("reported_at", "report__created_at"),
+        ("room", "report__room__number"), ("task", "report__task_id"), ("report_status", "report__status"),
+        ("reported_by", "report__reported_by__username"), ("category", "category"),
+        ("inventory_item", "inventory_item_id"), ("item_name", "inventory_item__name"),
+        ("outcome", "outcome"), ("quantity", "quantity"), ("remark", "remark"),
+    ]
     permission_classes = [IsStaffOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ["report", "category", "outcome", "inventory_item"]
@@ -219,22 +762,26 @@ class IsChatUser(permissions.BasePermission):
         u = request.user
         if not (u and u.is_authenticated):
             return False
-        role = getattr(u, "role", None)
-        return role in ALLOWED_ROLES_CHAT
+        return get_authz(u).role in ALLOWED_ROLES_CHAT
 
     def has_object_permission(self, request, view, obj):
-        # El usuario debe ser participante del room
+        # El usuario debe ser participante del room (membresías del contexto cacheado)
+        ctx = get_authz(request.user)
         if isinstance(obj, ChatRoom):
-            return obj.participants.filter(pk=request.user.pk).exists()
+            return ctx.is_chat_member(obj.pk)
         if isinstance(obj, ChatMessage):
-            return obj.room.participants.filter(pk=request.user.pk).exists()
+            return ctx.is_chat_member(obj.room_id)
         return False
     
 # ==== Chat Views ====
 class ChatRoomViewSet(viewsets.ModelViewSet):
-    queryset = ChatRoom.objects.all().prefetch_related("participants")
+    queryset = ChatRoom.objects.all().prefetch_related(
+        "participants",
+        Prefetch("messages", ChatMessage.objects.select_related("sender")),
+    )
     serializer_class = ChatRoomSerializer
     permission_classes = [IsChatUser]
+    query_budget = {"list": 5, "retrieve": 6}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["room_type", "task", "room"]
     search_fields = ["name"]
@@ -309,18 +856,128 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         return super().get_queryset().filter(room__participants=self.request.user)
 
     def perform_create(self, serializer):
-        room = ChatRoom.objects.get(pk=self.request.data.get("room"))
+        # el número de participantes (fan-out) viene en la misma consulta de la sala
+        room = ChatRoom.objects.annotate(members=models.Count("participants")).get(pk=self.request.data.get("room"))
+        members = room.members
         # aseguro que el emisor sea participante
-        if not room.participants.filter(pk=self.request.user.pk).exists():
+        if not get_authz(self.request.user).is_chat_member(room.pk):
             room.participants.add(self.request.user)
+            members += 1
         serializer.save(sender=self.request.user)
+        transaction.on_commit(lambda: observe_chat_message(members))
 
     @action(detail=True, methods=["post"], url_path="mark_read")
     def mark_read(self, request, pk=None):
         msg = self.get_object()
         # marcar leído solo si soy participante del room
-        if not msg.room.participants.filter(pk=request.user.pk).exists():
+        if not get_authz(request.user).is_chat_member(msg.room_id):
             return Response({"detail": "No autorizado"}, status=403)
         msg.is_read = True
         msg.save(update_fields=["is_read"])
-        return Response({"id": msg.id, "is_read": True})
\ No newline at end of file
+        return Response({"id": msg.id, "is_read": True})
+
+
+# ==== Uploads reanudables ====
+class UploadSessionViewSet(mixins.CreateModelMixin,
+                           mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    """
+    Flujo:
+      POST   /uploads/                    {"filename","size","content_type"} -> id
+      PUT    /uploads/{id}/chunk/         cuerpo binario; cabecera Upload-Offset (o ?offset=)
+      GET    /uploads/{id}/               -> offset recibido (para reanudar tras un corte)
+      POST   /uploads/{id}/finalize/      {"target":"incident.photo","object_id":12}
+      DELETE /uploads/{id}/               descarta la subida
+    """
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+    def perform_destroy(self, instance):
+        discard_upload(instance)
+
+    @action(detail=True, methods=["put"], url_path="chunk")
+    def chunk(self, request, pk=None):
+        session = self.get_object()
+        raw_offset = request.headers.get("Upload-Offset", request.query_params.get("offset"))
+        try:
+            offset = int(raw_offset)
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except (TypeError, ValueError):
+            return Response({"detail": "Upload-Offset y Content-Length requeridos."}, status=400)
+        try:
+            # request.stream lee directo del socket: no pasa por los parsers de DRF
+            new_offset = write_chunk(session, offset, request.stream, length)
+        except UploadError as e:
+            return Response({"detail": e.detail, "offset": session.offset}, status=e.status)
+        return Response({"id": session.id, "offset": new_offset, "size": session.size})
+
+    @action(detail=True, methods=["post"], url_path="finalize")
+    def finalize(self, request, pk=None):
+        session = self.get_object()
+        try:
+            obj = finalize_upload(session, request.data.get("target"), request.data.get("object_id"), request.user)
+        except UploadError as e:
+            return Response({"detail": e.detail}, status=e.status)
+        return Response({"id": session.id, "status": session.status, "object_id": obj.pk})
+
+
+# ==== Analytics ====
+class TurnaroundAnalyticsView(APIView):
+    """
+    GET /api/housekeeping/analytics/turnaround/
+      ?metric=dirty_to_clean|dirty_to_inspection|task   (por defecto dirty_to_clean)
+      &date_from=YYYY-MM-DD&date_to=YYYY-MM-DD          (por defecto últimos 30 días)
+      &group_by=floor|zone|task_type|housekeeper|day
+      &percentiles=50,90,95
+      &floor=3&zone=...&task_type=TURNOVER&housekeeper=<user_id>
+    Minutos; lee las muestras materializadas (comando materialize_turnarounds).
+    El GET no escribe: el día en curso se ve hasta la última corrida del comando
+    (salvo TURNAROUND_REFRESH_ON_READ).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        p = request.query_params
+        metric = (p.get("metric") or "dirty_to_clean").upper()
+        if metric not in TurnaroundSample.Metric.values:
+            return Response({"detail": "metric inválida."}, status=400)
+        group_by = p.get("group_by") or None
+        if group_by and group_by not in GROUP_FIELDS:
+            return Response({"detail": f"group_by debe ser uno de: {', '.join(GROUP_FIELDS)}"}, status=400)
+
+        try:
+            date_to = parse_date(p["date_to"]) if p.get("date_to") else timezone.localdate()
+            date_from = parse_date(p["date_from"]) if p.get("date_from") else (date_to and date_to - timedelta(days=29))
+        except ValueError:
+            date_from = date_to = None
+        if not date_from or not date_to or date_from > date_to:
+            return Response({"detail": "Rango de fechas inválido (YYYY-MM-DD)."}, status=400)
+        try:
+            percentiles = [float(x) for x in (p.get("percentiles") or "50,75,90,95").split(",") if x.strip()]
+            if not all(0 <= q <= 100 for q in percentiles):
+                raise ValueError
+            filters = {}
+            if p.get("floor"):
+                filters["floor"] = int(p["floor"])
+            if p.get("housekeeper"):
+                filters["housekeeper_id"] = int(p["housekeeper"])
+        except ValueError:
+            return Response({"detail": "percentiles/floor/housekeeper inválidos."}, status=400)
+        if p.get("zone"):
+            filters["zone"] = p["zone"]
+        if p.get("task_type"):
+            filters["task_type"] = p["task_type"]
+
+        try:
+            data = turnaround_stats(metric, date_from, date_to, group_by, percentiles, filters)
+        except AnalyticsUnavailable as e:
+            return Response({"detail": str(e)}, status=503)
+        return Response(data)
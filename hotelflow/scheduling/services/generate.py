@@ -1,11 +1,14 @@
 # scheduling/services/generate.py
 from datetime import datetime, date, time, timedelta
 from collections import defaultdict
+from time import perf_counter
 from typing import Dict, List, Tuple
 
 from django.db import transaction
 from django.utils.timezone import make_aware
 
+from core.metrics import ROSTER_GENERATION
+
 from housekeeping.models import HousekeepingTask, Room
 from scheduling.models import Roster, Shift, TaskAssignment, Team
 
@@ -31,6 +34,7 @@ def generate_roster(roster: Roster):
     - Asigna todas las tareas del día a ese turno, sin empaquetado fino.
     - (En siguientes iteraciones: usar zonas, equipos, disponibilidad, etc.)
     """
+    started = perf_counter()
     week_start = roster.week_start
     week_days = [week_start + timedelta(days=i) for i in range(7)]
 
@@ -72,4 +76,5 @@ def generate_roster(roster: Roster):
                     planned_minutes=0
                 )
 
+    ROSTER_GENERATION.observe(perf_counter() - started, source="heuristic")
     return roster
\ No newline at end of file
@@ -1,3 +1,42 @@
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.testing import QueryBudgetTestMixin
+from housekeeping.models import HousekeepingTask, Room
+
+from .models import Roster, Shift, ShiftAssignment, TaskAssignment, Team
+
+
+class ApiQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Semana con turnos de equipo y tareas: el query_budget no debe crecer con las filas."""
+
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="hk", password="x")
+        team = Team.objects.create(name="A")
+        team.members.add(self.user, *(User.objects.create_user(username=f"m{i}", password="x") for i in range(3)))
+        today = date.today()
+        self.monday = today - timedelta(days=today.weekday())
+        roster = Roster.objects.create(week_start=self.monday)
+        for i in range(5):
+            shift = Shift.objects.create(roster=roster, date=self.monday + timedelta(days=i),
+                                         start=time(8), end=time(16), team=team)
+            ShiftAssignment.objects.create(shift=shift, user=self.user)
+            for k in range(3):
+                task = HousekeepingTask.objects.create(room=Room.objects.create(number=f"{i}{k:02d}"), title="t")
+                TaskAssignment.objects.create(shift=shift, task=task)
+        self.client = APIClient()
+        self.client.force_login(self.user)
+
+    def test_my_week(self):
+        r = self.client.get("/api/housekeeping/scheduling/my_week/", {"monday": self.monday.isoformat()})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(sum(len(day["tasks"]) for day in r.data["days"]), 15)
 
-# Create your tests here.
+    def test_supervisor_summary(self):
+        r = self.client.get("/api/housekeeping/scheduling/supervisor/summary/")
+        self.assertEqual(r.status_code, 200)
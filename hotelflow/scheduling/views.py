@@ -1,6 +1,7 @@
 # scheduling/views.py
 from __future__ import annotations
 
+from time import perf_counter
 from typing import Any, Dict, List, Optional, Tuple
 
 from django.conf import settings
@@ -43,6 +44,9 @@ try:
 except Exception:
     pass
 
+from housekeeping.exports import ExportMixin
+from core.metrics import ROSTER_GENERATION
+
 User = get_user_model()
 
 
@@ -355,10 +359,19 @@ class ShiftAssignmentViewSet(viewsets.ModelViewSet):
         return qs
 
 
-class TaskAssignmentViewSet(viewsets.ModelViewSet):
+class TaskAssignmentViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = TaskAssignment.objects.select_related("task", "shift", "assignee", "team").all()
     serializer_class = TaskAssignmentSerializer
     permission_classes = [IsAuthenticated]
+    export_filename = "task-assignments"
+    export_date_field = "shift__date"
+    export_columns = [
+        ("id", "id"), ("date", "shift__date"), ("shift", "shift_id"), ("shift_start", "shift__start"),
+        ("shift_end", "shift__end"), ("zone", "shift__zone__name"), ("task", "task_id"),
+        ("room", "task__room__number"), ("task_type", "task__task_type"), ("task_status", "task__status"),
+        ("assignee", "assignee__username"), ("team", "team__name"),
+        ("planned_start", "planned_start"), ("planned_end", "planned_end"), ("planned_minutes", "planned_minutes"),
+    ]
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -378,6 +391,7 @@ class TaskAssignmentViewSet(viewsets.ModelViewSet):
 # ======================================================================
 class MyWeekView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 6   # consultas por request, sesión incluida (core/instrumentation.py)
     parser_classes = [JSONParser]
 
     def get(self, request):
@@ -428,7 +442,11 @@ class MyWeekView(APIView):
             team_name = sh.team.name if sh.team else None
             members = []
             if sh.team:
-                members = list(sh.team.members.values("id", "first_name", "last_name", "username"))
+                # del prefetch (values() lanzaba una consulta por turno)
+                members = [
+                    {"id": m.id, "first_name": m.first_name, "last_name": m.last_name, "username": m.username}
+                    for m in sh.team.members.all()
+                ]
 
             row["shift"] = {
                 "start": sh.start.strftime("%H:%M"),
@@ -439,7 +457,7 @@ class MyWeekView(APIView):
             }
             row["team_members"] = members
 
-            for ta in sh.task_assignments.select_related("task"):
+            for ta in sh.task_assignments.all():
                 t = ta.task
                 row["tasks"].append({
                     "task_id": t.id,
@@ -589,7 +607,7 @@ class RosterViewSet(viewsets.ModelViewSet):
         Body esperado:
         {
           "week_start": "2025-08-25",
-          "rooms_summary": [
+          "rooms_summary": [   // opcional: si falta se calcula desde RoomOccupancy
              {"date":"2025-08-25","vacant":8,"stayovers":5,"deep":1,"zone":"North"},
              ...
           ],
@@ -605,6 +623,7 @@ class RosterViewSet(viewsets.ModelViewSet):
           "dry_run": false
         }
         """
+        started = perf_counter()
         data = request.data or {}
         week_start_str = data.get("week_start")
         rooms_summary = data.get("rooms_summary", [])
@@ -622,6 +641,10 @@ class RosterViewSet(viewsets.ModelViewSet):
         # Normaliza a lunes
         week_start = _monday_of(week_start)
 
+        if "rooms_summary" not in data:
+            from housekeeping.daily_tasks import rooms_summary as occupancy_summary
+            rooms_summary = occupancy_summary(week_start, week_start + timedelta(days=6))
+
         start_window = rules.get("start_window", ["07:00", "10:00"])
         if not isinstance(start_window, list) or len(start_window) != 2:
             return Response({"detail": "rules.start_window debe ser ['HH:MM','HH:MM']"}, status=400)
@@ -773,10 +796,12 @@ class RosterViewSet(viewsets.ModelViewSet):
                 "roster": RosterSerializer(roster).data,
                 "shifts": ShiftSerializer(created_shifts, many=True).data,
             }
+            ROSTER_GENERATION.observe(perf_counter() - started, source="ai")
             return Response(out, status=status.HTTP_201_CREATED)
         
 class SupervisorSummaryView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 6
 
     def get(self, request):
         today = localdate()